@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+"""
+Benchmark CodeEditor.edit_file on a large generated file.
+
+Compares the edit buffer with the previous implementation, which split, rebuilt
+and joined the whole file, then re-read it to build the context window.
+Usage: python benchmarks/bench_edit_file.py [lines]
+"""
+
+import os
+import sys
+import tempfile
+import time
+
+os.environ.setdefault("AUTOCHAT_OUTPUT_SIZE_LIMIT", "10000")
+
+from autocode.code_editor import CodeEditor  # noqa: E402
+
+EDITS = 50
+
+
+def edit_file_lists(path: str, line_index_start: int, insert_text: str) -> str:
+    """Previous implementation: list concatenation, full write and full re-read."""
+    with open(path, "r") as f:
+        lines = f.read().splitlines()
+    line_index_start -= 1
+    new_lines = lines[:line_index_start] + [insert_text] + lines[line_index_start + 1 :]
+    with open(path, "w") as f:
+        f.write("\n".join(new_lines))
+    with open(path, "r") as f:
+        display = f.read().split("\n")
+    return "\n".join(display[max(line_index_start - 4, 0) : line_index_start + 5])
+
+
+def main():
+    line_count = int(sys.argv[1]) if len(sys.argv) > 1 else 200_000
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "generated.txt")
+        with open(path, "w") as f:
+            f.writelines(
+                f"generated line {i} with some content\n" for i in range(line_count)
+            )
+        size_mb = os.path.getsize(path) / 1e6
+
+        start = time.perf_counter()
+        for i in range(EDITS):
+            edit_file_lists(path, 1 + i * (line_count // EDITS), f"edited {i}")
+        lists_time = (time.perf_counter() - start) / EDITS
+
+        editor = CodeEditor(tmp)
+        start = time.perf_counter()
+        for i in range(EDITS):
+            editor.edit_file(path, 1 + i * (line_count // EDITS), 1, f"edited {i}")
+        buffer_time = (time.perf_counter() - start) / EDITS
+
+        print(f"File: {line_count} lines ({size_mb:.1f} MB), {EDITS} edits")
+        print(f"list rebuild: {lists_time * 1000:.1f} ms/edit")
+        print(f"edit buffer:  {buffer_time * 1000:.1f} ms/edit")
+        print(f"speedup:      {lists_time / buffer_time:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
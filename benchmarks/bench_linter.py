@@ -0,0 +1,58 @@
+#!/usr/bin/env python3
+"""
+Benchmark CodeEditor edits per second with the ruff formatter/linter enabled.
+
+Compares running `ruff format` and `ruff check` per edit with the persistent
+`ruff server` backend.
+Usage: python benchmarks/bench_linter.py [edits]
+"""
+
+import json
+import os
+import sys
+import tempfile
+import time
+
+from autocode import code_editor_utils
+from autocode.code_editor import CodeEditor
+
+SETTINGS = {
+    "[python]": {
+        "editor.formatOnSave": True,
+        "editor.defaultFormatter": "charliermarsh.ruff",
+        "editor.codeActionsOnSave": {
+            "source.fixAll": "explicit",
+            "source.organizeImports": "explicit",
+        },
+    }
+}
+
+
+def run_edits(directory: str, edits: int) -> float:
+    editor = CodeEditor(directory)
+    with open(os.path.join(directory, "module.py"), "w") as f:
+        f.write("import sys\nimport os\n\n\ndef f():\n    return 0\n")
+    start = time.perf_counter()
+    for i in range(edits):
+        editor.edit_file("module.py", 6, 1, f"    return {i}")
+    return edits / (time.perf_counter() - start)
+
+
+def main():
+    edits = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+    with tempfile.TemporaryDirectory() as tmp:
+        os.makedirs(os.path.join(tmp, ".vscode"))
+        with open(os.path.join(tmp, ".vscode", "settings.json"), "w") as f:
+            json.dump(SETTINGS, f)
+        os.chdir(tmp)
+
+        results = {}
+        for backend in ("subprocess", "server"):
+            code_editor_utils.RUFF_BACKEND = backend
+            results[backend] = run_edits(tmp, edits)
+            print(f"{backend:<10}: {results[backend]:.1f} edits/s")
+        print(f"speedup   : {results['server'] / results['subprocess']:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+"""
+Benchmark list_non_gitignore_files on a tree with a large node_modules.
+
+Compares the pruned os.scandir walk with a full rglob followed by filtering.
+Usage: python benchmarks/bench_list_files.py [node_modules_files]
+"""
+
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from autocode.directory_utils import get_gitignore_matcher, list_non_gitignore_files
+
+
+def create_tree(root: Path, node_modules_files: int):
+    (root / ".git").mkdir()
+    (root / ".gitignore").write_text(".venv/\n*.log\n")
+    for i in range(50):
+        package = root / "src" / f"package_{i}"
+        package.mkdir(parents=True)
+        for j in range(20):
+            (package / f"module_{j}.py").write_text("content")
+    for i in range(node_modules_files):
+        package = root / "node_modules" / f"package_{i // 100}" / "lib"
+        package.mkdir(parents=True, exist_ok=True)
+        (package / f"file_{i}.js").write_text("content")
+
+
+def list_files_rglob(directory: Path) -> list:
+    """Previous implementation: enumerate everything, then filter."""
+    matcher = get_gitignore_matcher(str(directory))
+    matcher.refresh()
+    return [
+        str(path)
+        for path in directory.rglob("*")
+        if path.is_file() and not matcher.is_ignored(str(path))
+    ]
+
+
+def timeit(function, *args, repeat: int = 5) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function(*args)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    node_modules_files = int(sys.argv[1]) if len(sys.argv) > 1 else 50_000
+    with tempfile.TemporaryDirectory() as tmp:
+        root = Path(tmp).resolve()
+        create_tree(root, node_modules_files)
+
+        assert set(list_files_rglob(root)) == set(list_non_gitignore_files(str(root)))
+
+        rglob_time = timeit(list_files_rglob, root)
+        walk_time = timeit(list_non_gitignore_files, str(root))
+        print(f"Tree: 1000 source files, {node_modules_files} files in node_modules")
+        print(f"rglob + filter: {rglob_time * 1000:.1f} ms")
+        print(f"pruned walk:    {walk_time * 1000:.1f} ms")
+        print(f"speedup:        {rglob_time / walk_time:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
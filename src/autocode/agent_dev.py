@@ -32,6 +32,7 @@ Use shell sessions to:
 - Run commands, servers
 - Run tests
 - ...
+Running a command stops the command still running in the same shell: run servers in their own shell.
 Don't use the shell to edit files.
 Don't use the shell to use git.
 
@@ -1,37 +1,200 @@
 import logging
 import os
+from itertools import count
+from typing import Optional
 
 from PIL import Image
 
-from autocode.code_editor_utils import apply_linter
-from autocode.directory_utils import list_non_gitignore_files
+from autocode.code_editor_utils import apply_linter, apply_linters, lint_text
+from autocode.content_cache import ContentCache
+from autocode.context_builder import (
+    DIRECTORY_BUDGET_SHARE,
+    MAX_EDIT_WINDOWS,
+    edit_windows,
+    shift_edit_windows,
+    summarize_directory,
+)
+from autocode.directory_utils import find_repository_root, list_non_gitignore_files
+from autocode.file_index import FileIndex
+from autocode.file_utils import FileConflictError, atomic_write
+from autocode.line_buffer import LineBuffer
+from autocode.line_reader import get_line_indexed_file, split_lines
+from autocode.search import iter_replacements, iter_search_matches, read_text_file
+from autocode.search_index import TrigramIndex
+from autocode.tokens import tokens_to_chars
 
 logger = logging.getLogger(__name__)
 
 output_size_limit = int(os.environ["AUTOCHAT_OUTPUT_SIZE_LIMIT"])
 FILE_DISPLAY_HEADERS = ["line number|line content", "---|---"]
+TRANSACTION_NOTICE = (
+    "\nA transaction is in progress: edits are staged until commit_transaction.\n"
+)
 
 
 class CodeEditor:
-    def __init__(self, directory: str = "."):
+    def __init__(
+        self,
+        directory: str = ".",
+        file_index: bool = False,
+        search_index: bool = False,
+        search_index_snapshot: Optional[str] = None,
+        context_budget_tokens: Optional[int] = None,
+        fsync: bool = False,
+    ):
+        """
+        Args:
+            directory: The root directory of the code editor.
+            file_index: Keep a persistent index of the files of the directory,
+                updated incrementally instead of walking the tree on every listing.
+            search_index: Keep a trigram index of the file contents, so searches
+                only open the files that can match.
+            search_index_snapshot: Path where the trigram index is saved and loaded.
+            context_budget_tokens: Approximate size of the context shown to the LLM
+                (unlimited by default).
+            fsync: Flush the written files to disk before renaming them in place.
+        """
         self.directory = os.path.abspath(directory)
+        try:
+            self.repository_root = str(find_repository_root(self.directory))
+        except ValueError:
+            self.repository_root = self.directory
         self.open_files = set()
+        self.file_index = FileIndex(self.directory) if file_index else None
+        self.search_index = None
+        if search_index or search_index_snapshot:
+            self.search_index = TrigramIndex(search_index_snapshot)
+        self.content_cache = ContentCache()
+        self.context_budget_tokens = context_budget_tokens
+        # Recency of the accesses and edits, to rank the open files
+        self._usage_counter = count()
+        self._last_used = {}
+        self._edited_lines = {}
+        # Edits staged in memory during a transaction: path -> content (None if deleted)
+        self._staged = None
+        # Edit buffers of the open files: path -> LineBuffer
+        self._buffers = {}
+        # (mtime_ns, size) of the files when last read or written by the editor
+        self._versions = {}
+        self.fsync = fsync
 
     def __llm__(self):
-        """Currently: display the directory of the code editor."""
-        context = "Directory:\n" + self.display_directory()
+        """Display the directory and the open files, within the context budget if any.
+        The most recently used files come first. Files that do not fit are shown
+        around their recent edits, or only named."""
+        if self.context_budget_tokens is None:
+            budget = float("inf")
+            directory = self.display_directory()
+        else:
+            budget = tokens_to_chars(self.context_budget_tokens)
+            if self._staged is not None:
+                budget -= len(TRANSACTION_NOTICE)
+            directory = summarize_directory(
+                self._list_files(),
+                self.directory,
+                int(budget * DIRECTORY_BUDGET_SHARE),
+            )
+        context = "Directory:\n" + directory
         context += "\nOpen files:\n"
-        for path in self.open_files:
+        budget -= len(context)
+        ranked_files = sorted(
+            self.open_files,
+            key=lambda path: self._last_used.get(path, -1),
+            reverse=True,
+        )
+        for path in ranked_files:
             try:
-                context += f"> {path}\n" + self.read_file(path)
-                context += "\n==========\n"
+                content = self._render_file(path)
+                if len(content) > budget:
+                    content = self._render_edit_windows(path, budget)
             except Exception as e:
-                context += f"> {path}\n"
-                context += "File is not a text file\n"
-                context += "\n==========\n"
+                content = "File is not a text file\n"
                 logger.error(f"Error reading file {path}: {e}")
+            context += f"> {path}\n" + content
+            context += "\n==========\n"
+            budget -= len(content)
+        if self._staged is not None:
+            context += TRANSACTION_NOTICE
         return context
 
+    def _render_edit_windows(self, path: str, budget: int) -> str:
+        """Render the lines around the recent edits of a file, if they fit in the budget."""
+        changed = self._file_version(path) != self._versions.get(path)
+        if changed and not self._is_staged(path):
+            # Changed outside of the editor: the edited lines are unknown
+            self._edited_lines.pop(path, None)
+        line_count = self._line_count(path)
+        windows = edit_windows(self._edited_lines.get(path, []), line_count)
+        parts = [self._render_file(path, start, end) for start, end in windows]
+        content = "\n...\n".join(parts)
+        if not parts or len(content) > budget:
+            return f"({line_count} lines, not shown to fit the context budget, use read_file)"
+        return f"(showing the recent edits of {line_count} lines)\n" + content
+
+    def _render_file(self, path: str, start_line: int = 1, end_line: int = None):
+        """Render a text file like read_file, reusing the content rendered if it did not change."""
+        abs_path = os.path.join(self.directory, path)
+        if self._is_staged(abs_path):
+            return self._format_file(abs_path, start_line, end_line)
+        stat = os.stat(abs_path)
+        key = (abs_path, stat.st_mtime_ns, stat.st_size, start_line, end_line)
+        content = self.content_cache.get(key)
+        if content is None:
+            content = self._format_file(abs_path, start_line, end_line)
+            self.content_cache.put(key, content)
+        return content
+
+    def _touch(self, abs_path: str):
+        """Record an access to a file."""
+        self._last_used[abs_path] = next(self._usage_counter)
+
+    def _record_edit(self, abs_path: str, start: int, deleted: int, inserted: int):
+        """Record an edit replacing `deleted` lines at `start` with `inserted` lines,
+        moving the lines of the previous edits accordingly."""
+        edits = shift_edit_windows(
+            self._edited_lines.get(abs_path, []), start, deleted, inserted
+        )
+        self._edited_lines[abs_path] = edits[-MAX_EDIT_WINDOWS:]
+
+    def _is_staged(self, abs_path: str) -> bool:
+        return self._staged is not None and abs_path in self._staged
+
+    def _read_text(self, abs_path: str) -> str:
+        """Read the content of a file, or its staged content during a transaction."""
+        if self._is_staged(abs_path):
+            if self._staged[abs_path] is None:
+                raise FileNotFoundError(
+                    f"File {abs_path} is deleted in the transaction"
+                )
+            return self._staged[abs_path]
+        with open(abs_path, "r") as f:
+            return f.read()
+
+    def _line_count(self, abs_path: str) -> int:
+        if self._is_staged(abs_path):
+            return len(split_lines(self._read_text(abs_path)))
+        return get_line_indexed_file(abs_path).line_count()
+
+    def _format_file(self, abs_path: str, start_line: int = 1, end_line: int = None):
+        """Format the lines of a text file with line numbers."""
+        if self._is_staged(abs_path):
+            all_lines = split_lines(self._read_text(abs_path))
+            end_line = end_line or len(all_lines)
+            lines = all_lines[start_line - 1 : end_line]
+        else:
+            # Only the requested range of lines is decoded (and indexed)
+            lines_file = get_line_indexed_file(abs_path)
+            end_line = end_line or lines_file.line_count()
+            lines = lines_file.lines(start_line - 1, end_line)
+        return self._format_lines(lines, start_line, width=len(str(end_line)))
+
+    @staticmethod
+    def _format_lines(lines: list, start_line: int, width: int) -> str:
+        display = FILE_DISPLAY_HEADERS[:]
+        for i, line in enumerate(lines, start=start_line):
+            display.append(f"{str(i).rjust(width)}|{line}")
+        return "\n".join(display)
+
     def read_file(self, path: str, start_line: int = 1, end_line: int = None):
         f"""Read a file with line numbers
         If the file is an image, return a base64-encoded image
@@ -47,45 +210,88 @@ class CodeEditor:
         abs_path = os.path.join(self.directory, path)
         if abs_path not in self.open_files:
             self.open_files.add(abs_path)
+        self._touch(abs_path)
 
         if path.lower().endswith((".png", ".jpg", ".jpeg")):
             return Image.open(abs_path)
 
-        with open(abs_path, "r") as f:
-            lines = f.read().splitlines()
-
-        end_line = end_line or len(lines)
-        display = FILE_DISPLAY_HEADERS[:]
-        width = len(str(end_line))
-
-        for i, line in enumerate(lines[start_line - 1 : end_line], start=start_line):
-            display.append(f"{str(i).rjust(width)}|{line}")
-        return "\n".join(display)
+        if not self._is_staged(abs_path):
+            self._record_version(abs_path)
+        return self._format_file(abs_path, start_line, end_line)
 
     def close_file(self, path: str):
         """Close a file when it is no longer needed (for lighter context usage)"""
         self.open_files.remove(path)
+        self._buffers.pop(os.path.join(self.directory, path), None)
 
     def close_all_files(self):
         """Close all files"""
         self.open_files.clear()
+        self._buffers.clear()
 
     def _write_file(self, path: str, content: str):
-        """Write the entire content to a file."""
+        """Write the entire content to a file (staged during a transaction)."""
         abs_path = os.path.join(self.directory, path)
-        with open(abs_path, "w") as f:
-            f.write(content)
-
-        apply_linter(abs_path)
+        if self._staged is not None:
+            self._staged[abs_path] = content
+            return self.read_file(abs_path)
 
+        self._buffers[abs_path] = self._save(abs_path, LineBuffer.from_text(content))
         return self.read_file(abs_path)
 
+    def _check_unchanged(self, abs_path: str):
+        """Raise FileConflictError if the file changed since the editor last read
+        or wrote it (files never read are not checked)."""
+        version = self._versions.get(abs_path)
+        if version is None:
+            return
+        if self._file_version(abs_path) != version:
+            raise FileConflictError(
+                f"File {abs_path} was modified since it was last read, "
+                "read it again before editing it"
+            )
+
+    @staticmethod
+    def _file_version(abs_path: str) -> Optional[tuple]:
+        try:
+            stat = os.stat(abs_path)
+        except FileNotFoundError:
+            return None
+        return (stat.st_mtime_ns, stat.st_size)
+
+    def _record_version(self, abs_path: str):
+        self._versions[abs_path] = self._file_version(abs_path)
+
+    def _save(self, abs_path: str, buffer: LineBuffer) -> LineBuffer:
+        """Format, then atomically write a file. Return the buffer written."""
+        self._check_unchanged(abs_path)
+        text = buffer.text()
+        linted = lint_text(abs_path, text, root=self.repository_root)
+        reformatted = linted is not None and linted[0] != text
+        if reformatted:
+            buffer = LineBuffer.from_text(linted[0])
+        buffer.save(abs_path, fsync=self.fsync)
+        if linted is None:
+            # The linter only works on files: run it on the written file
+            apply_linter(abs_path, root=self.repository_root)
+            reformatted = not buffer.is_current()
+        if reformatted:
+            # The lines of the previous edits moved
+            self._edited_lines.pop(abs_path, None)
+        self._record_version(abs_path)
+        self._notify_changed(abs_path)
+        return buffer
+
     def create_file(self, path: str, content: str):
         """Create a new file with the given content."""
 
         # Work only if the file doesn't exist
         abs_path = os.path.join(self.directory, path)
-        if os.path.exists(abs_path):
+        if self._is_staged(abs_path):
+            exists = self._staged[abs_path] is not None
+        else:
+            exists = os.path.exists(abs_path)
+        if exists:
             raise FileExistsError(f"File {abs_path} already exists")
 
         self._write_file(abs_path, content)
@@ -94,7 +300,92 @@ class CodeEditor:
     def delete_file(self, path: str):
         """Delete a file."""
         abs_path = os.path.join(self.directory, path)
+        if self._staged is not None:
+            self._read_text(abs_path)  # Check that the file exists
+            self._staged[abs_path] = None
+            return
+        self._check_unchanged(abs_path)
         os.remove(abs_path)
+        self._versions.pop(abs_path, None)
+        self._notify_changed(abs_path)
+
+    def start_transaction(self):
+        """Stage the next edits in memory, across files, until commit_transaction.
+        Files are then written once and formatted / linted in a single batch."""
+        if self._staged is not None:
+            raise ValueError("A transaction is already in progress")
+        self._staged = {}
+        return "Transaction started"
+
+    def rollback_transaction(self):
+        """Discard the edits staged since start_transaction."""
+        if self._staged is None:
+            raise ValueError("No transaction in progress")
+        discarded = len(self._staged)
+        for abs_path in self._staged:
+            self._buffers.pop(abs_path, None)
+            self._edited_lines.pop(abs_path, None)  # Edits never written
+        self._staged = None
+        return f"Transaction rolled back ({discarded} files discarded)"
+
+    def commit_transaction(self):
+        """Write the edits staged since start_transaction, then format and lint
+        all the touched files at once.
+        Returns:
+            A summary of the written files and the combined linter report.
+        """
+        if self._staged is None:
+            raise ValueError("No transaction in progress")
+        for abs_path in self._staged:
+            self._check_unchanged(abs_path)
+        # Each edit leaves the transaction once written: if a write fails, the
+        # files already written are still recorded and the others stay staged
+        written, done, failure = [], [], None
+        try:
+            for abs_path, content in list(self._staged.items()):
+                try:
+                    if content is None:
+                        if os.path.exists(abs_path):
+                            os.remove(abs_path)
+                    else:
+                        atomic_write(abs_path, [content], fsync=self.fsync)
+                        written.append(abs_path)
+                        self._record_version(abs_path)
+                except OSError as e:
+                    rel_path = os.path.relpath(abs_path, self.directory)
+                    failure = f"Failed to write {rel_path}: {e.strerror or e}"
+                    break
+                if content is None:
+                    self._versions.pop(abs_path, None)
+                done.append(abs_path)
+                del self._staged[abs_path]
+            report = apply_linters(written, root=self.repository_root)
+        finally:
+            for abs_path in written:
+                if self._file_version(abs_path) != self._versions[abs_path]:
+                    # Reformatted: the lines of the previous edits moved
+                    self._edited_lines.pop(abs_path, None)
+                self._record_version(abs_path)
+            for abs_path in done:
+                self._notify_changed(abs_path)
+            if not self._staged:
+                self._staged = None
+
+        summary = f"{len(written)} files written"
+        deleted = len(done) - len(written)
+        if deleted:
+            summary += f", {deleted} files deleted"
+        if failure:
+            summary = (
+                f"Transaction partially committed: {summary}\n{failure}\n"
+                f"The {len(self._staged)} remaining edits are still staged: "
+                "fix the problem and commit again, or roll back."
+            )
+        else:
+            summary = f"Transaction committed: {summary}"
+        if report:
+            summary += f"\nLinter report:\n{report}"
+        return summary
 
     def str_replace(self, path: str, old_string: str, new_string: str) -> str:
         """Replace all occurrences of 'old_string' with 'new_string' in the file.
@@ -110,14 +401,29 @@ class CodeEditor:
         if abs_path not in self.open_files:
             self.open_files.add(abs_path)
 
-        with open(abs_path, "r") as f:
-            content = f.read()
+        content = self._read_text(abs_path)
 
+        if not old_string:
+            raise ValueError("Old string is empty")
         if old_string not in content:
             raise ValueError(f"Old string '{old_string}' not found in file '{path}'")
 
+        occurrences = []  # First line of each occurrence, in the new content
+        deleted = old_string.count("\n") + 1
+        inserted = new_string.count("\n") + 1
+        line, position = 1, 0
+        index = content.find(old_string)
+        while index != -1:
+            line += content.count("\n", position, index)
+            occurrences.append(line + len(occurrences) * (inserted - deleted))
+            position = index + len(old_string)
+            line += old_string.count("\n")
+            index = content.find(old_string, position)
         content = content.replace(old_string, new_string)
         self._write_file(abs_path, content)
+        for first_line in occurrences:
+            self._record_edit(abs_path, first_line, deleted, inserted)
+        self._touch(abs_path)
         return "File edited"
 
     def edit_file(
@@ -143,80 +449,241 @@ class CodeEditor:
         if abs_path not in self.open_files:
             self.open_files.add(abs_path)
 
-        with open(abs_path, "r") as f:
-            lines = f.read().splitlines()
+        buffer = self._get_buffer(abs_path)
+        line_count = buffer.line_count()
 
         # Convert line numbers to 0-indexed
         line_index_start -= 1
-        line_index_end = line_index_start + delete_lines_count
+        line_index_end = min(line_index_start + delete_lines_count, line_count)
 
         # Safety checks
         if delete_lines_count < 0:
             raise ValueError("Delete lines count must be positive.")
         if line_index_start < 0:
             raise ValueError("Start line out of bounds.")
-        if line_index_start > len(lines):
+        if line_index_start > line_count:
             raise ValueError("Start line out of bounds.")
 
-        if insert_text:
-            new_lines = (
-                lines[:line_index_start] + [insert_text] + lines[line_index_end:]
-            )
-        else:
-            new_lines = lines[:line_index_start] + lines[line_index_end:]
-        new_content = "\n".join(new_lines)
+        if self._staged is None:
+            self._check_unchanged(abs_path)
+        inserted_lines = insert_text.split("\n") if insert_text else []
+        buffer.replace(line_index_start, line_index_end, inserted_lines)
 
-        # Write the full content to the file
-        content_display = self._write_file(path, new_content)
+        if self._staged is not None:
+            self._staged[abs_path] = buffer.text()
+        else:
+            try:
+                buffer = self._save(abs_path, buffer)
+            except BaseException:
+                # The buffer has an edit that is not on disk
+                self._buffers.pop(abs_path, None)
+                raise
+            if buffer.is_current():
+                self._buffers[abs_path] = buffer
+            else:
+                # The linter rewrote the file
+                buffer = self._get_buffer(abs_path)
+        self._record_edit(
+            abs_path,
+            line_index_start + 1,
+            line_index_end - line_index_start,
+            len(inserted_lines),
+        )
+        self._touch(abs_path)
 
         # Calculate the context window
         CONTEXT_WINDOW_SURROUNDING_LINES = 4
-        start_context = len(FILE_DISPLAY_HEADERS) + max(
-            line_index_start - CONTEXT_WINDOW_SURROUNDING_LINES, 0
-        )
-        end_context = len(FILE_DISPLAY_HEADERS) + min(
-            line_index_start
-            + (len(insert_text.split("\n")) if insert_text else 0)
-            + CONTEXT_WINDOW_SURROUNDING_LINES,
-            len(content_display),
+        start_context = max(line_index_start - CONTEXT_WINDOW_SURROUNDING_LINES, 0)
+        end_context = (
+            line_index_start + len(inserted_lines) + CONTEXT_WINDOW_SURROUNDING_LINES
         )
-        return "\n".join(
-            FILE_DISPLAY_HEADERS
-            + content_display.split("\n")[start_context:end_context]
+        return self._format_lines(
+            buffer.lines(start_context, end_context),
+            start_context + 1,
+            width=len(str(buffer.line_count())),
         )
 
+    def _get_buffer(self, abs_path: str) -> LineBuffer:
+        """Return the edit buffer of a file, kept while the file is open and unchanged."""
+        if self._is_staged(abs_path):
+            return LineBuffer.from_text(self._read_text(abs_path))
+        buffer = self._buffers.get(abs_path)
+        if buffer is None or not buffer.is_current():
+            buffer = LineBuffer.from_file(abs_path)
+            self._buffers[abs_path] = buffer
+        if self._staged is not None:
+            # Staged edits go to a copy: the cached buffer stays the file on disk
+            return LineBuffer.from_text(buffer.text())
+        return buffer
+
+    def _notify_changed(self, abs_path: str):
+        """Tell the caches and indexes about a file written or deleted by the editor."""
+        self.content_cache.invalidate(abs_path)
+        if self.file_index:
+            self.file_index.notify(abs_path)
+        if self.search_index:
+            self.search_index.update(abs_path)
+
+    # A context manager rather than a close method, which would be exposed as a tool
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        """Stop watching the directory, if the file index watches it."""
+        if self.file_index:
+            self.file_index.close()
+
+    def _list_files(self) -> list:
+        """List the non-gitignored files, from the file index when enabled."""
+        if self.file_index:
+            return self.file_index.files()
+        return list_non_gitignore_files(self.directory)
+
     def display_directory(self) -> str:
         """Display all the non-gitignored files in the directory."""
-        files = list_non_gitignore_files(self.directory)
+        files = self._list_files()
         return "\n".join(files)
 
-    def search_files(self, search_text: str) -> str:
-        """Search recursively for files containing 'search_text' and return results in VSCode format."""
-        files = list_non_gitignore_files(self.directory)
+    def _candidate_files(self, search_text: str, regex: bool) -> list:
+        """List the files that may contain the text, through the search index when enabled."""
+        files = self._list_files()
+        if self.search_index and not regex:
+            if self.search_index.sync(files) and self.search_index.snapshot_path:
+                self.search_index.save()
+            candidates = self.search_index.candidates(search_text)
+            if candidates is not None:
+                files = [path for path in files if path in candidates]
+        return files
+
+    def search_files(
+        self,
+        search_text: str,
+        regex: bool = False,
+        case_sensitive: bool = False,
+        include: Optional[list[str]] = None,
+        exclude: Optional[list[str]] = None,
+        max_results: Optional[int] = None,
+        max_per_file: Optional[int] = None,
+    ) -> str:
+        """Search recursively for files containing 'search_text' and return results in VSCode format.
+        Args:
+            search_text: The text to search for (case-insensitive by default).
+            regex: Treat search_text as a regular expression.
+            case_sensitive: Match the case of search_text.
+            include: Only search files matching these globs (e.g. ["*.py", "src/"]).
+            exclude: Skip files matching these globs.
+            max_results: Stop after this many matching lines.
+            max_per_file: Show at most this many matching lines per file.
+        """
+        files = self._candidate_files(search_text, regex)
         results = []
 
-        for path in files:
-            abs_path = os.path.join(self.directory, path)
-            try:
-                with open(abs_path, "r", encoding="utf-8", errors="ignore") as f:
-                    lines = f.readlines()
-                    matches = []
-                    for i, line in enumerate(lines, 1):
-                        if search_text.lower() in line.lower():
-                            # Strip whitespace and limit line length if too long
-                            line_preview = line.strip()
-                            if len(line_preview) > 100:
-                                line_preview = line_preview[:97] + "..."
-                            matches.append(f"  Line {i}: {line_preview}")
-
-                    if matches:
-                        results.append(f"> {os.path.relpath(abs_path, self.directory)}")
-                        results.extend(matches)
-                        results.append("")  # Add a blank line between file results
-            except Exception as e:
-                logger.error(f"Error reading file {abs_path}: {e}")
+        matches_count = 0
+        for abs_path, matches in iter_search_matches(
+            files,
+            search_text,
+            regex=regex,
+            case_sensitive=case_sensitive,
+            include=include,
+            exclude=exclude,
+            root=self.directory,
+            max_results=max_results,
+            max_per_file=max_per_file,
+        ):
+            results.append(f"> {os.path.relpath(abs_path, self.directory)}")
+            for i, line in matches:
+                # Strip whitespace and limit line length if too long
+                line_preview = line.strip()
+                if len(line_preview) > 100:
+                    line_preview = line_preview[:97] + "..."
+                results.append(f"  Line {i}: {line_preview}")
+            results.append("")  # Add a blank line between file results
+            matches_count += len(matches)
 
         if not results:
             return "No files found."
 
+        if max_results and matches_count >= max_results:
+            results.append(f"(Results limited to {max_results} matches)")
         return "\n".join(results).rstrip()
+
+    def replace_in_files(
+        self,
+        pattern: str,
+        replacement: str,
+        include: Optional[list[str]] = None,
+        exclude: Optional[list[str]] = None,
+        regex: bool = False,
+        case_sensitive: bool = True,
+    ) -> str:
+        """Replace a text (or regex) in all the matching files of the directory at once,
+        e.g. to rename a symbol. The files are formatted and linted together.
+        Args:
+            pattern: The text to replace (or a regular expression if regex is True).
+            replacement: The new text (\\1 or \\g<name> refer to the regex groups).
+            include: Only replace in files matching these globs (e.g. ["*.py", "src/"]).
+            exclude: Skip files matching these globs.
+            regex: Treat pattern as a regular expression (^ and $ match at each line).
+            case_sensitive: Match the case of pattern.
+        Returns:
+            The number of replacements per file.
+        """
+        if not pattern:
+            return "The pattern is empty."
+        files = self._candidate_files(pattern, regex)
+        read_text = read_text_file
+        if self._staged is not None:
+            # Replace in the staged content, and stage the results
+            listed = set(files)
+            files += [path for path in self._staged if path not in listed]
+
+            def read_text(path: str) -> Optional[str]:
+                if self._is_staged(path):
+                    return self._staged[path]
+                return read_text_file(path)
+
+        changed, conflicts, written = [], [], []
+        for abs_path, new_text, replacements in iter_replacements(
+            files,
+            pattern,
+            replacement,
+            regex=regex,
+            case_sensitive=case_sensitive,
+            include=include,
+            exclude=exclude,
+            root=self.directory,
+            read_text=read_text,
+        ):
+            rel_path = os.path.relpath(abs_path, self.directory)
+            if self._staged is not None:
+                self._staged[abs_path] = new_text
+            else:
+                try:
+                    self._check_unchanged(abs_path)
+                except FileConflictError:
+                    conflicts.append(rel_path)
+                    continue
+                atomic_write(abs_path, [new_text], fsync=self.fsync)
+                written.append(abs_path)
+            changed.append((rel_path, replacements))
+
+        report = apply_linters(written, root=self.repository_root) if written else None
+        for abs_path in written:
+            self._record_version(abs_path)
+            self._notify_changed(abs_path)
+
+        if not changed and not conflicts:
+            return "No occurrences found."
+        total = sum(replacements for _, replacements in changed)
+        summary = [f"Replaced {total} occurrences in {len(changed)} files:"]
+        summary += [
+            f"  {rel_path}: {replacements}" for rel_path, replacements in changed
+        ]
+        if conflicts:
+            summary.append(
+                "Skipped (modified since last read, read them again): "
+                + ", ".join(conflicts)
+            )
+        if report:
+            summary.append(f"Linter report:\n{report}")
+        return "\n".join(summary)
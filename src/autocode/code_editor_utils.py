@@ -1,57 +1,58 @@
 import json
 import logging
 import os
+import re
 import subprocess
-import tempfile
 from typing import Optional
 
-logger = logging.getLogger(__name__)
+from autocode.patch import PatchError, apply_patch
+from autocode.ruff_server import RuffServerError, get_ruff_server
 
+logger = logging.getLogger(__name__)
 
-def apply_diff(diff_text: str):
-    """Apply a diff to the file and return the new content and affected lines."""
-    # FIX: diff_text should end with a newline
-    if not diff_text.endswith("\n"):
-        diff_text += "\n"
+# "server" keeps a `ruff server` process alive, "subprocess" runs ruff per file
+RUFF_BACKEND = os.environ.get("AUTOCODE_RUFF_BACKEND", "server")
 
-    with tempfile.NamedTemporaryFile(mode="w", suffix=".patch", delete=False) as f:
-        diff_file = f.name
-        f.write(diff_text)
 
-    # Apply the patch using git
+def apply_diff(diff_text: str, root: Optional[str] = None):
+    """Apply a unified diff (possibly touching several files) in memory,
+    lint the touched files and return the per-hunk report.
+    Args:
+        diff_text: The diff, with paths relative to root (a/ b/ prefixes allowed).
+        root: The directory of the files (defaults to the current directory).
+    """
+    root = root or os.getcwd()
     try:
-        result = subprocess.run(
-            ["git", "apply", diff_file],
-            check=True,
-            capture_output=True,
-            text=True,
-        )
-    except subprocess.CalledProcessError as e:
-        return e.stderr
-    finally:
-        # Clean up temporary files
-        os.unlink(diff_file)
+        touched, report = apply_patch(diff_text, root)
+    except PatchError as e:
+        return f"Patch not applied: {e}"
 
     # Apply linter after applying the diff
-    apply_linter()
-    return result.stdout
+    if touched:
+        linter_report = apply_linters(touched, root=root)
+        if linter_report:
+            report += f"\nLinter report:\n{linter_report}"
+    return report
 
 
-def apply_ruff_formatter(file_path: Optional[str] = None):
+def _as_paths(file_path) -> list:
     if not file_path:
-        file_path = "."
+        return ["."]
+    if isinstance(file_path, str):
+        return [file_path]
+    return list(file_path)
+
+
+def apply_ruff_formatter(file_path=None):
+    """Run `ruff format` on a file, or on a list of files at once."""
     result = subprocess.run(
-        ["ruff", "format", file_path], capture_output=True, text=True
+        ["ruff", "format", *_as_paths(file_path)], capture_output=True, text=True
     )
     return result.stdout + result.stderr
 
 
-def apply_ruff_linter(
-    file_path: Optional[str] = None, code_action_settings: Optional[dict] = None
-):
-    if not file_path:
-        file_path = "."
-
+def apply_ruff_linter(file_path=None, code_action_settings: Optional[dict] = None):
+    """Run `ruff check` on a file, or on a list of files at once."""
     if not code_action_settings:
         code_action_settings = {}
 
@@ -65,7 +66,7 @@ def apply_ruff_linter(
     if code_action_settings.get("source.organizeImports") == "explicit":
         commands.extend(["--select", "I"])
 
-    commands.append(file_path)
+    commands.extend(_as_paths(file_path))
 
     result = subprocess.run(
         commands,
@@ -75,34 +76,191 @@ def apply_ruff_linter(
     return result.stdout + result.stderr
 
 
-def apply_linter(file_path: str = None):
-    """Apply linter based on .vscode/settings.json"""
+# File extension -> VSCode language identifier
+LANGUAGE_IDS = {
+    ".py": "python",
+    ".pyi": "python",
+    ".js": "javascript",
+    ".mjs": "javascript",
+    ".cjs": "javascript",
+    ".jsx": "javascriptreact",
+    ".ts": "typescript",
+    ".tsx": "typescriptreact",
+    ".vue": "vue",
+    ".json": "json",
+    ".css": "css",
+    ".scss": "scss",
+    ".html": "html",
+    ".md": "markdown",
+    ".yaml": "yaml",
+    ".yml": "yaml",
+    ".toml": "toml",
+    ".sh": "shellscript",
+    ".rs": "rust",
+    ".go": "go",
+}
+
+_settings_cache = {}  # settings path -> (mtime_ns, settings, resolved per language)
+_warned_formatters = set()
+
+
+def _strip_jsonc(text: str) -> str:
+    """Remove the comments and trailing commas VSCode allows in settings.json."""
+    return re.sub(
+        r'("(?:\\.|[^"\\])*")|//[^\n]*|/\*.*?\*/|,(?=\s*[}\]])',
+        lambda match: match.group(1) or "",
+        text,
+        flags=re.DOTALL,
+    )
+
+
+def load_vscode_settings(root: str = ".") -> Optional[dict]:
+    """Load <root>/.vscode/settings.json, cached until its mtime changes."""
+    path = os.path.join(os.path.abspath(root), ".vscode", "settings.json")
     try:
-        with open(".vscode/settings.json", "r") as f:
-            settings = json.load(f)
-    except FileNotFoundError:
-        logger.warning(".vscode/settings.json not found")
-        return
-    except json.JSONDecodeError:
-        logger.error("Error decoding .vscode/settings.json")
+        mtime_ns = os.stat(path).st_mtime_ns
+    except OSError:
+        return None
+
+    cached = _settings_cache.get(path)
+    if cached and cached[0] == mtime_ns:
+        return cached[1]
+
+    try:
+        with open(path, "r") as f:
+            settings = json.loads(_strip_jsonc(f.read()))
+    except (OSError, json.JSONDecodeError):
+        logger.error(f"Error decoding {path}")
+        settings = None
+    _settings_cache[path] = (mtime_ns, settings, {})
+    return settings
+
+
+def resolve_language_settings(root: str, language_id: str) -> Optional[dict]:
+    """Return the settings of a language: the global settings overridden by the
+    language sections (e.g. "[python]" or "[javascript][typescript]")."""
+    settings = load_vscode_settings(root)
+    if settings is None:
+        return None
+
+    resolved_per_language = _settings_cache[
+        os.path.join(os.path.abspath(root), ".vscode", "settings.json")
+    ][2]
+    if language_id not in resolved_per_language:
+        resolved = {k: v for k, v in settings.items() if not k.startswith("[")}
+        for key, section in settings.items():
+            if key.startswith("[") and language_id in re.findall(r"\[([^\]]+)\]", key):
+                resolved.update(section)
+        resolved_per_language[language_id] = resolved
+    return resolved_per_language[language_id]
+
+
+def lint_text(file_path: str, text: str, root: Optional[str] = None):
+    """Format and lint the content of a file in memory, before it is written.
+    Returns (new text, report), or None if the linter has to run on the
+    written file instead (no in-memory linter for these settings).
+    Args:
+        file_path: The file the content is for.
+        text: The content to format and lint.
+        root: The directory containing .vscode/ (defaults to the current directory).
+    """
+    root = root or os.getcwd()
+    language_id = LANGUAGE_IDS.get(os.path.splitext(file_path)[1].lower())
+    if language_id is None:
+        return text, None
+    if language_id != "python" or RUFF_BACKEND != "server":
+        return None
+
+    language_settings = resolve_language_settings(root, language_id)
+    if (
+        language_settings is None
+        or language_settings.get("editor.defaultFormatter") != "charliermarsh.ruff"
+    ):
+        return None
+    try:
+        return get_ruff_server(root).lint_text(
+            file_path,
+            text,
+            apply_format=language_settings.get("editor.formatOnSave"),
+            code_actions=language_settings.get("editor.codeActionsOnSave", {}),
+        )
+    except RuffServerError as e:
+        logger.warning(f"ruff server failed, running ruff commands: {e}")
+        return None
+
+
+def apply_linter(file_path: str = None, root: Optional[str] = None):
+    """Apply linter based on .vscode/settings.json, and return its report
+    Args:
+        file_path: The file to format and lint.
+        root: The directory containing .vscode/ (defaults to the current directory).
+    """
+    return apply_linters([file_path], root=root)
+
+
+def apply_linters(file_paths: list, root: Optional[str] = None):
+    """Apply linter based on .vscode/settings.json to several files at once,
+    and return the combined report (None if no file has a linter)
+    Args:
+        file_paths: The files to format and lint.
+        root: The directory containing .vscode/ (defaults to the current directory).
+    """
+    root = root or os.getcwd()
+    files_per_language = {}
+    for file_path in file_paths:
+        language_id = LANGUAGE_IDS.get(os.path.splitext(file_path)[1].lower())
+        if language_id is not None:
+            files_per_language.setdefault(language_id, []).append(file_path)
+    if not files_per_language:
         return
 
-    # Check for Python-related settings
-    python_settings = settings.get("[python]", {})
-
-    # If file is .py
-    if file_path.endswith(".py"):
-        default_formatter = python_settings.get("editor.defaultFormatter")
-        if default_formatter == "charliermarsh.ruff":
-            # Formatter
-            if python_settings.get("editor.formatOnSave"):
-                apply_ruff_formatter(file_path)
-
-            # Linter
-            code_actions = python_settings.get("editor.codeActionsOnSave", {})
-            if code_actions:
-                apply_ruff_linter(file_path, code_actions)
-        else:
+    reports = []
+    for language_id, language_files in files_per_language.items():
+        language_settings = resolve_language_settings(root, language_id)
+        if language_settings is None:
+            logger.warning(f"{root}/.vscode/settings.json not found or invalid")
+            return
+
+        default_formatter = language_settings.get("editor.defaultFormatter")
+        if language_id == "python" and default_formatter == "charliermarsh.ruff":
+            reports.append(_apply_ruff(root, language_files, language_settings))
+        elif (language_id == "python" or default_formatter) and (
+            default_formatter not in _warned_formatters
+        ):
+            _warned_formatters.add(default_formatter)
             logger.warning(
                 f"Default formatter is {default_formatter}, but not implemented"
             )
+
+    if reports:
+        return "".join(report for report in reports if report)
+
+
+def _apply_ruff(root: str, file_paths: list, language_settings: dict) -> str:
+    """Format and lint python files with ruff, return the combined report."""
+    format_on_save = language_settings.get("editor.formatOnSave")
+    code_actions = language_settings.get("editor.codeActionsOnSave", {})
+
+    if RUFF_BACKEND == "server":
+        try:
+            server = get_ruff_server(root)
+            reports = [
+                server.lint_file(
+                    file_path, apply_format=format_on_save, code_actions=code_actions
+                )
+                for file_path in file_paths
+            ]
+            return "\n".join(report for report in reports if report)
+        except RuffServerError as e:
+            logger.warning(f"ruff server failed, running ruff commands: {e}")
+
+    # One ruff process per step for all the files
+    report = ""
+    # Formatter
+    if format_on_save:
+        report += apply_ruff_formatter(file_paths)
+
+    # Linter
+    if code_actions:
+        report += apply_ruff_linter(file_paths, code_actions)
+    return report
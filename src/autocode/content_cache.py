@@ -0,0 +1,46 @@
+from collections import OrderedDict
+from typing import Optional
+
+DEFAULT_MAX_CHARS = 2_000_000
+
+
+class ContentCache:
+    """LRU cache of rendered file contents, bounded by their total characters.
+
+    Keys are (path, mtime_ns, size, start_line, end_line), so an entry is
+    naturally missed once the file changes on disk. Writers can also
+    invalidate a path directly.
+    """
+
+    def __init__(self, max_chars: int = DEFAULT_MAX_CHARS):
+        self.max_chars = max_chars
+        self._entries = OrderedDict()
+        self._chars = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key: tuple) -> Optional[str]:
+        content = self._entries.get(key)
+        if content is not None:
+            self._entries.move_to_end(key)
+        return content
+
+    def put(self, key: tuple, content: str):
+        if len(content) > self.max_chars:
+            return
+        self._pop(key)
+        self._entries[key] = content
+        self._chars += len(content)
+        while self._chars > self.max_chars:
+            self._pop(next(iter(self._entries)))
+
+    def _pop(self, key: tuple):
+        content = self._entries.pop(key, None)
+        if content is not None:
+            self._chars -= len(content)
+
+    def invalidate(self, path: str):
+        """Drop all the entries of a path."""
+        for key in [key for key in self._entries if key[0] == path]:
+            self._pop(key)
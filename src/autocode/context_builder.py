@@ -0,0 +1,105 @@
+import os
+
+DIRECTORY_BUDGET_SHARE = 0.25  # Share of the budget the directory listing can use
+EDIT_WINDOW_LINES = 4  # Lines shown around a recent edit
+MAX_EDIT_WINDOWS = 5  # Recent edits remembered per file
+
+
+def _build_tree(rel_paths: list) -> dict:
+    """Nest relative paths into dicts (directories) and None (files)."""
+    tree = {}
+    for rel_path in rel_paths:
+        node = tree
+        *directories, name = rel_path.split("/")
+        for directory in directories:
+            node = node.setdefault(directory, {})
+        node[name] = None
+    return tree
+
+
+def _count_files(tree: dict) -> int:
+    return sum(1 if node is None else _count_files(node) for node in tree.values())
+
+
+def _render_tree(tree: dict, max_depth: int, depth: int = 0) -> tuple:
+    """Render the tree, collapsing directories deeper than max_depth.
+    Returns the lines and whether any directory was collapsed."""
+    lines, collapsed = [], False
+    indent = "  " * depth
+    # Directories first, then files
+    for name, node in sorted(tree.items(), key=lambda item: (item[1] is None, item[0])):
+        if node is None:
+            lines.append(f"{indent}{name}")
+        elif depth + 1 >= max_depth:
+            lines.append(f"{indent}{name}/ ({_count_files(node)} files)")
+            collapsed = True
+        else:
+            lines.append(f"{indent}{name}/")
+            sub_lines, sub_collapsed = _render_tree(node, max_depth, depth + 1)
+            lines.extend(sub_lines)
+            collapsed = collapsed or sub_collapsed
+    return lines, collapsed
+
+
+def summarize_directory(files: list, root: str, max_chars: int) -> str:
+    """List the files, or a tree collapsed deep enough to fit in max_chars."""
+    listing = "\n".join(files)
+    if len(listing) <= max_chars:
+        return listing
+
+    rel_paths = [os.path.relpath(path, root).replace(os.sep, "/") for path in files]
+    tree = _build_tree(rel_paths)
+    best, max_depth = None, 1
+    while True:
+        lines, collapsed = _render_tree(tree, max_depth)
+        summary = "\n".join(lines)
+        if best is not None and len(summary) > max_chars:
+            break
+        best = summary
+        if not collapsed:
+            break
+        max_depth += 1
+
+    if len(best) > max_chars:
+        # Even the top level does not fit: cut it
+        lines = best[:max_chars].split("\n")[:-1]
+        hidden = best.count("\n") + 1 - len(lines)
+        best = "\n".join(lines + [f"... ({hidden} more entries)"])
+    return (
+        f"{len(files)} files (summarized, directories show their file count):\n{best}"
+    )
+
+
+def edit_windows(edited_lines: list, line_count: int) -> list:
+    """Merge the (start, end) edited line ranges into windows with surrounding lines."""
+    windows = []
+    for start, end in sorted(edited_lines):
+        start = max(start - EDIT_WINDOW_LINES, 1)
+        end = min(end + EDIT_WINDOW_LINES, line_count)
+        if start > end:
+            continue
+        if windows and start <= windows[-1][1] + 1:
+            windows[-1] = (windows[-1][0], max(end, windows[-1][1]))
+        else:
+            windows.append((start, end))
+    return windows
+
+
+def shift_edit_windows(
+    edited_lines: list, start: int, deleted: int, inserted: int
+) -> list:
+    """Move the (start, end) edited line ranges after an edit replacing `deleted`
+    lines at `start` with `inserted` lines, and add the range of this edit."""
+    delta = inserted - deleted
+    end = start + max(inserted, 1) - 1
+    shifted = []
+    for edit_start, edit_end in edited_lines:
+        if edit_end < start:
+            shifted.append((edit_start, edit_end))
+        elif edit_start >= start + deleted:
+            shifted.append((edit_start + delta, edit_end + delta))
+        else:
+            # Overlaps the edit: keep what remains of it around the new lines
+            shifted.append((min(edit_start, start), max(edit_end + delta, end)))
+    shifted.append((start, end))
+    return shifted
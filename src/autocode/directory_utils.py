@@ -1,5 +1,7 @@
-from fnmatch import fnmatch
+import os
+import re
 from pathlib import Path
+from typing import Optional
 
 DEFAULT_IGNORE_PATTERNS = [
     "**/.git/**",
@@ -8,7 +10,7 @@ DEFAULT_IGNORE_PATTERNS = [
     "**/CVS/**",
     "**/.DS_Store",
     "**/Thumbs.db",
-    "**/node_modules/**",  # TODO: add test for this
+    "**/node_modules/**",
     "**/bower_components/**",
     "**/*.code-search/**",
     "**/__pycache__/**",
@@ -16,6 +18,7 @@ DEFAULT_IGNORE_PATTERNS = [
 
 
 def _read_gitignore(gitignore_path: str) -> list:
+    """Return the patterns of a .gitignore file, without comments and blank lines."""
     ignored_patterns = []
 
     if Path(gitignore_path).exists():
@@ -24,21 +27,140 @@ def _read_gitignore(gitignore_path: str) -> list:
                 line = raw_line.strip()
                 if not line or line.startswith("#"):
                     continue
-
-                if line.endswith("/"):
-                    line += "**"  # e.g. ".venv/" -> ".venv/**"
-
-                if line.startswith("/"):
-                    line = line[1:]
-
-                # Store the pattern as-is
                 ignored_patterns.append(line)
-                # Also store a variant with **/ for deeper matching
-                ignored_patterns.append(f"**/{line}")
 
     return ignored_patterns
 
 
+def _glob_to_regex(glob: str) -> str:
+    """Translate a gitignore glob to a regex ("*" does not cross "/", "**" does)."""
+    regex = []
+    i, n = 0, len(glob)
+    while i < n:
+        c = glob[i]
+        if glob.startswith("**/", i) and (i == 0 or glob[i - 1] == "/"):
+            regex.append("(?:.*/)?")
+            i += 3
+        elif glob.startswith("**", i):
+            regex.append(".*")
+            i += 2
+        elif c == "*":
+            regex.append("[^/]*")
+            i += 1
+        elif c == "?":
+            regex.append("[^/]")
+            i += 1
+        elif c == "[":
+            end = glob.find("]", i + 2)
+            if end == -1:
+                regex.append(re.escape(c))
+                i += 1
+                continue
+            chars = glob[i + 1 : end]
+            if chars[0] in "!^":
+                chars = "^" + chars[1:]
+            regex.append("[" + chars.replace("\\", "\\\\") + "]")
+            i = end + 1
+        elif c == "\\" and i + 1 < n:
+            regex.append(re.escape(glob[i + 1]))
+            i += 2
+        else:
+            regex.append(re.escape(c))
+            i += 1
+    return "".join(regex)
+
+
+def _translate_pattern(pattern: str) -> Optional[str]:
+    """Translate a gitignore pattern to a regex matching the ignored paths.
+
+    Paths are matched relative to the .gitignore directory, with a trailing "/"
+    for directories. A matching path also ignores everything below it.
+    Negated patterns ("!pattern") are not supported and are skipped.
+    """
+    if pattern.startswith("!"):
+        return None
+    dir_only = pattern.endswith("/")
+    pattern = pattern.rstrip("/")
+    # A slash at the beginning or in the middle anchors the pattern
+    anchored = "/" in pattern
+    pattern = pattern.lstrip("/")
+    if not pattern:
+        return None
+
+    prefix = "" if anchored else "(?:.*/)?"
+    suffix = "/.*" if dir_only else "(?:/.*)?"
+    return prefix + _glob_to_regex(pattern) + suffix
+
+
+def _compile_patterns(patterns: list) -> Optional[re.Pattern]:
+    """Combine gitignore patterns into a single compiled regex."""
+    regexes = [r for r in map(_translate_pattern, patterns) if r is not None]
+    if not regexes:
+        return None
+    return re.compile("|".join(f"(?:{r})" for r in regexes))
+
+
+_DEFAULT_IGNORE_REGEX = _compile_patterns(DEFAULT_IGNORE_PATTERNS)
+
+
+class GitignoreMatcher:
+    """Decide whether paths under a root directory are ignored.
+
+    The patterns of each .gitignore are compiled into one regex per directory
+    level, and kept until the mtime of the .gitignore file changes.
+    """
+
+    def __init__(self, root: str):
+        self.root = os.path.abspath(root)
+        # directory -> (.gitignore mtime, compiled regex)
+        self._levels = {}
+        # directories whose .gitignore was checked since the last refresh
+        self._checked = set()
+
+    def refresh(self):
+        """Check the .gitignore files again on the next lookups."""
+        self._checked.clear()
+
+    def _level_regex(self, directory: str) -> Optional[re.Pattern]:
+        cached = self._levels.get(directory)
+        if cached and directory in self._checked:
+            return cached[1]
+
+        gitignore_path = os.path.join(directory, ".gitignore")
+        try:
+            mtime_ns = os.stat(gitignore_path).st_mtime_ns
+        except OSError:
+            mtime_ns = None
+
+        if not cached or cached[0] != mtime_ns:
+            regex = None
+            if mtime_ns is not None:
+                regex = _compile_patterns(_read_gitignore(gitignore_path))
+            cached = (mtime_ns, regex)
+            self._levels[directory] = cached
+        self._checked.add(directory)
+        return cached[1]
+
+    def is_ignored(self, path: str, is_dir: bool = False) -> bool:
+        """Check if an absolute path is ignored by default patterns or .gitignore files."""
+        rel_path = os.path.relpath(path, self.root).replace(os.sep, "/")
+        trailing = "/" if is_dir else ""
+        if _DEFAULT_IGNORE_REGEX.fullmatch(rel_path + trailing):
+            return True
+        if rel_path.startswith("../"):
+            return False
+
+        parts = rel_path.split("/")
+        directory = self.root
+        for i in range(len(parts)):
+            if i:
+                directory = os.path.join(directory, parts[i - 1])
+            regex = self._level_regex(directory)
+            if regex and regex.fullmatch("/".join(parts[i:]) + trailing):
+                return True
+        return False
+
+
 def find_repository_root(directory: str) -> Path:
     directory_path = Path(directory).resolve()
     repo_root = directory_path
@@ -51,49 +173,45 @@ def find_repository_root(directory: str) -> Path:
     raise ValueError("Repository root not found")
 
 
-def list_non_gitignore_files(directory: str = ".") -> list:
-    """List all files in the directory, excluding those in .gitignore, .git/, and .gitignore files themselves."""
-    directory_path = Path(directory).resolve()
-    try:
-        repo_root = find_repository_root(directory_path)
-    except ValueError:
-        repo_root = directory_path
+_matchers = {}
 
-    def should_ignore(file_path: Path, gitignore_patterns: dict) -> bool:
-        # Check against default ignore patterns first
-        rel_path = str(file_path.relative_to(directory_path).as_posix())
-        for pattern in DEFAULT_IGNORE_PATTERNS:
-            if fnmatch(rel_path, pattern):
-                return True
-
-        for parent in file_path.parents:
-            parent_patterns = gitignore_patterns.get(str(parent), [])
-            rel_path = file_path.relative_to(parent).as_posix()
-            for pattern in parent_patterns:
-                if pattern.endswith("/"):
-                    # If the pattern ends with '/', match it as a directory
-                    if fnmatch(rel_path, pattern) or fnmatch(rel_path, f"{pattern}**"):
-                        return True
-                elif fnmatch(rel_path, pattern) or rel_path.startswith(f"{pattern}/"):
-                    return True
-        return False
 
-    # Collect all .gitignore files and their patterns
-    gitignore_patterns = {}
-    for gitignore_file in repo_root.rglob(".gitignore"):
-        patterns = _read_gitignore(str(gitignore_file))
-        gitignore_patterns[str(gitignore_file.parent)] = patterns
+def get_gitignore_matcher(directory: str) -> GitignoreMatcher:
+    """Return the matcher of the repository containing the directory (shared between calls)."""
+    try:
+        root = str(find_repository_root(directory))
+    except ValueError:
+        root = str(Path(directory).resolve())
+    if root not in _matchers:
+        _matchers[root] = GitignoreMatcher(root)
+    return _matchers[root]
 
-    # Add .git/ to ignored patterns for the root directory
-    root_patterns = gitignore_patterns.get(str(directory_path), [])
-    root_patterns.extend([".git/", "**/.git/"])
-    gitignore_patterns[str(directory_path)] = root_patterns
 
-    # Collect all files under the directory
+def _walk_files(directory: str, matcher: GitignoreMatcher) -> list:
+    """Walk the directory with os.scandir, without descending into ignored directories."""
     files = []
-    for file_path in directory_path.rglob("*"):
-        if file_path.is_file():
-            if not should_ignore(file_path, gitignore_patterns):
-                files.append(str(file_path))
-
+    stack = [directory]
+    while stack:
+        current = stack.pop()
+        try:
+            with os.scandir(current) as entries:
+                for entry in entries:
+                    if entry.is_dir(follow_symlinks=False):
+                        if not matcher.is_ignored(entry.path, is_dir=True):
+                            stack.append(entry.path)
+                    elif entry.is_file() and not matcher.is_ignored(entry.path):
+                        files.append(entry.path)
+        except OSError:
+            continue
     return files
+
+
+def list_non_gitignore_files(
+    directory: str = ".", matcher: Optional[GitignoreMatcher] = None
+) -> list:
+    """List all files in the directory, excluding those in .gitignore, .git/, and .gitignore files themselves."""
+    directory_path = Path(directory).resolve()
+    if matcher is None:
+        matcher = get_gitignore_matcher(str(directory_path))
+    matcher.refresh()
+    return _walk_files(str(directory_path), matcher)
@@ -7,15 +7,17 @@ and aggregate all file contents into one big text with headings.
 import logging
 import sys
 from pathlib import Path
+from typing import Optional
 
 from autocode.directory_utils import list_non_gitignore_files
+from autocode.file_index import FileIndex
+from autocode.tokens import CHARS_PER_TOKEN, estimate_token_count
 
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.INFO)
 
 LONG_FILE_THRESHOLD = 1_000  # A file with more than 1000 lines is considered long
 TOKEN_LIMIT_WARNING = 128_000  # Warning threshold for token count
-CHARS_PER_TOKEN = 4  # Approximation of characters per token
 
 
 def build_tree_structure(root_dir: Path, tracked_files: set):
@@ -77,21 +79,18 @@ def collect_files_content(root_dir: Path, tracked_files: set):
     return sorted(file_contents)
 
 
-def estimate_token_count(text: str) -> int:
-    """
-    Estimate the token count of a text using a simple character-based approximation.
-    Uses 4 characters per token as a rough approximation.
-    """
-    return len(text) // CHARS_PER_TOKEN
-
-
-def prepare_export(directory: str):
+def prepare_export(directory: str, file_index: Optional[FileIndex] = None):
     """
     Prepare the export of a directory.
+    If a file index of the directory is given, the files are listed from it.
     """
     repo_path = Path(directory).resolve()
     print(f"Preparing export of {repo_path}")
-    tracked_files = {Path(f) for f in list_non_gitignore_files(str(repo_path))}
+    if file_index:
+        files = file_index.files()
+    else:
+        files = list_non_gitignore_files(str(repo_path))
+    tracked_files = {Path(f) for f in files}
     print(f"Found {len(tracked_files)} tracked files")
     export = f"Export of {repo_path}\n\n"
 
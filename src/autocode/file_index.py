@@ -0,0 +1,205 @@
+import logging
+import os
+import threading
+import time
+from typing import Optional
+
+from autocode.directory_utils import get_gitignore_matcher
+
+try:
+    from watchdog.events import FileSystemEventHandler
+    from watchdog.observers import Observer
+except ImportError:  # watchdog is optional (autocode[watch]), fall back to polling
+    FileSystemEventHandler = object
+    Observer = None
+
+logger = logging.getLogger(__name__)
+
+# A directory modified less than this before it was scanned may change again
+# without a visible mtime change (coarse timestamps), so it is polled until then
+RACY_MTIME_NS = 2_000_000_000
+POLL_INTERVAL_SECONDS = 1.0  # Minimum time between two polls of the directories
+
+
+class _DirtyDirectoriesHandler(FileSystemEventHandler):
+    """Forward filesystem events to the index as dirty directories."""
+
+    def __init__(self, index: "FileIndex"):
+        self.index = index
+
+    def on_any_event(self, event):
+        for path in (event.src_path, getattr(event, "dest_path", None)):
+            if path:
+                self.index.notify(os.fsdecode(path))
+
+
+class FileIndex:
+    """Keep the list of non-gitignored files of a directory up to date.
+
+    The tree is walked once, on first use. Afterwards, only the directories
+    that changed are scanned again. Changes are reported by a watchdog
+    observer (inotify on Linux) when watchdog is installed, otherwise found
+    by comparing the mtimes of the indexed directories, at most once per
+    poll_interval seconds (the changes made through notify are seen at once).
+    """
+
+    def __init__(
+        self,
+        directory: str = ".",
+        watch: bool = True,
+        poll_interval: float = POLL_INTERVAL_SECONDS,
+    ):
+        self.directory = os.path.abspath(directory)
+        self.matcher = get_gitignore_matcher(self.directory)
+        # directory -> (mtime_ns, .gitignore mtime_ns, files, subdirectories, scan time)
+        self._dirs = {}
+        self._dirty = set()
+        self._dirty_trees = set()
+        self._files = None
+        self._built = False
+        self._lock = threading.Lock()
+        self._observer = None
+        self.watch = watch and Observer is not None
+        self.poll_interval = poll_interval
+        self._polled_at = None  # time.monotonic() of the last poll
+
+    def _start_observer(self):
+        try:
+            self._observer = Observer()
+            self._observer.schedule(
+                _DirtyDirectoriesHandler(self), self.directory, recursive=True
+            )
+            self._observer.daemon = True
+            self._observer.start()
+        except OSError as e:
+            # e.g. inotify watch limit reached
+            logger.warning(f"Could not watch {self.directory}, polling instead: {e}")
+            self._observer = None
+            self.watch = False
+
+    def close(self):
+        """Stop watching the directory (the index is then kept up to date by polling)."""
+        if self._observer:
+            self._observer.stop()
+            self._observer.join()
+            self._observer = None
+        self.watch = False
+
+    def notify(self, path: str):
+        """Mark the directory containing a created, modified or deleted path as changed."""
+        path = os.path.abspath(path)
+        with self._lock:
+            if os.path.basename(path) == ".gitignore":
+                self._dirty_trees.add(os.path.dirname(path))
+            else:
+                self._dirty.add(os.path.dirname(path))
+                # the path itself may be a (deleted) directory
+                self._dirty.add(path)
+
+    def _stat_mtime(self, path: str) -> Optional[int]:
+        try:
+            return os.stat(path).st_mtime_ns
+        except OSError:
+            return None
+
+    def _scan_directory(self, directory: str):
+        """Index the direct children of a directory and return its new subdirectories."""
+        files, subdirs = set(), set()
+        try:
+            with os.scandir(directory) as entries:
+                for entry in entries:
+                    if entry.is_dir(follow_symlinks=False):
+                        if not self.matcher.is_ignored(entry.path, is_dir=True):
+                            subdirs.add(entry.path)
+                    elif entry.is_file() and not self.matcher.is_ignored(entry.path):
+                        files.add(entry.path)
+        except OSError:
+            self._remove_tree(directory)
+            return set()
+
+        previous = self._dirs.get(directory)
+        self._dirs[directory] = (
+            self._stat_mtime(directory),
+            self._stat_mtime(os.path.join(directory, ".gitignore")),
+            files,
+            subdirs,
+            time.time_ns(),
+        )
+        if previous:
+            for removed in previous[3] - subdirs:
+                self._remove_tree(removed)
+            return subdirs - previous[3]
+        return subdirs
+
+    def _scan_tree(self, directory: str):
+        stack = [directory]
+        while stack:
+            stack.extend(self._scan_directory(stack.pop()))
+
+    def _remove_tree(self, directory: str):
+        entry = self._dirs.pop(directory, None)
+        if entry:
+            for subdir in entry[3]:
+                self._remove_tree(subdir)
+
+    def _changed_directories(self):
+        """Poll the indexed directories for changes (fallback without watchdog)."""
+        dirty, dirty_trees = set(), set()
+        for directory, entry in self._dirs.items():
+            mtime_ns, gitignore_mtime_ns, _, _, scanned_ns = entry
+            if self._stat_mtime(os.path.join(directory, ".gitignore")) != (
+                gitignore_mtime_ns
+            ):
+                dirty_trees.add(directory)
+            elif (
+                self._stat_mtime(directory) != mtime_ns
+                or mtime_ns is None
+                or scanned_ns - mtime_ns < RACY_MTIME_NS
+            ):
+                dirty.add(directory)
+        return dirty, dirty_trees
+
+    def refresh(self):
+        """Scan again the directories that changed since the last refresh."""
+        self.matcher.refresh()
+        if not self._built:
+            if self.watch:
+                self._start_observer()
+            self._scan_tree(self.directory)
+            self._built = True
+            self._polled_at = time.monotonic()
+            self._files = None
+            return
+
+        with self._lock:
+            dirty, self._dirty = self._dirty, set()
+            dirty_trees, self._dirty_trees = self._dirty_trees, set()
+        now = time.monotonic()
+        if not self.watch and now - self._polled_at >= self.poll_interval:
+            self._polled_at = now
+            polled, polled_trees = self._changed_directories()
+            dirty |= polled
+            dirty_trees |= polled_trees
+
+        for directory in sorted(dirty_trees):
+            if directory in self._dirs:
+                self._remove_tree(directory)
+                self._scan_tree(directory)
+        # Dirty paths can be files or new directories: scan their indexed parent
+        to_scan = {
+            path if path in self._dirs else os.path.dirname(path) for path in dirty
+        }
+        for directory in sorted(to_scan):
+            if directory in self._dirs:
+                self._scan_tree(directory)
+        if dirty or dirty_trees:
+            self._files = None
+
+    def files(self) -> list:
+        """Return the non-gitignored files of the directory."""
+        self.refresh()
+        if self._files is None:
+            self._files = [
+                path for entry in self._dirs.values() for path in sorted(entry[2])
+            ]
+        return list(self._files)
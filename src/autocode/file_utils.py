@@ -0,0 +1,64 @@
+import os
+import stat
+import tempfile
+from typing import Iterable
+
+
+class FileConflictError(Exception):
+    """A file was modified by someone else since it was last read."""
+
+
+def _current_umask() -> int:
+    umask = os.umask(0)
+    os.umask(umask)
+    return umask
+
+
+# Read once: changing the umask to read it is not thread-safe
+_DEFAULT_MODE = 0o666 & ~_current_umask()
+
+
+def _fsync_directory(directory: str):
+    """Persist a rename in a directory (not supported on every platform)."""
+    try:
+        fd = os.open(directory, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+def atomic_write(path: str, chunks: Iterable[str], fsync: bool = False):
+    """Write text chunks to a temporary file next to path, then rename it over path.
+    Readers never see a partially written file. The permissions of an existing
+    file are kept. With fsync, the data is on disk before the rename."""
+    directory = os.path.dirname(os.path.abspath(path))
+    try:
+        mode = stat.S_IMODE(os.stat(path).st_mode)
+    except FileNotFoundError:
+        mode = _DEFAULT_MODE
+
+    fd, tmp_path = tempfile.mkstemp(
+        dir=directory, prefix=f".{os.path.basename(path)}.", suffix=".tmp"
+    )
+    try:
+        with os.fdopen(fd, "w", newline="") as f:
+            for chunk in chunks:
+                f.write(chunk)
+            if fsync:
+                f.flush()
+                os.fsync(f.fileno())
+        os.chmod(tmp_path, mode)
+        os.replace(tmp_path, path)
+        if fsync:
+            _fsync_directory(directory)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
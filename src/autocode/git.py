@@ -8,13 +8,18 @@ from typing import Optional, Union
 
 from github import Github, GithubException
 
+from autocode.git_backend import GitError, get_repository
+
 logger = logging.getLogger(__name__)
 
 
 class Git:
     def __llm__(self):
         """Get the status of the git repository."""
-        return self.status()
+        try:
+            return get_repository().status().summary()
+        except GitError:
+            return self.status()
 
     @staticmethod
     def create_branch_and_checkout(name: str):
@@ -32,10 +37,25 @@ class Git:
     @staticmethod
     def branch():
         """Get the current branch of the git repository."""
-        result = subprocess.run(
-            ["git", "rev-parse", "--abbrev-ref", "HEAD"], capture_output=True, text=True
-        )
-        return result.stdout.strip()
+        try:
+            return get_repository().branch()  # Read from .git/HEAD
+        except GitError:
+            return ""
+
+    @staticmethod
+    def show_file(path: str, revision: str = "HEAD"):
+        """Get the content of a file at a revision (e.g. to compare it with the working tree).
+        Args:
+            path: The path of the file, relative to the root of the repository.
+            revision: The commit, branch or tag.
+        """
+        try:
+            content = get_repository().read_file(path, revision)
+        except (GitError, ValueError) as e:
+            return str(e)
+        if content is None:
+            return f"{path} does not exist at {revision}"
+        return content
 
     @staticmethod
     def checkout(branch: str):
@@ -49,6 +69,13 @@ class Git:
         """Get the status of the git repository."""
         return subprocess.run(["git", "status"], capture_output=True, text=True).stdout
 
+    @staticmethod
+    def status_structured():
+        """Get the status of the git repository: the branch, and the staged,
+        unstaged, untracked and conflicted paths (summarized per directory when
+        there are many)."""
+        return get_repository().status()
+
     @staticmethod
     def diff(path: Union[str, None] = None):
         """Get the diff of the git repository."""
@@ -98,8 +125,11 @@ class PullRequest:
         Args:
             description (str): A detailed description of the changes made in this PR.
         """
+        # Get the current branch name and repo information
+        current_branch = Git.branch()
+
         push_result = subprocess.run(
-            ["git", "push", "--set-upstream", "origin", Git.branch()],
+            ["git", "push", "--set-upstream", "origin", current_branch],
             capture_output=True,
             text=True,
         )
@@ -108,21 +138,13 @@ class PullRequest:
             logger.error(f"Failed to push to remote: {push_result.stderr}")
             return push_result.stderr
 
-        # Get the current branch name and repo information
-        current_branch = Git.branch()
-
         # Get the remote URL to determine GitHub repo details
-        remote_url_result = subprocess.run(
-            ["git", "config", "--get", "remote.origin.url"],
-            capture_output=True,
-            text=True,
-        )
-
-        if remote_url_result.returncode != 0:
-            logger.error(f"Failed to get remote URL: {remote_url_result.stderr}")
-            return f"Branch pushed but couldn't create PR: {remote_url_result.stderr}"
-
-        remote_url = remote_url_result.stdout.strip()
+        remote_url = get_repository().config("remote.origin.url")
+        if not remote_url:
+            logger.error("Failed to get remote URL")
+            return (
+                "Branch pushed but couldn't create PR: no remote.origin.url configured"
+            )
 
         # Extract owner and repo from the URL
         # Format could be: https://github.com/owner/repo.git or git@github.com:owner/repo.git
@@ -0,0 +1,427 @@
+import atexit
+import logging
+import os
+import subprocess
+import threading
+from collections import OrderedDict
+from typing import Callable, Optional
+
+logger = logging.getLogger(__name__)
+
+OBJECT_CACHE_SIZE = 256  # Objects kept in memory, by object id
+OBJECT_TYPES = (b"blob", b"tree", b"commit", b"tag")
+MISSING_SUFFIXES = (b" missing", b" ambiguous")  # Headers of git cat-file --batch
+MAX_SYMBOLIC_REFS = 10  # Depth of symbolic refs followed (as git does)
+STATUS_MAX_ENTRIES = 50  # Changed paths listed in a status summary, per section
+STATUS_MAX_DIRECTORIES = 20  # Directories listed when there are more paths
+
+
+class GitError(Exception):
+    pass
+
+
+def _read(path: str) -> Optional[str]:
+    try:
+        with open(path, "r") as f:
+            return f.read().strip()
+    except OSError:
+        return None
+
+
+def _stat(path: str) -> Optional[tuple]:
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+
+def _find_git_dirs(root: str) -> tuple:
+    """Return the git directory (HEAD, index) and the common directory (refs,
+    objects, config) of the repository containing root."""
+    directory = root
+    while True:
+        dot_git = os.path.join(directory, ".git")
+        if os.path.isdir(dot_git):
+            git_dir = dot_git
+            break
+        content = _read(dot_git) if os.path.isfile(dot_git) else None
+        if content and content.startswith("gitdir:"):  # Worktree or submodule
+            git_dir = os.path.join(directory, content[len("gitdir:") :].strip())
+            break
+        parent = os.path.dirname(directory)
+        if parent == directory:
+            raise GitError(f"Not a git repository: {root}")
+        directory = parent
+
+    git_dir = os.path.normpath(git_dir)
+    common_dir = _read(os.path.join(git_dir, "commondir"))
+    if common_dir:
+        return git_dir, os.path.normpath(os.path.join(git_dir, common_dir))
+    return git_dir, git_dir
+
+
+class StatusEntry:
+    """A path of `git status --porcelain=v2`."""
+
+    def __init__(
+        self,
+        path: str,
+        index: str = ".",
+        worktree: str = ".",
+        kind: str = "changed",
+        original_path: Optional[str] = None,
+    ):
+        self.path = path
+        self.index = index  # Change in the index: . M T A D R C U ("." unchanged)
+        self.worktree = worktree  # Change in the working tree
+        self.kind = kind  # "changed", "renamed", "unmerged", "untracked" or "ignored"
+        self.original_path = original_path  # Path before a rename or a copy
+
+    def __repr__(self):
+        return f"StatusEntry({self.index}{self.worktree} {self.path!r})"
+
+    @property
+    def staged(self) -> bool:
+        return self.kind in ("changed", "renamed") and self.index != "."
+
+    @property
+    def unstaged(self) -> bool:
+        return self.kind in ("changed", "renamed") and self.worktree != "."
+
+    def describe(self, change: str) -> str:
+        if self.original_path and change in ("R", "C"):
+            return f"{change} {self.original_path} -> {self.path}"
+        return f"{change} {self.path}"
+
+
+class Status:
+    """The parsed output of `git status --porcelain=v2 --branch`."""
+
+    def __init__(self):
+        self.branch = None  # None when detached
+        self.head = None  # Commit id, None before the first commit
+        self.upstream = None
+        self.ahead = 0
+        self.behind = 0
+        self.entries = []
+
+    @classmethod
+    def parse(cls, output: str) -> "Status":
+        status = cls()
+        records = iter(output.split("\0"))
+        for record in records:
+            kind, _, rest = record.partition(" ")
+            if kind == "#":
+                name, _, value = rest.partition(" ")
+                if name == "branch.oid" and value != "(initial)":
+                    status.head = value
+                elif name == "branch.head" and value != "(detached)":
+                    status.branch = value
+                elif name == "branch.upstream":
+                    status.upstream = value
+                elif name == "branch.ab":
+                    ahead, behind = value.split()
+                    status.ahead, status.behind = int(ahead), -int(behind)
+            elif kind == "1":
+                fields = rest.split(" ", 7)
+                status.entries.append(StatusEntry(fields[7], *fields[0]))
+            elif kind == "2":
+                fields = rest.split(" ", 8)
+                # The original path is the next record
+                status.entries.append(
+                    StatusEntry(fields[8], *fields[0], "renamed", next(records))
+                )
+            elif kind == "u":
+                fields = rest.split(" ", 9)
+                status.entries.append(StatusEntry(fields[9], *fields[0], "unmerged"))
+            elif kind == "?":
+                status.entries.append(StatusEntry(rest, "?", "?", "untracked"))
+            elif kind == "!":
+                status.entries.append(StatusEntry(rest, "!", "!", "ignored"))
+        return status
+
+    @property
+    def staged(self) -> list:
+        return [entry for entry in self.entries if entry.staged]
+
+    @property
+    def unstaged(self) -> list:
+        return [entry for entry in self.entries if entry.unstaged]
+
+    @property
+    def untracked(self) -> list:
+        return [entry for entry in self.entries if entry.kind == "untracked"]
+
+    @property
+    def conflicted(self) -> list:
+        return [entry for entry in self.entries if entry.kind == "unmerged"]
+
+    def __str__(self):
+        return self.summary()
+
+    def summary(
+        self,
+        max_entries: int = STATUS_MAX_ENTRIES,
+        max_directories: int = STATUS_MAX_DIRECTORIES,
+    ) -> str:
+        """A short text of the status: the paths of each section, or the number
+        of paths per directory for the sections with more than max_entries."""
+        branch = f"On branch {self.branch}" if self.branch else "HEAD detached"
+        if self.head is None:
+            branch += " (no commits yet)"
+        if self.upstream:
+            branch += f", tracking {self.upstream}"
+            if self.ahead or self.behind:
+                branch += f" (ahead {self.ahead}, behind {self.behind})"
+        lines = [branch]
+
+        sections = [
+            ("Conflicts", self.conflicted, lambda entry: entry.index + entry.worktree),
+            ("Staged", self.staged, lambda entry: entry.index),
+            ("Not staged", self.unstaged, lambda entry: entry.worktree),
+            ("Untracked", self.untracked, lambda entry: "?"),
+        ]
+        for title, entries, change in sections:
+            if not entries:
+                continue
+            lines.append(f"{title} ({len(entries)}):")
+            if len(entries) <= max_entries:
+                lines.extend("  " + entry.describe(change(entry)) for entry in entries)
+                continue
+            directories = {}
+            for entry in entries:
+                directory = "/".join(entry.path.rstrip("/").split("/")[:-1][:2])
+                directories[directory] = directories.get(directory, 0) + 1
+            largest = sorted(directories.items(), key=lambda item: -item[1])
+            for directory, count in largest[:max_directories]:
+                lines.append(f"  {directory or '.'}/: {count} paths")
+            if len(largest) > max_directories:
+                lines.append(f"  ... and {len(largest) - max_directories} directories")
+        if len(lines) == 1:
+            lines.append("Nothing to commit, working tree clean")
+        return "\n".join(lines)
+
+
+_fsmonitor_supported = None
+
+
+def fsmonitor_supported() -> bool:
+    """Check if git has a builtin file system monitor on this platform."""
+    global _fsmonitor_supported
+    if _fsmonitor_supported is None:
+        result = subprocess.run(
+            ["git", "version", "--build-options"], capture_output=True, text=True
+        )
+        _fsmonitor_supported = "fsmonitor--daemon" in result.stdout
+    return _fsmonitor_supported
+
+
+class GitRepository:
+    """Cheap read-only queries on a git repository.
+
+    HEAD, the refs and the config are read from the files of the git directory,
+    and objects from a long-lived `git cat-file --batch` process, instead of a
+    git process per query. Results are cached until the files they were read
+    from change (e.g. HEAD, the refs or the index).
+    """
+
+    def __init__(self, root: str = "."):
+        self.root = os.path.abspath(root)
+        self.git_dir, self.common_dir = _find_git_dirs(self.root)
+        self.process = None
+        self._lock = threading.Lock()
+        self._cache = {}  # key -> (stamp of the files it depends on, value)
+        self._objects = OrderedDict()  # Object id -> (type, data), least recent first
+        atexit.register(self.close)
+
+    def cached(self, key, paths: list, compute: Callable):
+        """Return compute(), cached until one of the files changes (or appears)."""
+        stamp = tuple(_stat(path) for path in paths)
+        cached = self._cache.get(key)
+        if cached is not None and cached[0] == stamp:
+            return cached[1]
+        value = compute()
+        self._cache[key] = (stamp, value)
+        return value
+
+    def _packed_refs(self) -> dict:
+        path = os.path.join(self.common_dir, "packed-refs")
+
+        def parse():
+            refs = {}
+            for line in (_read(path) or "").splitlines():
+                if line and line[0] not in "#^":
+                    object_id, _, ref = line.partition(" ")
+                    refs[ref] = object_id
+            return refs
+
+        return self.cached("packed-refs", [path], parse)
+
+    def _read_ref(self, ref: str) -> Optional[str]:
+        """The content of a ref (an object id, or "ref: " and another ref)."""
+        if ref == "HEAD" or not ref.startswith("refs/"):
+            return _read(os.path.join(self.git_dir, ref))
+        return _read(os.path.join(self.common_dir, ref)) or self._packed_refs().get(ref)
+
+    def resolve_ref(self, ref: str = "HEAD") -> Optional[str]:
+        """Return the object id a ref points to, or None (e.g. on an unborn branch)."""
+        for _ in range(MAX_SYMBOLIC_REFS):
+            content = self._read_ref(ref)
+            if not content:
+                return None
+            if not content.startswith("ref: "):
+                return content
+            ref = content[len("ref: ") :]
+        return None
+
+    def head_commit(self) -> Optional[str]:
+        return self.resolve_ref("HEAD")
+
+    def branch(self) -> str:
+        """The current branch, or "HEAD" when detached (as `git rev-parse
+        --abbrev-ref HEAD`)."""
+        head = _read(os.path.join(self.git_dir, "HEAD")) or ""
+        if not head.startswith("ref: "):
+            return "HEAD"
+        ref = head[len("ref: ") :]
+        return ref[len("refs/heads/") :] if ref.startswith("refs/heads/") else ref
+
+    def _config_paths(self) -> list:
+        home = os.path.expanduser("~")
+        xdg_config = os.environ.get("XDG_CONFIG_HOME") or os.path.join(home, ".config")
+        return [
+            os.path.join(self.common_dir, "config"),
+            os.path.join(self.git_dir, "config.worktree"),
+            os.path.join(home, ".gitconfig"),
+            os.path.join(xdg_config, "git", "config"),
+        ]
+
+    def config(self, key: str) -> Optional[str]:
+        """Return the value of a config key (e.g. "remote.origin.url"), or None."""
+
+        def read_config():
+            result = subprocess.run(
+                ["git", "config", "--list", "-z"],
+                capture_output=True,
+                cwd=self.root,
+            )
+            values = {}
+            for entry in result.stdout.decode("utf-8", errors="replace").split("\0"):
+                name, _, value = entry.partition("\n")
+                if name:
+                    values[name] = value  # The last value wins, as for --get
+            return values
+
+        section, _, name = key.partition(".")
+        subsection, _, name = name.rpartition(".")
+        key = ".".join(
+            part for part in (section.lower(), subsection, name.lower()) if part
+        )
+        return self.cached("config", self._config_paths(), read_config).get(key)
+
+    def status(self) -> Status:
+        """Run `git status --porcelain=v2` with the untracked cache, and with the
+        builtin file system monitor when git has one (unless one is configured),
+        so that unchanged directories are not scanned again."""
+        args = ["git", "-c", "core.untrackedCache=true"]
+        if self.config("core.fsmonitor") is None and fsmonitor_supported():
+            args += ["-c", "core.fsmonitor=true"]
+        result = subprocess.run(
+            args + ["status", "--porcelain=v2", "-z", "--branch"],
+            capture_output=True,
+            cwd=self.root,
+        )
+        if result.returncode != 0:
+            raise GitError(result.stderr.decode("utf-8", errors="replace").strip())
+        return Status.parse(result.stdout.decode("utf-8", errors="replace"))
+
+    def _ensure_started(self):
+        if self.process is not None and self.process.poll() is None:
+            return
+        if self.process is not None:
+            logger.warning("git cat-file exited, restarting it")
+        try:
+            self.process = subprocess.Popen(
+                ["git", "cat-file", "--batch"],
+                stdin=subprocess.PIPE,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.DEVNULL,
+                cwd=self.root,
+            )
+        except OSError as e:
+            raise GitError(f"Could not start git cat-file: {e}") from e
+
+    def read_object(self, revision: str) -> Optional[tuple]:
+        """Return the (type, data) of an object, or None if it does not exist.
+
+        Args:
+            revision: An object id, or a revision such as "HEAD" or "HEAD:path"
+        """
+        if "\n" in revision:
+            raise ValueError("Invalid revision")
+        if revision in self._objects:
+            self._objects.move_to_end(revision)
+            return self._objects[revision]
+
+        with self._lock:
+            self._ensure_started()
+            try:
+                self.process.stdin.write(revision.encode("utf-8") + b"\n")
+                self.process.stdin.flush()
+                header = self.process.stdout.readline()
+                fields = header.rstrip(b"\n").rsplit(b" ", 2)
+                found = not header.rstrip(b"\n").endswith(MISSING_SUFFIXES)
+                if found:
+                    if (
+                        len(fields) != 3
+                        or fields[1] not in OBJECT_TYPES
+                        or not fields[2].isdigit()
+                    ):
+                        self.process.kill()
+                        raise GitError(f"Unexpected git cat-file output: {header!r}")
+                    object_id, object_type, size = fields
+                    data = self.process.stdout.read(int(size))
+                    self.process.stdout.read(1)  # Newline after the content
+            except OSError as e:
+                self.process.kill()
+                raise GitError(f"git cat-file failed: {e}") from e
+        if not header:
+            raise GitError("git cat-file exited")
+        if not found:  # "<revision> missing" or "<revision> ambiguous"
+            return None
+
+        result = (object_type.decode(), data)
+        self._objects[object_id.decode()] = result
+        while len(self._objects) > OBJECT_CACHE_SIZE:
+            self._objects.popitem(last=False)
+        return result
+
+    def read_file(self, path: str, revision: str = "HEAD") -> Optional[str]:
+        """Return the content of a file at a revision, or None if it does not exist."""
+        result = self.read_object(f"{revision}:{path}")
+        if result is None or result[0] != "blob":
+            return None
+        return result[1].decode("utf-8", errors="replace")
+
+    def close(self):
+        """Stop the git cat-file process."""
+        if self.process is not None and self.process.poll() is None:
+            self.process.stdin.close()
+            try:
+                self.process.wait(timeout=5)
+            except subprocess.TimeoutExpired:
+                self.process.kill()
+        self.process = None
+
+
+_repositories = {}
+
+
+def get_repository(root: str = ".") -> GitRepository:
+    """Return the repository of a root directory, shared between calls.
+    Raise GitError if it is not in a git repository."""
+    root = os.path.abspath(root)
+    if root not in _repositories:
+        _repositories[root] = GitRepository(root)
+    return _repositories[root]
@@ -0,0 +1,125 @@
+import os
+from bisect import bisect_right
+from typing import Iterator, Optional
+
+from autocode.file_utils import atomic_write
+
+CHUNK_LINES = 1024  # Lines per chunk: an edit only copies the chunks it touches
+
+
+class LineBuffer:
+    """The lines of a text file, stored in chunks so that line edits are applied
+    in place instead of copying the whole file.
+
+    Keeps the newline style of the file and whether it ends with a newline.
+    """
+
+    def __init__(
+        self, lines: list, newline: str = "\n", ends_with_newline: bool = True
+    ):
+        self.newline = newline
+        self.ends_with_newline = ends_with_newline
+        self._chunks = [
+            lines[i : i + CHUNK_LINES] for i in range(0, len(lines), CHUNK_LINES)
+        ]
+        self._starts = None  # First line index of each chunk, computed lazily
+        self.path = None
+        self.mtime_ns = None
+        self.size = None
+
+    @classmethod
+    def from_text(cls, text: str) -> "LineBuffer":
+        lines = text.split("\n")
+        ends_with_newline = lines[-1] == ""
+        if ends_with_newline:
+            lines.pop()
+        newline = "\n"
+        if lines and lines[0].endswith("\r"):
+            newline = "\r\n"
+            lines = [line[:-1] if line.endswith("\r") else line for line in lines]
+        return cls(lines, newline, ends_with_newline or not text)
+
+    @classmethod
+    def from_file(cls, path: str) -> "LineBuffer":
+        stat = os.stat(path)
+        with open(path, "r", newline="") as f:
+            buffer = cls.from_text(f.read())
+        buffer.path = path
+        buffer.mtime_ns, buffer.size = stat.st_mtime_ns, stat.st_size
+        return buffer
+
+    def is_current(self) -> bool:
+        """Check if the file has not changed since it was read or saved."""
+        try:
+            stat = os.stat(self.path)
+        except OSError:
+            return False
+        return (stat.st_mtime_ns, stat.st_size) == (self.mtime_ns, self.size)
+
+    def _chunk_starts(self) -> list:
+        if self._starts is None:
+            starts, position = [], 0
+            for chunk in self._chunks:
+                starts.append(position)
+                position += len(chunk)
+            self._starts = starts
+        return self._starts
+
+    def line_count(self) -> int:
+        starts = self._chunk_starts()
+        return starts[-1] + len(self._chunks[-1]) if starts else 0
+
+    def _locate(self, index: int) -> tuple:
+        """Return the (chunk, offset in the chunk) of a line index."""
+        chunk = max(bisect_right(self._chunk_starts(), index) - 1, 0)
+        return chunk, index - self._starts[chunk]
+
+    def lines(self, start: int = 0, end: Optional[int] = None) -> list:
+        """Return the lines [start, end) (0-indexed)."""
+        end = self.line_count() if end is None else min(end, self.line_count())
+        if start >= end:
+            return []
+        chunk, offset = self._locate(start)
+        lines = []
+        while len(lines) < end - start:
+            lines.extend(
+                self._chunks[chunk][offset : offset + end - start - len(lines)]
+            )
+            chunk, offset = chunk + 1, 0
+        return lines
+
+    def replace(self, start: int, end: int, new_lines: list):
+        """Replace the lines [start, end) (0-indexed) with new lines."""
+        if not self._chunks:
+            self._chunks = [[]]
+            self._starts = None
+        first, first_offset = self._locate(start)
+        last, last_offset = self._locate(end)
+        merged = (
+            self._chunks[first][:first_offset]
+            + list(new_lines)
+            + self._chunks[last][last_offset:]
+        )
+        self._chunks[first : last + 1] = [
+            merged[i : i + CHUNK_LINES] for i in range(0, len(merged), CHUNK_LINES)
+        ]
+        self._starts = None
+
+    def iter_text(self) -> Iterator[str]:
+        """Yield the text of the buffer, chunk by chunk."""
+        for i, chunk in enumerate(self._chunks):
+            if i:
+                yield self.newline
+            yield self.newline.join(chunk)
+        if self.ends_with_newline and self.line_count():
+            yield self.newline
+
+    def text(self) -> str:
+        return "".join(self.iter_text())
+
+    def save(self, path: Optional[str] = None, fsync: bool = False):
+        """Write the buffer to its file atomically."""
+        self.path = path or self.path
+        atomic_write(self.path, self.iter_text(), fsync=fsync)
+        stat = os.stat(self.path)
+        self.mtime_ns, self.size = stat.st_mtime_ns, stat.st_size
@@ -0,0 +1,131 @@
+import os
+from array import array
+from collections import OrderedDict
+from typing import Iterator
+
+CACHE_SIZE = 16  # Number of files kept in the cache
+CACHE_MAX_BYTES = 64_000_000  # Memory of the line indexes kept in the cache
+READ_BLOCK_SIZE = 1 << 20  # Bytes read at once while indexing the lines
+
+
+def split_lines(text: str) -> list:
+    """Split a text into lines on \\n only (and a \\r before it), the rule used
+    for every line number of the editor."""
+    lines = text.split("\n")
+    if lines[-1] == "":
+        lines.pop()
+    return [line[:-1] if line.endswith("\r") else line for line in lines]
+
+
+class LineIndexedFile:
+    """Read lines of a file by number, without reading the whole file.
+
+    Only the offsets of the line starts are kept in memory. They are indexed
+    lazily, by streaming the file only as far as the lines requested so far, and
+    the requested lines are read as a single byte range. The file is not
+    memory-mapped: a file truncated by another process would crash the reader.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        stat = os.stat(path)
+        self.mtime_ns = stat.st_mtime_ns
+        self.size = stat.st_size
+        self._offsets = array("q", [0] if self.size else [])
+        self._scanned = 0  # Bytes indexed so far
+        self._complete = not self.size
+
+    def is_current(self) -> bool:
+        """Check if the file has not changed since it was indexed."""
+        try:
+            stat = os.stat(self.path)
+        except OSError:
+            return False
+        return (stat.st_mtime_ns, stat.st_size) == (self.mtime_ns, self.size)
+
+    def memory(self) -> int:
+        """Bytes used by the line index."""
+        return len(self._offsets) * self._offsets.itemsize
+
+    def _index_until(self, line_count: int):
+        """Index the line starts until line_count lines are known (or the end)."""
+        if self._complete or len(self._offsets) >= line_count:
+            return
+        offsets = self._offsets
+        with open(self.path, "rb") as f:
+            f.seek(self._scanned)
+            while not self._complete and len(offsets) < line_count:
+                block = f.read(READ_BLOCK_SIZE)
+                newline = block.find(b"\n")
+                while newline != -1:
+                    # A newline ending the file does not start a line
+                    if self._scanned + newline + 1 < self.size:
+                        offsets.append(self._scanned + newline + 1)
+                    newline = block.find(b"\n", newline + 1)
+                self._scanned += len(block)
+                self._complete = not block or self._scanned >= self.size
+
+    def line_count(self) -> int:
+        self._index_until(float("inf"))
+        return len(self._offsets)
+
+    def _raw_lines(self, start: int, end: int) -> list:
+        """Return the raw lines [start, end), read as one byte range."""
+        self._index_until(end)
+        end = min(end, len(self._offsets))
+        if start >= end:
+            return []
+        first = self._offsets[start]
+        last = self._offsets[end] if end < len(self._offsets) else self.size
+        with open(self.path, "rb") as f:
+            f.seek(first)
+            data = f.read(last - first)
+        lines = data.split(b"\n")
+        if lines[-1] == b"":
+            lines.pop()
+        return [line[:-1] if line.endswith(b"\r") else line for line in lines]
+
+    def lines(self, start: int = 0, end: int = None, errors: str = "strict") -> list:
+        """Return the decoded lines [start, end) (0-indexed), split as split_lines."""
+        if end is None:
+            end = self.line_count()
+        return [
+            line.decode("utf-8", errors=errors)
+            for line in self._raw_lines(max(start, 0), end)
+        ]
+
+    def iter_lines(self, batch_size: int = 1000) -> Iterator[bytes]:
+        """Iterate over the raw lines, indexing them along the way."""
+        start = 0
+        while True:
+            batch = self._raw_lines(start, start + batch_size)
+            if not batch:
+                return
+            yield from batch
+            start += batch_size
+
+
+_cache = OrderedDict()
+
+
+def get_line_indexed_file(path: str) -> LineIndexedFile:
+    """Return the indexed file, cached per (path, mtime, size)."""
+    path = os.path.abspath(path)
+    cached = _cache.get(path)
+    if cached is not None:
+        if cached.is_current():
+            _cache.move_to_end(path)
+        else:
+            del _cache[path]
+            cached = None
+    if cached is None:
+        cached = LineIndexedFile(path)
+        _cache[path] = cached
+
+    # The indexes grow as they are used: bound their memory on every access
+    while _cache and (
+        len(_cache) > CACHE_SIZE
+        or sum(indexed.memory() for indexed in _cache.values()) > CACHE_MAX_BYTES
+    ):
+        _cache.popitem(last=False)
+    return cached
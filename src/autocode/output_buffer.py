@@ -0,0 +1,179 @@
+import os
+import tempfile
+import threading
+from collections import deque
+from typing import Callable, Optional
+
+OUTPUT_HEAD_CHARS = 10_000  # First characters of an output kept in memory
+OUTPUT_TAIL_CHARS = 40_000  # Last characters of an output kept in memory
+
+
+class OutputBuffer:
+    """The output of a command: its head and a ring buffer of its tail.
+
+    Memory stays bounded for commands that log continuously: once the output
+    overflows the head and the tail, the middle is dropped from memory and the
+    full output is written to a log file instead.
+
+    Offsets in the output only increase, so each consumer (e.g. the LLM view)
+    keeps a cursor on the output it has already seen.
+    """
+
+    def __init__(
+        self,
+        head_chars: int = OUTPUT_HEAD_CHARS,
+        tail_chars: int = OUTPUT_TAIL_CHARS,
+        log_directory: Optional[str] = None,
+    ):
+        self.head_chars = head_chars
+        self.tail_chars = tail_chars
+        self.log_directory = log_directory
+        self.log_path = None
+        self.size = 0  # Characters written so far
+        self.return_code = None
+        self.finished = False
+        self._head = []
+        self._head_size = 0
+        self._tail = deque()
+        self._tail_size = 0
+        self._log = None
+        self._closed = False
+        self._condition = threading.Condition()
+        self._listeners = []  # Called on each write and on finish
+        self._cursors = {}  # Consumer -> offset of the output it has seen
+
+    def __str__(self):
+        return self.text()
+
+    def write(self, text: str):
+        with self._condition:
+            if (
+                self._log is None
+                and not (self._closed or self.finished)
+                and self.size + len(text) > self.head_chars + self.tail_chars
+            ):
+                self._spill()
+            if self._log is not None:
+                self._log.write(text)
+                self._log.flush()
+            self.size += len(text)
+
+            if self._head_size < self.head_chars:
+                head = text[: self.head_chars - self._head_size]
+                self._head.append(head)
+                self._head_size += len(head)
+                text = text[len(head) :]
+            if text:
+                self._tail.append(text)
+                self._tail_size += len(text)
+                while self._tail_size > self.tail_chars:
+                    overflow = self._tail_size - self.tail_chars
+                    first = self._tail[0]
+                    if len(first) <= overflow:
+                        self._tail.popleft()
+                        self._tail_size -= len(first)
+                    else:
+                        self._tail[0] = first[overflow:]
+                        self._tail_size -= overflow
+            self._notify()
+
+    def _spill(self):
+        """Start writing the full output to a log file (before dropping any of it)."""
+        if self.log_directory:
+            os.makedirs(self.log_directory, exist_ok=True)
+        fd, self.log_path = tempfile.mkstemp(
+            prefix="output-", suffix=".log", dir=self.log_directory
+        )
+        self._log = os.fdopen(fd, "w")
+        self._log.write("".join(self._head) + "".join(self._tail))
+
+    def finish(self, return_code: Optional[int] = None):
+        """Mark the command as finished."""
+        with self._condition:
+            self.return_code = return_code
+            self.finished = True
+            if self._log is not None:
+                self._log.close()
+                self._log = None
+            self._notify()
+
+    def _notify(self):
+        self._condition.notify_all()
+        for listener in self._listeners:
+            listener()
+
+    def add_listener(self, listener: Callable):
+        """Call listener() after each write and when the command finishes (from
+        the thread writing, so it must be quick, e.g. loop.call_soon_threadsafe)."""
+        with self._condition:
+            self._listeners.append(listener)
+
+    def remove_listener(self, listener: Callable):
+        with self._condition:
+            self._listeners.remove(listener)
+
+    def wait(self, size: int, timeout: Optional[float] = None) -> bool:
+        """Wait until more than size characters were written or the command
+        finished. Return False on timeout."""
+        with self._condition:
+            return self._condition.wait_for(
+                lambda: self.size > size or self.finished, timeout
+            )
+
+    def _omitted_note(self, count: int) -> str:
+        note = f"\n... ({count} characters omitted"
+        if self.log_path:
+            note += f", full output in {self.log_path}"
+        return note + ") ...\n"
+
+    def read(self, start: int = 0) -> tuple:
+        """Return the output written from the offset start (with a note in
+        place of the characters no longer in memory), and the offset it ends at."""
+        with self._condition:
+            head = "".join(self._head)
+            tail = "".join(self._tail)
+            tail_start = self.size - self._tail_size
+            parts = []
+            if start < self._head_size:
+                parts.append(head[start:])
+                start = self._head_size
+            if start < tail_start:
+                parts.append(self._omitted_note(tail_start - start))
+                start = tail_start
+            parts.append(tail[start - tail_start :])
+            return "".join(parts), self.size
+
+    def read_unseen(self, consumer: str) -> str:
+        """Return the output the consumer has not seen yet, and mark it as seen."""
+        with self._condition:
+            text, self._cursors[consumer] = self.read(self._cursors.get(consumer, 0))
+            return text
+
+    def peek_unseen(self, consumer: str) -> tuple:
+        """Return the output the consumer has not seen yet, without marking it
+        as seen, and the offset it ends at."""
+        return self.read(self._cursors.get(consumer, 0))
+
+    def mark_seen(self, consumer: str, offset: Optional[int] = None):
+        """Move the cursor of the consumer to offset (defaults to the end)."""
+        with self._condition:
+            self._cursors[consumer] = self.size if offset is None else offset
+
+    def unseen(self, consumer: str) -> int:
+        """Number of characters the consumer has not seen yet."""
+        with self._condition:
+            return self.size - self._cursors.get(consumer, 0)
+
+    def text(self) -> str:
+        return self.read(0)[0]
+
+    def close(self):
+        """Delete the log file (the output in memory stays readable)."""
+        with self._condition:
+            self._closed = True
+            if self._log is not None:
+                self._log.close()
+                self._log = None
+            if self.log_path and os.path.exists(self.log_path):
+                os.remove(self.log_path)
+            self.log_path = None
@@ -0,0 +1,187 @@
+import codecs
+import io
+import logging
+import os
+import selectors
+import threading
+from queue import Empty, Queue
+from typing import Callable, Optional
+
+logger = logging.getLogger(__name__)
+
+READ_SIZE = 65536
+
+
+class _Watch:
+    """The output pipes and exit of a watched process."""
+
+    def __init__(self, process, files: list, on_output: Callable, on_exit: Callable):
+        self.process = process
+        self.files = files
+        self.on_output = on_output
+        self.on_exit = on_exit
+        self.decoders = {}  # fd -> incremental decoder, while the pipe is open
+        self.pidfd = None
+        self.done = False
+
+
+def _decoder():
+    """utf-8 decoder translating \\r\\n to \\n, even across chunks."""
+    return io.IncrementalNewlineDecoder(
+        codecs.getincrementaldecoder("utf-8")(errors="replace"), translate=True
+    )
+
+
+class OutputReader:
+    """A single thread waiting (with selectors) on the output of all the running
+    commands, instead of a polling loop per command.
+
+    Output is delivered as soon as it is readable. Process exits are waited on
+    with a pidfd when the platform has one, otherwise with a thread blocked in
+    wait().
+    """
+
+    def __init__(self):
+        self._selector = selectors.DefaultSelector()
+        self._wakeup_read, self._wakeup_write = os.pipe()
+        os.set_blocking(self._wakeup_read, False)
+        os.set_blocking(self._wakeup_write, False)
+        self._selector.register(self._wakeup_read, selectors.EVENT_READ, None)
+        self._calls = Queue()  # Functions to run in the reader thread
+        self._thread = threading.Thread(
+            target=self._run, name="autocode-output-reader", daemon=True
+        )
+        self._thread.start()
+
+    def watch(
+        self,
+        process,
+        on_output: Callable,
+        on_exit: Callable,
+        files: Optional[list] = None,
+    ):
+        """Call on_output(text) with each chunk of output of a process, then
+        on_exit(return code) once it exited and its output was read.
+
+        Args:
+            process: The subprocess.Popen of the command.
+            on_output: Called from the reader thread with the decoded text.
+            on_exit: Called from the reader thread with the return code.
+            files: The files to read (defaults to the stdout and stderr pipes).
+        """
+        if files is None:
+            files = [f for f in (process.stdout, process.stderr) if f is not None]
+        watch = _Watch(process, files, on_output, on_exit)
+        self._call_soon(lambda: self._add(watch))
+        return watch
+
+    def _call_soon(self, function: Callable):
+        self._calls.put(function)
+        try:
+            os.write(self._wakeup_write, b"\0")
+        except BlockingIOError:
+            pass  # The thread is already being woken up
+
+    def _add(self, watch: _Watch):
+        for file in watch.files:
+            fd = file.fileno()
+            os.set_blocking(fd, False)
+            watch.decoders[fd] = _decoder()
+            self._selector.register(fd, selectors.EVENT_READ, (watch, fd))
+        try:
+            watch.pidfd = os.pidfd_open(watch.process.pid)
+        except (AttributeError, OSError):
+            threading.Thread(target=self._wait_exit, args=(watch,), daemon=True).start()
+        else:
+            self._selector.register(watch.pidfd, selectors.EVENT_READ, (watch, None))
+
+    def _wait_exit(self, watch: _Watch):
+        watch.process.wait()
+        self._call_soon(lambda: self._exited(watch))
+
+    def _run(self):
+        while True:
+            for key, _ in self._selector.select():
+                if key.data is None:
+                    self._run_calls()
+                    continue
+                watch, fd = key.data
+                if fd is None:
+                    self._exited(watch)
+                elif fd in watch.decoders:
+                    self._read(watch, fd)
+
+    def _run_calls(self):
+        try:
+            while os.read(self._wakeup_read, READ_SIZE):
+                pass
+        except BlockingIOError:
+            pass
+        while True:
+            try:
+                function = self._calls.get_nowait()
+            except Empty:
+                return
+            try:
+                function()
+            except Exception:
+                logger.exception("Error in the output reader")
+
+    def _read(self, watch: _Watch, fd: int) -> bool:
+        """Read the available output of a pipe. Return False if there is no more."""
+        try:
+            data = os.read(fd, READ_SIZE)
+        except BlockingIOError:
+            return False
+        except OSError:
+            data = b""  # e.g. EIO on a pseudo-terminal whose process exited
+
+        decoder = watch.decoders[fd]
+        if data:
+            text = decoder.decode(data)
+        else:
+            text = decoder.decode(b"", final=True)
+            del watch.decoders[fd]
+            self._selector.unregister(fd)
+        if text:
+            self._deliver(watch.on_output, text)
+        return bool(data)
+
+    def _exited(self, watch: _Watch):
+        """Read the output left in the pipes, then report the exit."""
+        if watch.done:
+            return
+        watch.done = True
+        for fd in list(watch.decoders):
+            while self._read(watch, fd):
+                pass
+            if fd in watch.decoders:
+                # Still open (kept by a background child): stop reading it
+                text = watch.decoders.pop(fd).decode(b"", final=True)
+                if text:
+                    self._deliver(watch.on_output, text)
+                self._selector.unregister(fd)
+        if watch.pidfd is not None:
+            self._selector.unregister(watch.pidfd)
+            os.close(watch.pidfd)
+        self._deliver(watch.on_exit, watch.process.wait())
+
+    @staticmethod
+    def _deliver(callback: Callable, value):
+        try:
+            callback(value)
+        except Exception:
+            logger.exception("Error in an output callback")
+
+
+_reader = None
+_reader_lock = threading.Lock()
+
+
+def get_output_reader() -> OutputReader:
+    """Return the output reader shared by all the shells."""
+    global _reader
+    with _reader_lock:
+        if _reader is None:
+            _reader = OutputReader()
+    return _reader
@@ -0,0 +1,303 @@
+import os
+import re
+from typing import Optional
+
+HUNK_HEADER = re.compile(r"^@@ -(\d+)(?:,(\d+))? \+(\d+)(?:,(\d+))? @@")
+NO_NEWLINE_MARKER = "\\ No newline at end of file"
+DEV_NULL = "/dev/null"
+
+
+class PatchError(Exception):
+    pass
+
+
+class Hunk:
+    def __init__(self, old_start: int, new_start: int):
+        self.old_start = old_start
+        self.new_start = new_start
+        self.lines = []  # (" " | "-" | "+", text)
+        self.old_no_newline = False  # The old side ends without a newline
+        self.new_no_newline = False
+
+    def mark_no_newline(self):
+        """Handle a "No newline at end of file" marker after the last line."""
+        if self.lines and self.lines[-1][0] != "+":
+            self.old_no_newline = True
+        if self.lines and self.lines[-1][0] != "-":
+            self.new_no_newline = True
+
+    @property
+    def old_lines(self) -> list:
+        return [text for kind, text in self.lines if kind != "+"]
+
+    @property
+    def new_lines(self) -> list:
+        return [text for kind, text in self.lines if kind != "-"]
+
+
+class FilePatch:
+    def __init__(self, old_path: Optional[str], new_path: Optional[str]):
+        self.old_path = old_path  # None for a new file
+        self.new_path = new_path  # None for a deleted file
+        self.hunks = []
+
+    @property
+    def path(self) -> str:
+        return self.new_path or self.old_path
+
+
+def _strip_path(path: str) -> Optional[str]:
+    """Strip the a/ b/ prefixes of git diffs (and the timestamps of diff -u)."""
+    path = path.split("\t")[0].strip()
+    if path == DEV_NULL:
+        return None
+    if path.startswith(("a/", "b/")):
+        return path[2:]
+    return path
+
+
+def _split_lines(text: str) -> list:
+    """Split a text on \\n only (as git does), keeping the line endings."""
+    lines = [line + "\n" for line in text.split("\n")]
+    lines[-1] = lines[-1][:-1]
+    if not lines[-1]:
+        lines.pop()
+    return lines
+
+
+def _read_hunk(lines: list, i: int, hunk: Hunk, old_count: int, new_count: int):
+    """Read the lines of a hunk, as many as its header counts.
+    Returns the index of the line after the hunk."""
+    while old_count > 0 or new_count > 0:
+        if i >= len(lines):
+            raise PatchError(f"Hunk at line {hunk.old_start} is truncated")
+        line = lines[i]
+        if line == NO_NEWLINE_MARKER:
+            hunk.mark_no_newline()
+            i += 1
+            continue
+        if line == "":
+            # Editors often strip the space of empty context lines
+            kind, text = " ", ""
+        elif line[:1] in (" ", "-", "+"):
+            kind, text = line[:1], line[1:]
+        else:
+            raise PatchError(f"Unexpected line in a hunk: {line!r}")
+        if kind != "+":
+            old_count -= 1
+        if kind != "-":
+            new_count -= 1
+        if old_count < 0 or new_count < 0:
+            raise PatchError(
+                f"Hunk at line {hunk.old_start} does not match its line counts"
+            )
+        hunk.lines.append((kind, text))
+        i += 1
+    if i < len(lines) and lines[i] == NO_NEWLINE_MARKER:
+        hunk.mark_no_newline()
+        i += 1
+    return i
+
+
+def parse_unified_diff(diff_text: str) -> list:
+    """Parse a unified diff (possibly touching several files) into FilePatch.
+    Each hunk is read by the line counts of its header, so file headers are only
+    looked for between hunks."""
+    patches = []
+    lines = [
+        line[:-1] if line.endswith("\r") else line for line in diff_text.split("\n")
+    ]
+    current = None
+    i = 0
+    while i < len(lines):
+        line = lines[i]
+        if (
+            line.startswith("--- ")
+            and i + 1 < len(lines)
+            and lines[i + 1].startswith("+++ ")
+        ):
+            current = FilePatch(_strip_path(line[4:]), _strip_path(lines[i + 1][4:]))
+            patches.append(current)
+            i += 2
+            continue
+        match = HUNK_HEADER.match(line)
+        if match:
+            if current is None:
+                raise PatchError(f"Hunk without file header: {line}")
+            old_start, old_count, new_start, new_count = match.groups()
+            hunk = Hunk(int(old_start), int(new_start))
+            current.hunks.append(hunk)
+            i = _read_hunk(
+                lines,
+                i + 1,
+                hunk,
+                1 if old_count is None else int(old_count),
+                1 if new_count is None else int(new_count),
+            )
+            continue
+        i += 1  # "diff --git", "index", blank lines...
+
+    for patch in patches:
+        if not patch.hunks and patch.old_path and patch.new_path:
+            raise PatchError(f"No hunks for {patch.path}")
+    return patches
+
+
+def _find_hunk(lines: list, old_lines: list, expected: int) -> tuple:
+    """Find where the old lines of a hunk are, closest to the expected index.
+    Returns (index, fuzzy) or (None, False) if they are nowhere."""
+    last_start = len(lines) - len(old_lines)
+    if last_start < 0:
+        return None, False
+    expected = min(max(expected, 0), last_start)
+    for fuzzy in (False, True):
+        wanted = [line.rstrip() for line in old_lines] if fuzzy else old_lines
+        for distance in range(max(expected, last_start - expected) + 1):
+            for start in (expected - distance, expected + distance):
+                if not 0 <= start <= last_start:
+                    continue
+                candidate = lines[start : start + len(old_lines)]
+                if fuzzy:
+                    candidate = [line.rstrip() for line in candidate]
+                if candidate == wanted:
+                    return start, fuzzy
+    return None, False
+
+
+def apply_hunks(content: str, hunks: list) -> tuple:
+    """Apply hunks to a text in memory.
+    Returns the new content and a result message per hunk (None if a hunk failed).
+    Lines are split on \\n only, and the lines kept keep their own ending."""
+    newline = "\r\n" if "\r\n" in content else "\n"
+    lines = _split_lines(content)
+    texts = [line.rstrip("\n").removesuffix("\r") for line in lines]
+    results = []
+    failed = False
+    offset = 0  # Lines added minus removed by the previous hunks
+    for number, hunk in enumerate(hunks, 1):
+        old_lines = hunk.old_lines
+        if old_lines:
+            expected = hunk.old_start - 1 + offset
+            start, fuzzy = _find_hunk(texts, old_lines, expected)
+        else:
+            # Pure insertion after line old_start (0 for the beginning of the file)
+            expected = hunk.old_start + offset
+            start, fuzzy = min(max(expected, 0), len(lines)), False
+        if start is None:
+            results.append(f"Hunk #{number} FAILED at line {hunk.old_start}")
+            failed = True
+            continue
+
+        end = start + len(old_lines)
+        new_lines = []
+        position = start
+        for kind, text in hunk.lines:
+            if kind == " ":
+                new_lines.append(lines[position])  # Unchanged, with its ending
+            elif kind == "+":
+                new_lines.append(text + newline)
+            if kind != "+":
+                position += 1
+        if end == len(lines) and new_lines:
+            # The hunk touches the end of the file
+            last = new_lines[-1].rstrip("\n").removesuffix("\r")
+            if hunk.new_no_newline:
+                new_lines[-1] = last
+            elif hunk.old_no_newline:
+                new_lines[-1] = last + newline
+        elif end == len(lines) and start and hunk.new_no_newline:
+            lines[start - 1] = texts[start - 1]
+        lines[start:end] = new_lines
+        texts[start:end] = [line.rstrip("\n").removesuffix("\r") for line in new_lines]
+        offset += len(new_lines) - len(old_lines)
+
+        message = f"Hunk #{number} applied"
+        if start != expected:
+            message += f" at offset {start - expected:+d}"
+        if fuzzy:
+            message += " (ignoring trailing whitespace)"
+        results.append(message)
+
+    if failed:
+        return None, results
+    return "".join(lines), results
+
+
+def _resolve_path(root: str, path: str) -> str:
+    """The absolute path of a path of the diff, refusing the paths outside root."""
+    if os.path.isabs(path):
+        raise PatchError(f"Absolute path not allowed: {path}")
+    root = os.path.abspath(root)
+    abs_path = os.path.normpath(os.path.join(root, path))
+    if os.path.commonpath([root, abs_path]) != root:
+        raise PatchError(f"Path outside of the root: {path}")
+    return abs_path
+
+
+def apply_patch(diff_text: str, root: str = ".") -> tuple:
+    """Apply a unified diff to the files under root, all or nothing.
+    Returns (touched absolute paths, report). Nothing is written if a hunk fails."""
+    patches = parse_unified_diff(diff_text)
+    if not patches:
+        raise PatchError("No file changes found in the diff")
+
+    writes = {}  # abs path -> new content, None to delete
+    report = []
+    failed = False
+    for patch in patches:
+        abs_path = _resolve_path(root, patch.path)
+        if patch.old_path is None:
+            if os.path.exists(abs_path) and abs_path not in writes:
+                report.append(f"{patch.path}: already exists")
+                failed = True
+                continue
+            content = ""
+        else:
+            old_abs_path = _resolve_path(root, patch.old_path)
+            if old_abs_path in writes:
+                content = writes[old_abs_path]
+                if content is None:
+                    report.append(f"{patch.old_path}: deleted earlier in the diff")
+                    failed = True
+                    continue
+            else:
+                try:
+                    with open(old_abs_path, "r", newline="") as f:
+                        content = f.read()
+                except OSError as e:
+                    report.append(f"{patch.old_path}: {e.strerror}")
+                    failed = True
+                    continue
+            if patch.new_path != patch.old_path:
+                # Deleted or renamed
+                writes[old_abs_path] = None
+
+        new_content, results = apply_hunks(content, patch.hunks)
+        if new_content is None:
+            failed = True
+        elif patch.new_path is not None:
+            writes[abs_path] = new_content
+
+        if patch.old_path is None:
+            header = f"{patch.path} (created)"
+        elif patch.new_path is None:
+            header = f"{patch.path} (deleted)"
+        elif patch.old_path != patch.new_path:
+            header = f"{patch.old_path} -> {patch.new_path}"
+        else:
+            header = patch.path
+        report.append("\n".join([f"{header}:"] + [f"  {r}" for r in results]))
+
+    if failed:
+        return [], "Patch not applied:\n" + "\n".join(report)
+
+    for abs_path, content in writes.items():
+        if content is None:
+            if os.path.exists(abs_path):
+                os.remove(abs_path)
+            continue
+        os.makedirs(os.path.dirname(abs_path) or ".", exist_ok=True)
+        with open(abs_path, "w", newline="") as f:
+            f.write(content)
+    touched = [path for path, content in writes.items() if content is not None]
+    return touched, "Patch applied:\n" + "\n".join(report)
@@ -0,0 +1,99 @@
+import heapq
+import itertools
+import logging
+import os
+import signal
+import threading
+import time
+from typing import Callable, Optional
+
+logger = logging.getLogger(__name__)
+
+KILL_GRACE_SECONDS = 2  # Between the request to stop and SIGKILL
+
+
+def kill_process_group(pgid: int, sig: int = signal.SIGKILL) -> bool:
+    """Send a signal to a process group. Return False if it no longer exists.
+    Linux does not reuse a pid while it is the pgid of a living process, so the
+    group of a command can be signalled as long as any of its processes lives,
+    even after its leader exited."""
+    try:
+        os.killpg(pgid, sig)
+    except (ProcessLookupError, PermissionError):
+        return False
+    return True
+
+
+def limit_resources(
+    cpu_seconds: Optional[int] = None, memory_mb: Optional[int] = None
+) -> str:
+    """Return the bash commands setting the resource limits of the shell and the
+    processes it starts ("" without limits). The limits are set by bash itself:
+    a preexec_fn is not safe in a process running threads.
+
+    Args:
+        cpu_seconds: CPU time of each process (SIGXCPU, then SIGKILL a second later)
+        memory_mb: Address space of each process, which bounds its RSS (Linux does
+            not enforce RLIMIT_RSS)
+    """
+    limits = []
+    if cpu_seconds is not None:
+        # The soft limit first: it cannot exceed the hard one
+        limits += [f"ulimit -S -t {cpu_seconds}", f"ulimit -H -t {cpu_seconds + 1}"]
+    if memory_mb is not None:
+        limits.append(f"ulimit -v {memory_mb * 1024}")
+    if not limits:
+        return ""
+    return " && ".join(limits) + " || exit 1\n"
+
+
+class Reaper:
+    """A thread running callbacks at their deadline, e.g. to kill the commands
+    over their wall time, instead of a timer thread per command."""
+
+    def __init__(self):
+        self._deadlines = []  # Heap of (deadline, sequence, callback)
+        self._sequence = itertools.count()
+        self._condition = threading.Condition()
+        self._thread = threading.Thread(
+            target=self._run, name="autocode-reaper", daemon=True
+        )
+        self._thread.start()
+
+    def schedule(self, delay: float, callback: Callable):
+        """Call callback() in delay seconds."""
+        with self._condition:
+            heapq.heappush(
+                self._deadlines,
+                (time.monotonic() + delay, next(self._sequence), callback),
+            )
+            self._condition.notify()
+
+    def _run(self):
+        while True:
+            with self._condition:
+                while not self._deadlines:
+                    self._condition.wait()
+                deadline, _, callback = self._deadlines[0]
+                delay = deadline - time.monotonic()
+                if delay > 0:
+                    self._condition.wait(delay)
+                    continue
+                heapq.heappop(self._deadlines)
+            try:
+                callback()
+            except Exception:
+                logger.exception("Error in a reaper callback")
+
+
+_reaper = None
+_reaper_lock = threading.Lock()
+
+
+def get_reaper() -> Reaper:
+    """Return the reaper shared by all the shells."""
+    global _reaper
+    with _reaper_lock:
+        if _reaper is None:
+            _reaper = Reaper()
+    return _reaper
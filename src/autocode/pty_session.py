@@ -0,0 +1,193 @@
+import fcntl
+import logging
+import os
+import pty
+import re
+import secrets
+import select
+import signal
+import struct
+import subprocess
+import termios
+import threading
+from typing import Optional
+
+from autocode.output_buffer import OutputBuffer
+from autocode.output_reader import get_output_reader
+
+logger = logging.getLogger(__name__)
+
+TERMINAL_SIZE = (50, 200)  # Rows, columns
+
+
+# Opening the pseudo-terminal by name from the new session makes it its
+# controlling terminal (no preexec_fn: it is not safe in a process running
+# threads), then the same process becomes the interactive bash
+BASH_COMMAND = [
+    "/bin/bash",
+    "-c",
+    # (PS1 and PS2 are unset by the non-interactive bash: pass them again)
+    'PS1= PS2= exec /bin/bash --noprofile --norc --noediting -i <>"$0" >&0 2>&0',
+]
+
+
+class PtySession:
+    """A bash process in a pseudo-terminal, kept alive between commands.
+
+    The working directory, environment variables, virtualenvs and shell
+    functions persist from one command to the next. Each command is followed
+    by a marker with its exit code, so the end of its output is known exactly.
+    """
+
+    def __init__(self, cwd: Optional[str] = None, setup: str = ""):
+        self.cwd = cwd
+        self.setup = setup  # Run by bash on start, e.g. resource limits (ulimit)
+        token = secrets.token_hex(8)
+        self.marker = f"__AUTOCODE_DONE_{token}_"
+        self._marker_regex = re.compile(re.escape(self.marker) + r"(\d+)_(\d+)__\n")
+        self._delimiter = f"__AUTOCODE_COMMAND_{token}__"
+        self.process = None
+        self._master = None
+        self._pending = ""  # Output that may be the start of a marker
+        self._output = None  # OutputBuffer of the running (or last) command
+        self._command_id = 0  # Id of the running command, in its marker
+        self._lock = threading.Lock()
+
+    @property
+    def running(self) -> bool:
+        return self._output is not None and not self._output.finished
+
+    def _start(self):
+        master, slave = pty.openpty()
+        attributes = termios.tcgetattr(slave)
+        # No echo of the commands, and no line length limit on the input
+        attributes[3] &= ~(termios.ECHO | termios.ICANON)
+        attributes[6][termios.VMIN] = 1
+        attributes[6][termios.VTIME] = 0
+        termios.tcsetattr(slave, termios.TCSANOW, attributes)
+        fcntl.ioctl(
+            slave, termios.TIOCSWINSZ, struct.pack("HHHH", *TERMINAL_SIZE, 0, 0)
+        )
+
+        env = {**os.environ, "TERM": "dumb"}
+        env.pop("PROMPT_COMMAND", None)
+        try:
+            self.process = subprocess.Popen(
+                BASH_COMMAND + [os.ttyname(slave)],
+                stdin=slave,
+                stdout=slave,
+                stderr=slave,
+                cwd=self.cwd,
+                env=env,
+                start_new_session=True,
+            )
+        finally:
+            os.close(slave)
+        self._master = os.fdopen(master, "rb", buffering=0)
+        self._pending = ""
+        self._output = None
+        self._command_id = 0
+        process, master_file = self.process, self._master
+        get_output_reader().watch(
+            process,
+            self._on_output,
+            lambda return_code: self._on_exit(return_code, process, master_file),
+            files=[master_file],
+        )
+        # Output before the first marker (e.g. bash warnings) is dropped
+        self._send(
+            self.setup + "set +o history\n"
+            "__autocode_set_status() { return $1; }\n" + self._marker_command()
+        )
+
+    def _marker_command(self) -> str:
+        return (
+            "__autocode_status=$?; "
+            f"printf '%s%s_%s__\\n' '{self.marker}' {self._command_id} "
+            '"$__autocode_status"\n'
+        )
+
+    def _send(self, text: str):
+        data = text.encode("utf-8")
+        fd = self._master.fileno()
+        while data:
+            try:
+                data = data[os.write(fd, data) :]
+            except BlockingIOError:
+                select.select([], [fd], [])
+
+    def run(self, command: str, output: OutputBuffer):
+        """Send a command to the shell. Its output goes to the buffer, which is
+        finished with the exit code of the command."""
+        with self._lock:
+            if self.running:
+                raise RuntimeError("A command is still running in this shell")
+            if self.process is None or self.process.poll() is not None:
+                self._start()
+            self._output = output
+            self._command_id += 1
+            # The command is read in a variable, so that incomplete or invalid
+            # commands cannot swallow the marker
+            self._send(
+                f"IFS= read -r -d '' __autocode_command <<'{self._delimiter}'\n"
+                f"{command}\n{self._delimiter}\n"
+                # $? is the exit code of the previous command, as in a terminal
+                '__autocode_set_status "$__autocode_status"; '
+                'eval "$__autocode_command"\n' + self._marker_command()
+            )
+
+    def interrupt(self):
+        """Send Ctrl-C to the running command."""
+        if self._master is not None and self.process.poll() is None:
+            self._send("\x03")
+
+    def _on_output(self, text: str):
+        with self._lock:
+            self._pending += text
+            while True:
+                match = self._marker_regex.search(self._pending)
+                if not match:
+                    break
+                self._write(self._pending[: match.start()])
+                self._pending = self._pending[match.end() :]
+                if int(match.group(1)) == self._command_id and self.running:
+                    self._output.finish(int(match.group(2)))
+
+            # Keep the end of the output that may be the start of a marker
+            keep = 0
+            marker_start = self._pending.rfind(self.marker)
+            if marker_start != -1:
+                keep = len(self._pending) - marker_start
+            else:
+                for size in range(min(len(self._pending), len(self.marker)), 0, -1):
+                    if self.marker.startswith(self._pending[-size:]):
+                        keep = size
+                        break
+            self._write(self._pending[: len(self._pending) - keep])
+            self._pending = self._pending[len(self._pending) - keep :]
+
+    def _write(self, text: str):
+        # Output between commands (e.g. of background jobs) goes to the last command
+        if text and self._output is not None:
+            self._output.write(text)
+
+    def _on_exit(self, return_code: int, process, master_file):
+        with self._lock:
+            master_file.close()
+            if process is not self.process:
+                return  # Already replaced by a new shell
+            self._master = None
+            self._write(self._pending)
+            self._pending = ""
+            if self.running:
+                self._output.write("\nShell exited.")
+                self._output.finish(return_code)
+
+    def close(self):
+        """Hang up the shell and its jobs."""
+        if self.process is None or self.process.poll() is not None:
+            return
+        try:
+            os.killpg(self.process.pid, signal.SIGHUP)
+        except ProcessLookupError:
+            pass
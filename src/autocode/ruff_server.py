@@ -0,0 +1,328 @@
+import atexit
+import json
+import logging
+import os
+import subprocess
+import threading
+from pathlib import Path
+from queue import Empty, Queue
+from typing import Optional
+
+from autocode.file_utils import atomic_write
+
+logger = logging.getLogger(__name__)
+
+REQUEST_TIMEOUT_SECONDS = 10
+MAX_RESTARTS = 3  # Restarts after crashes before giving up on the server
+
+
+class RuffServerError(Exception):
+    pass
+
+
+def _apply_text_edits(text: str, edits: list) -> str:
+    """Apply LSP text edits (with utf-8 positions) to a text."""
+    data = text.encode("utf-8")
+    line_starts = [0]
+    newline = data.find(b"\n")
+    while newline != -1:
+        line_starts.append(newline + 1)
+        newline = data.find(b"\n", newline + 1)
+
+    def offset(position: dict) -> int:
+        if position["line"] >= len(line_starts):
+            return len(data)
+        return min(line_starts[position["line"]] + position["character"], len(data))
+
+    ranges = [
+        (offset(edit["range"]["start"]), offset(edit["range"]["end"]), edit["newText"])
+        for edit in edits
+    ]
+    for start, end, new_text in sorted(ranges, reverse=True):
+        data = data[:start] + new_text.encode("utf-8") + data[end:]
+    return data.decode("utf-8")
+
+
+def _workspace_edits(workspace_edit: dict, uri: str) -> list:
+    """Extract the text edits of a document from a workspace edit."""
+    if "changes" in workspace_edit:
+        return workspace_edit["changes"].get(uri, [])
+    edits = []
+    for change in workspace_edit.get("documentChanges", []):
+        if change.get("textDocument", {}).get("uri") == uri:
+            edits.extend(change["edits"])
+    return edits
+
+
+class RuffServer:
+    """A long-lived `ruff server` process, used over its LSP stdio pipe.
+
+    Formats and fixes files without spawning a ruff process per edit.
+    The process is restarted if it crashes.
+    """
+
+    def __init__(self, root: str = "."):
+        self.root = os.path.abspath(root)
+        self.process = None
+        self.restarts = 0
+        self._messages = None
+        self._next_id = 0
+        self._lock = threading.Lock()
+        atexit.register(self.close)
+
+    def _start(self):
+        self.process = subprocess.Popen(
+            ["ruff", "server"],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+            cwd=self.root,
+        )
+        self._messages = Queue()
+        threading.Thread(
+            target=self._read_messages,
+            args=(self.process, self._messages),
+            daemon=True,
+        ).start()
+
+        root_uri = Path(self.root).as_uri()
+        self._request(
+            "initialize",
+            {
+                "processId": os.getpid(),
+                "rootUri": root_uri,
+                "workspaceFolders": [{"uri": root_uri, "name": "root"}],
+                "capabilities": {"general": {"positionEncodings": ["utf-8"]}},
+                "initializationOptions": {},
+            },
+        )
+        self._notify("initialized", {})
+
+    def _ensure_started(self):
+        if self.process is not None and self.process.poll() is None:
+            return
+        if self.process is not None:
+            self.restarts += 1
+            if self.restarts > MAX_RESTARTS:
+                raise RuffServerError("ruff server keeps crashing")
+            logger.warning("ruff server exited, restarting it")
+        try:
+            self._start()
+        except OSError as e:
+            raise RuffServerError(f"Could not start ruff server: {e}") from e
+
+    @staticmethod
+    def _read_messages(process, messages: Queue):
+        """Read the LSP messages of the process into the queue (None at exit)."""
+        stdout = process.stdout
+        while True:
+            headers = {}
+            while True:
+                line = stdout.readline()
+                if not line:
+                    messages.put(None)
+                    return
+                if line == b"\r\n":
+                    break
+                key, _, value = line.decode("ascii").partition(":")
+                headers[key.strip().lower()] = value.strip()
+            body = stdout.read(int(headers["content-length"]))
+            messages.put(json.loads(body))
+
+    def _send(self, message: dict):
+        body = json.dumps({"jsonrpc": "2.0", **message}).encode("utf-8")
+        try:
+            self.process.stdin.write(b"Content-Length: %d\r\n\r\n" % len(body) + body)
+            self.process.stdin.flush()
+        except (BrokenPipeError, OSError) as e:
+            raise RuffServerError(f"ruff server pipe closed: {e}") from e
+
+    def _notify(self, method: str, params: dict):
+        self._send({"method": method, "params": params})
+
+    def _request(self, method: str, params: Optional[dict]):
+        self._next_id += 1
+        request_id = self._next_id
+        self._send({"id": request_id, "method": method, "params": params})
+        while True:
+            try:
+                message = self._messages.get(timeout=REQUEST_TIMEOUT_SECONDS)
+            except Empty:
+                self.process.kill()
+                raise RuffServerError(f"ruff server timed out on {method}") from None
+            if message is None:
+                raise RuffServerError("ruff server exited")
+            if "method" in message:
+                if "id" in message:
+                    # Server to client request (e.g. registerCapability)
+                    self._send({"id": message["id"], "result": None})
+                continue
+            if message.get("id") == request_id:
+                if "error" in message:
+                    raise RuffServerError(message["error"].get("message"))
+                return message.get("result")
+
+    def _apply_code_action(self, uri: str, text: str, kind: str) -> str:
+        actions = self._request(
+            "textDocument/codeAction",
+            {
+                "textDocument": {"uri": uri},
+                "range": {
+                    "start": {"line": 0, "character": 0},
+                    "end": {"line": 0, "character": 0},
+                },
+                "context": {"diagnostics": [], "only": [kind]},
+            },
+        )
+        for action in actions or []:
+            if action.get("kind") == kind and "edit" in action:
+                text = _apply_text_edits(text, _workspace_edits(action["edit"], uri))
+        return text
+
+    def _diagnostics_report(
+        self, uri: str, path: str, select: Optional[str] = None
+    ) -> str:
+        """Format the diagnostics of a document (whose code starts with select)."""
+        result = self._request(
+            "textDocument/diagnostic", {"textDocument": {"uri": uri}}
+        )
+        lines = []
+        for diagnostic in (result or {}).get("items", []):
+            if select and not diagnostic.get("code", "").startswith(select):
+                continue
+            start = diagnostic["range"]["start"]
+            message = diagnostic["message"].split("\n")[0]
+            lines.append(
+                f"{path}:{start['line'] + 1}:{start['character'] + 1}: "
+                f"{diagnostic.get('code', '')} {message}"
+            )
+        return "\n".join(lines)
+
+    def _lint(
+        self, path: str, text: str, apply_format: bool, code_actions: dict
+    ) -> tuple:
+        uri = Path(path).as_uri()
+        version = 1
+        self._notify(
+            "textDocument/didOpen",
+            {
+                "textDocument": {
+                    "uri": uri,
+                    "languageId": "python",
+                    "version": version,
+                    "text": text,
+                }
+            },
+        )
+        try:
+            # Same pipeline as `ruff format` then `ruff check [--fix] [--select I]`
+            organize_imports = code_actions.get("source.organizeImports") == "explicit"
+            fix_all = code_actions.get("source.fixAll") == "explicit"
+            steps = []
+            if apply_format:
+                steps.append(None)
+            if fix_all:
+                steps.append(
+                    "source.organizeImports.ruff"
+                    if organize_imports
+                    else "source.fixAll.ruff"
+                )
+
+            for kind in steps:
+                if kind is None:
+                    edits = self._request(
+                        "textDocument/formatting",
+                        {
+                            "textDocument": {"uri": uri},
+                            "options": {"tabSize": 4, "insertSpaces": True},
+                        },
+                    )
+                    new_text = _apply_text_edits(text, edits or [])
+                else:
+                    new_text = self._apply_code_action(uri, text, kind)
+                if new_text != text:
+                    text = new_text
+                    version += 1
+                    self._notify(
+                        "textDocument/didChange",
+                        {
+                            "textDocument": {"uri": uri, "version": version},
+                            "contentChanges": [{"text": text}],
+                        },
+                    )
+            report = ""
+            if code_actions:
+                report = self._diagnostics_report(
+                    uri, path, select="I" if organize_imports else None
+                )
+        finally:
+            self._notify("textDocument/didClose", {"textDocument": {"uri": uri}})
+        return text, report
+
+    def lint_file(
+        self, path: str, apply_format: bool = True, code_actions: Optional[dict] = None
+    ) -> str:
+        """Format and fix a file in place, return the remaining diagnostics.
+
+        Args:
+            path: The file to lint.
+            apply_format: Apply the formatter (like `ruff format`).
+            code_actions: VSCode editor.codeActionsOnSave settings
+                (source.fixAll and source.organizeImports are supported).
+        """
+        path = os.path.abspath(path)
+        with open(path, "r", encoding="utf-8") as f:
+            text = f.read()
+
+        new_text, report = self.lint_text(path, text, apply_format, code_actions)
+        if new_text != text:
+            atomic_write(path, [new_text])
+        return report
+
+    def lint_text(
+        self,
+        path: str,
+        text: str,
+        apply_format: bool = True,
+        code_actions: Optional[dict] = None,
+    ) -> tuple:
+        """Format and fix the content of a file without writing it.
+        Returns the new content and the remaining diagnostics."""
+        path = os.path.abspath(path)
+        with self._lock:
+            for attempt in range(2):
+                self._ensure_started()
+                try:
+                    new_text, report = self._lint(
+                        path, text, apply_format, code_actions or {}
+                    )
+                    break
+                except RuffServerError:
+                    if attempt:
+                        raise
+                    logger.warning("ruff server failed, retrying", exc_info=True)
+                    self.process.kill()
+        return new_text, report
+
+    def close(self):
+        """Shut the server down."""
+        if self.process is None or self.process.poll() is not None:
+            return
+        try:
+            with self._lock:
+                self._request("shutdown", None)
+                self._notify("exit", None)
+            self.process.wait(timeout=1)
+        except (RuffServerError, subprocess.TimeoutExpired):
+            self.process.kill()
+
+
+_servers = {}
+
+
+def get_ruff_server(root: str = ".") -> RuffServer:
+    """Return the ruff server of a root directory, shared between calls."""
+    root = os.path.abspath(root)
+    if root not in _servers:
+        _servers[root] = RuffServer(root)
+    return _servers[root]
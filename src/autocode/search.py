@@ -0,0 +1,218 @@
+import logging
+import os
+import re
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Iterable, Iterator, Optional
+
+from autocode.directory_utils import _compile_patterns
+
+logger = logging.getLogger(__name__)
+
+BINARY_SNIFF_SIZE = 8192  # Files with a NUL byte in their first block are skipped
+SEARCH_WORKERS = min(8, (os.cpu_count() or 1) + 4)
+
+
+def _line_matcher(search_text: str, regex: bool, case_sensitive: bool):
+    """Return a function telling if a line matches the search."""
+    if regex:
+        flags = 0 if case_sensitive else re.IGNORECASE
+        return re.compile(search_text, flags).search
+    if case_sensitive:
+        return lambda line: search_text in line
+    search_text = search_text.lower()
+    return lambda line: search_text in line.lower()
+
+
+def _search_file(path: str, match, max_per_file: Optional[int]) -> list:
+    """Return the (line number, line) matching in a text file."""
+    matches = []
+    with open(path, "rb") as f:
+        if b"\0" in f.read(BINARY_SNIFF_SIZE):
+            return matches
+        f.seek(0)
+        # Binary files iterate on \n only, as split_lines
+        for i, raw_line in enumerate(f, 1):
+            raw_line = raw_line.rstrip(b"\n")
+            if raw_line.endswith(b"\r"):
+                raw_line = raw_line[:-1]
+            line = raw_line.decode("utf-8", errors="ignore")
+            if match(line):
+                matches.append((i, line))
+                if max_per_file and len(matches) >= max_per_file:
+                    break
+    return matches
+
+
+def _path_filter(include: Optional[list], exclude: Optional[list], root: str):
+    """Return a function telling if a path is selected by the include/exclude globs."""
+    include_regex = _compile_patterns(include or [])
+    exclude_regex = _compile_patterns(exclude or [])
+
+    def selected(path: str) -> bool:
+        rel_path = os.path.relpath(path, root).replace(os.sep, "/")
+        if include_regex and not include_regex.fullmatch(rel_path):
+            return False
+        return not (exclude_regex and exclude_regex.fullmatch(rel_path))
+
+    return selected
+
+
+def _ordered_map(function: Callable, items: Iterable, workers: int) -> Iterator[tuple]:
+    """Run function over the items in a thread pool and yield (item, result) in
+    order, keeping a bounded window of pending items. Closing the generator
+    cancels the pending items."""
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        pending = deque()
+        try:
+            for item in items:
+                pending.append((item, executor.submit(function, item)))
+                if len(pending) >= workers * 4:
+                    item, future = pending.popleft()
+                    yield item, future.result()
+            while pending:
+                item, future = pending.popleft()
+                yield item, future.result()
+        finally:
+            for _, future in pending:
+                future.cancel()
+
+
+def iter_search_matches(
+    files: list,
+    search_text: str,
+    regex: bool = False,
+    case_sensitive: bool = False,
+    include: Optional[list] = None,
+    exclude: Optional[list] = None,
+    root: str = ".",
+    max_results: Optional[int] = None,
+    max_per_file: Optional[int] = None,
+    workers: int = SEARCH_WORKERS,
+) -> Iterator[tuple]:
+    """Search files in a thread pool and yield (path, matches) in the order of the files.
+
+    Args:
+        files: The absolute paths of the files to search.
+        search_text: The text (or regex) to search for.
+        regex: Treat the search text as a regular expression.
+        case_sensitive: Match the case of the search text.
+        include: Globs (relative to root) of the files to search.
+        exclude: Globs (relative to root) of the files to skip.
+        root: The directory the globs are relative to.
+        max_results: Stop after this many matching lines.
+        max_per_file: Keep at most this many matching lines per file.
+        workers: The number of threads reading files.
+    Yields:
+        (path, [(line number, line), ...]) for each file with matches.
+    """
+    match = _line_matcher(search_text, regex, case_sensitive)
+    selected = _path_filter(include, exclude, root)
+
+    def search(path: str) -> list:
+        try:
+            return _search_file(path, match, max_per_file)
+        except OSError as e:
+            logger.error(f"Error reading file {path}: {e}")
+            return []
+
+    results_count = 0
+    ordered = _ordered_map(search, filter(selected, files), workers)
+    try:
+        for path, matches in ordered:
+            if not matches:
+                continue
+            if max_results:
+                matches = matches[: max_results - results_count]
+            results_count += len(matches)
+            yield path, matches
+            if max_results and results_count >= max_results:
+                break
+    finally:
+        ordered.close()
+
+
+def _substituter(pattern: str, replacement: str, regex: bool, case_sensitive: bool):
+    """Return a function replacing the pattern in a text, returning (text, count).
+    Empty matches (e.g. of "x*") are not replaced."""
+    if not pattern:
+        raise ValueError("The pattern is empty")
+    if not regex and case_sensitive:
+        return lambda text: (text.replace(pattern, replacement), text.count(pattern))
+    flags = re.MULTILINE if case_sensitive else re.MULTILINE | re.IGNORECASE
+    compiled = re.compile(pattern if regex else re.escape(pattern), flags)
+
+    def substitute(text: str) -> tuple:
+        count = 0
+
+        def replace(match) -> str:
+            nonlocal count
+            if match.start() == match.end():
+                return ""
+            count += 1
+            return match.expand(replacement) if regex else replacement
+
+        return compiled.sub(replace, text), count
+
+    return substitute
+
+
+def read_text_file(path: str) -> Optional[str]:
+    """Read a utf-8 text file as is (newlines included), None for a binary file."""
+    with open(path, "rb") as f:
+        data = f.read()
+    if b"\0" in data[:BINARY_SNIFF_SIZE]:
+        return None
+    try:
+        return data.decode("utf-8")
+    except UnicodeDecodeError:
+        return None
+
+
+def iter_replacements(
+    files: list,
+    pattern: str,
+    replacement: str,
+    regex: bool = False,
+    case_sensitive: bool = True,
+    include: Optional[list] = None,
+    exclude: Optional[list] = None,
+    root: str = ".",
+    read_text: Callable = read_text_file,
+    workers: int = SEARCH_WORKERS,
+) -> Iterator[tuple]:
+    """Replace a pattern in files in a thread pool, without writing them.
+
+    Args:
+        files: The absolute paths of the files to search.
+        pattern: The text (or regex) to replace.
+        replacement: The replacement (with \\1 group references for a regex).
+        regex: Treat the pattern as a regular expression.
+        case_sensitive: Match the case of the pattern.
+        include: Globs (relative to root) of the files to search.
+        exclude: Globs (relative to root) of the files to skip.
+        root: The directory the globs are relative to.
+        read_text: Read the text of a file (None to skip it).
+        workers: The number of threads reading files.
+    Yields:
+        (path, new text, number of replacements) for each file with matches,
+        in the order of the files.
+    """
+    substitute = _substituter(pattern, replacement, regex, case_sensitive)
+
+    def replace(path: str) -> Optional[tuple]:
+        try:
+            text = read_text(path)
+        except OSError as e:
+            logger.error(f"Error reading file {path}: {e}")
+            return None
+        if text is None:
+            return None
+        new_text, count = substitute(text)
+        return (new_text, count) if count else None
+
+    for path, result in _ordered_map(
+        replace, filter(_path_filter(include, exclude, root), files), workers
+    ):
+        if result:
+            yield path, *result
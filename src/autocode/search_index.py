@@ -0,0 +1,126 @@
+import logging
+import os
+import pickle
+from collections import defaultdict
+from typing import Iterable, Optional
+
+logger = logging.getLogger(__name__)
+
+MAX_INDEXED_FILE_SIZE = 5_000_000  # Larger files are always searched
+SNAPSHOT_VERSION = 1
+
+
+def _trigrams(text: str) -> set:
+    return {text[i : i + 3] for i in range(len(text) - 2)}
+
+
+class TrigramIndex:
+    """Inverted index from lowercased trigrams to the files containing them.
+
+    Used to only open the files that can contain a (case-insensitive) search
+    text. Files are re-indexed when their mtime or size change, and the index
+    can be saved to / loaded from an on-disk snapshot.
+    """
+
+    def __init__(self, snapshot_path: Optional[str] = None):
+        self.snapshot_path = snapshot_path
+        # path -> (mtime_ns, size, trigrams or None if not indexed)
+        self._files = {}
+        self._postings = defaultdict(set)
+        if snapshot_path and os.path.exists(snapshot_path):
+            self.load(snapshot_path)
+
+    def __len__(self):
+        return len(self._files)
+
+    def _add_postings(self, path: str, trigrams: Optional[set]):
+        for trigram in trigrams or ():
+            self._postings[trigram].add(path)
+
+    def remove(self, path: str):
+        """Remove a file from the index."""
+        entry = self._files.pop(path, None)
+        if not entry:
+            return
+        for trigram in entry[2] or ():
+            paths = self._postings.get(trigram)
+            if paths:
+                paths.discard(path)
+                if not paths:
+                    del self._postings[trigram]
+
+    def update(self, path: str) -> bool:
+        """(Re)index a file if it changed since it was indexed. Return True if it was read."""
+        try:
+            stat = os.stat(path)
+        except OSError:
+            self.remove(path)
+            return False
+
+        entry = self._files.get(path)
+        if entry and entry[0] == stat.st_mtime_ns and entry[1] == stat.st_size:
+            return False
+
+        trigrams = None
+        if stat.st_size <= MAX_INDEXED_FILE_SIZE:
+            try:
+                with open(path, "rb") as f:
+                    content = f.read().decode("utf-8", errors="ignore")
+                trigrams = _trigrams(content.lower())
+            except OSError as e:
+                logger.error(f"Error indexing file {path}: {e}")
+
+        self.remove(path)
+        self._files[path] = (stat.st_mtime_ns, stat.st_size, trigrams)
+        self._add_postings(path, trigrams)
+        return True
+
+    def sync(self, paths: Iterable[str]) -> int:
+        """Index the given files and forget the others. Return the number of files read."""
+        paths = set(paths)
+        for path in set(self._files) - paths:
+            self.remove(path)
+        return sum(self.update(path) for path in paths)
+
+    def candidates(self, search_text: str) -> Optional[set]:
+        """Return the files that may contain the text, or None if every file may."""
+        trigrams = _trigrams(search_text.lower())
+        if not trigrams:
+            return None
+
+        # Intersect the smallest posting lists first
+        postings = sorted(
+            (self._postings.get(trigram, set()) for trigram in trigrams), key=len
+        )
+        result = set(postings[0])
+        for paths in postings[1:]:
+            if not result:
+                break
+            result &= paths
+        # Files not indexed (too big, unreadable) are always candidates
+        result.update(path for path, entry in self._files.items() if entry[2] is None)
+        return result
+
+    def save(self, snapshot_path: Optional[str] = None):
+        """Save the index to disk."""
+        snapshot_path = snapshot_path or self.snapshot_path
+        tmp_path = f"{snapshot_path}.tmp"
+        with open(tmp_path, "wb") as f:
+            pickle.dump({"version": SNAPSHOT_VERSION, "files": self._files}, f)
+        os.replace(tmp_path, snapshot_path)
+
+    def load(self, snapshot_path: str):
+        """Load the index from disk. Files that changed since are re-indexed on sync."""
+        try:
+            with open(snapshot_path, "rb") as f:
+                snapshot = pickle.load(f)
+        except (OSError, pickle.UnpicklingError, EOFError) as e:
+            logger.warning(f"Could not load search index {snapshot_path}: {e}")
+            return
+        if snapshot.get("version") != SNAPSHOT_VERSION:
+            return
+
+        self._files = snapshot["files"]
+        self._postings = defaultdict(set)
+        for path, entry in self._files.items():
+            self._add_postings(path, entry[2])
@@ -1,52 +1,239 @@
+import asyncio
 import datetime
-import fcntl
 import json
 import logging
 import os
+import re
+import signal
 import subprocess
-import threading
 import time
-from queue import Empty, Queue
-from typing import Optional
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, Union
+
+from autocode.output_buffer import OutputBuffer
+from autocode.output_reader import get_output_reader
+from autocode.process_control import (
+    KILL_GRACE_SECONDS,
+    get_reaper,
+    kill_process_group,
+    limit_resources,
+)
+from autocode.pty_session import PtySession
 
 logger = logging.getLogger(__name__)
 
+HISTORY_SIZE = 100  # Commands kept in the history of a shell
+READY_PATTERN_OVERLAP_CHARS = 1000  # Output searched again for a ready pattern
+RUN_MANY_TIMEOUT_SECONDS = 120  # Default timeout of each command of run_many
+LLM_CONSUMER = "llm"  # Cursor of the LLM in the output of the commands
+UNSEEN_OUTPUT_CHARS = 2000  # Unseen output shown per command in the LLM view
+
+
+class _CompletionCheck:
+    """The conditions for a command to return: its exit, a timeout, an idle gap
+    in its output or a ready pattern in its output."""
+
+    def __init__(
+        self,
+        output: OutputBuffer,
+        timeout: float,
+        idle_timeout: Optional[float] = None,
+        ready_regex: Optional[re.Pattern] = None,
+    ):
+        self.output = output
+        self.idle_timeout = idle_timeout
+        self._ready_regex = ready_regex
+        start = time.monotonic()
+        self._deadline = start + timeout
+        self.last_size, self._last_output_time = output.size, start
+        self._checked = 0  # Output already searched for the ready pattern
+
+    def check(self) -> tuple:
+        """Return (done, reason to return early or None, seconds until the next
+        check if the output does not change)."""
+        output = self.output
+        if output.finished:
+            return True, None, 0
+        now = time.monotonic()
+        if output.size != self.last_size:
+            self.last_size, self._last_output_time = output.size, now
+        if self._ready_regex and output.size > self._checked:
+            # Search again the end of the output checked, for matches over chunks
+            text, checked_end = output.read(
+                max(self._checked - READY_PATTERN_OVERLAP_CHARS, 0)
+            )
+            if self._ready_regex.search(text):
+                return True, f"ready: {self._ready_regex.pattern!r} matched", 0
+            self._checked = checked_end
+
+        wake_up = self._deadline
+        if self.idle_timeout is not None:
+            if now - self._last_output_time >= self.idle_timeout:
+                return True, f"no output for {self.idle_timeout}s", 0
+            wake_up = min(wake_up, self._last_output_time + self.idle_timeout)
+        if now >= self._deadline:
+            return True, None, 0
+        return False, None, wake_up - now
+
+    def wait(self) -> Optional[str]:
+        """Block until done, return the reason to return early, if any."""
+        while True:
+            done, reason, delay = self.check()
+            if done:
+                return reason
+            self.output.wait(self.last_size, delay)
+
+    async def wait_async(self) -> Optional[str]:
+        """Wait until done without blocking the event loop: the output buffer
+        wakes it up from the output reader thread."""
+        loop = asyncio.get_running_loop()
+        changed = asyncio.Event()
+
+        def listener():
+            loop.call_soon_threadsafe(changed.set)
+
+        self.output.add_listener(listener)
+        try:
+            while True:
+                changed.clear()
+                done, reason, delay = self.check()
+                if done:
+                    return reason
+                try:
+                    await asyncio.wait_for(changed.wait(), delay)
+                except asyncio.TimeoutError:
+                    pass
+        finally:
+            self.output.remove_listener(listener)
+
 
 class Shell:
     """Interact with the terminal by running commands and storing history."""
 
-    def __init__(self):
-        """Initialize with empty history"""
-        self.history = []
+    def __init__(
+        self,
+        history_size: int = HISTORY_SIZE,
+        log_directory: Optional[str] = None,
+        persistent: bool = False,
+        timeout: Optional[float] = None,
+        idle_timeout: Optional[float] = None,
+        ready_pattern: Optional[str] = None,
+        max_cpu_seconds: Optional[int] = None,
+        max_memory_mb: Optional[int] = None,
+        max_wall_seconds: Optional[float] = None,
+    ):
+        """Initialize with empty history
+        Args:
+            history_size: The number of commands kept in the history.
+            log_directory: Where the full output of the commands overflowing
+                their buffer is written (defaults to the temporary directory).
+            persistent: Run the commands in a single bash kept alive in a
+                pseudo-terminal, so cd, exported variables, activated virtualenvs
+                and shell functions persist between commands.
+            timeout: Default maximum seconds run_command waits for a command to exit.
+            idle_timeout: Default seconds without output after which run_command
+                returns (None to wait for the exit or the timeout).
+            ready_pattern: Default regex making run_command return as soon as the
+                output matches it (e.g. "Listening on port").
+            max_cpu_seconds: CPU time limit of each process of a command.
+            max_memory_mb: Memory limit of each process of a command.
+            max_wall_seconds: Commands running longer are killed.
+        """
+        self.persistent = persistent
+        self.max_cpu_seconds = max_cpu_seconds
+        self.max_wall_seconds = max_wall_seconds
+        self._limits = limit_resources(max_cpu_seconds, max_memory_mb)
+        self.session = PtySession(setup=self._limits) if persistent else None
+        self.killed = []  # (timestamp, command, reason) of the commands killed
+        self._running = []  # (command, process, output) of the commands started
+        self.history = []  # (timestamp, command, OutputBuffer)
+        self.history_size = history_size
+        self.log_directory = log_directory
         self.active_process = None
-        self.output_queue = None
-        self.output_thread = None
+        self.output = None  # OutputBuffer of the active process
         self.RETURN_TIMEOUT_SECONDS = (
-            5  # Maximum seconds to wait before returning partial output
-        )
+            5 if timeout is None else timeout
+        )  # Maximum seconds to wait before returning partial output
+        self.idle_timeout = idle_timeout
+        self.ready_pattern = ready_pattern
 
     def __llm__(self):
-        """Display the command history and their outputs"""
+        """Display a summary of the command history, and the output not read yet.
+        Rendering does not mark the output as read: it is shown again until it
+        is returned by run_command, read_output or read_new_output."""
         if not self.history:
             return "No commands executed yet"
 
+        self._reap()
         output = []
-        for timestamp, command, result in self.history[-20:]:
-            output.append(f"{timestamp} $ {command}")
-            if result:
-                if len(result) > 2000:
-                    result = result[:2000] + "\n...\n"
-                output.append(result)
-
-        # Add current running command status if exists
-        if self.active_process:
-            current_output = self._get_current_output()
-            if current_output:
-                output.append("Current running command output:")
-                output.append(current_output)
+        first = max(len(self.history) - 20, 0)
+        for index, (timestamp, command, command_output) in enumerate(
+            self.history[first:], first
+        ):
+            if not command_output.finished:
+                status = "running"
+            else:
+                status = f"exit code {command_output.return_code}"
+            unseen = command_output.unseen(LLM_CONSUMER)
+            output.append(
+                f"[{index}] {timestamp} $ {command} ({status}, "
+                f"{command_output.size} characters of output)"
+            )
+            if unseen:
+                text, _ = command_output.peek_unseen(LLM_CONSUMER)
+                if len(text) > UNSEEN_OUTPUT_CHARS:
+                    text = (
+                        f"... ({len(text) - UNSEEN_OUTPUT_CHARS} characters, "
+                        f"use read_output({index}) to see them) ...\n"
+                        + text[-UNSEEN_OUTPUT_CHARS:]
+                    )
+                output.append(
+                    f"New output (use read_new_output({index}) to mark it as read):\n"
+                    + text
+                )
+
+        if self.killed:
+            output.append("Killed commands:")
+            for timestamp, command, reason in self.killed[-5:]:
+                output.append(f"{timestamp} $ {command} ({reason})")
 
         return "\n".join(output)
 
+    def read_output(self, index: int = -1, offset: int = 0):
+        """Read again the output of a command of the history.
+        Args:
+            index: The index of the command in the history (the last one by default)
+            offset: The first character of the output to read
+        """
+        if not self.history:
+            return "No commands executed yet"
+        try:
+            _, command, command_output = self.history[index]
+        except IndexError:
+            return f"No command {index} in the history"
+        text, end = command_output.read(offset)
+        command_output.mark_seen(LLM_CONSUMER, end)
+        return f"$ {command}\n{text}"
+
+    def read_new_output(self, index: int = -1):
+        """Read the output of a command not returned or read yet, and mark it as read.
+        Args:
+            index: The index of the command in the history (the last one by default)
+        """
+        if not self.history:
+            return "No commands executed yet"
+        try:
+            _, command, command_output = self.history[index]
+        except IndexError:
+            return f"No command {index} in the history"
+        finished = command_output.finished
+        text, end = command_output.peek_unseen(LLM_CONSUMER)
+        command_output.mark_seen(LLM_CONSUMER, end)
+        if finished and command_output is self.output:
+            self.active_process = None
+        status = "finished" if finished else "still running"
+        return f"$ {command} ({status})\n{text or 'No new output.'}"
+
     def scroll_up(self):
         """Scroll up in the terminal"""
         subprocess.run(["tput", "cuu1"], shell=True)
@@ -55,161 +242,230 @@ class Shell:
         """Scroll down in the terminal"""
         subprocess.run(["tput", "cud1"], shell=True)
 
-    def _process_output(self, process, output_queue):
-        """Process output from the command in a separate thread"""
-        # Set non-blocking mode for stdout and stderr
-        for pipe in [process.stdout, process.stderr]:
-            fd = pipe.fileno()
-            fl = fcntl.fcntl(fd, fcntl.F_GETFL)
-            fcntl.fcntl(fd, fcntl.F_SETFL, fl | os.O_NONBLOCK)
-
-        def read_pipe(pipe):
-            """Read from a non-blocking pipe"""
-            try:
-                output = pipe.read()
-                if output:
-                    if pipe == process.stderr:
-                        return output
-                    return output
-                return ""
-            except (IOError, TypeError):
-                return ""
-
-        while True:
-            if process.poll() is not None:
-                break
-
-            # Read from both pipes
-            stdout_data = read_pipe(process.stdout)
-            stderr_data = read_pipe(process.stderr)
-
-            if stdout_data:
-                output_queue.put(stdout_data)
-            if stderr_data:
-                output_queue.put(stderr_data)
-
-            # Small sleep to prevent CPU spinning
-            time.sleep(0.001)
-
-        # Get any remaining output
-        try:
-            stdout, stderr = process.communicate(timeout=0.5)
-            if stdout:
-                output_queue.put(stdout)
-            if stderr:
-                output_queue.put(stderr)
-        except subprocess.TimeoutExpired:
-            pass
-
-        output_queue.put(None)  # Signal that the process has finished
-
-    def run_command(self, command):
+    def run_command(
+        self,
+        command: str,
+        timeout: Optional[float] = None,
+        idle_timeout: Optional[float] = None,
+        ready_pattern: Optional[str] = None,
+    ):
         """Run a command in the shell and capture its output.
 
         This function executes a shell command and captures its output in real-time.
-        It will return early in two cases:
-        1. If the command completes within 5 seconds
-        2. If the command runs longer than 5 seconds or stops producing output for 0.5 seconds
+        It returns when the command exits, or earlier with the output so far if
+        it is still running:
+        1. After timeout seconds (5 by default)
+        2. If idle_timeout is set and the command produced no output for that long
+        3. If ready_pattern is set and the output matches it
 
         Implementation details:
-        - Uses /bin/bash -c for proper shell command interpretation
-        - Creates a daemon thread for output processing
-        - Uses a Queue for thread-safe output transfer
-        - Implements timeout mechanism of 5 seconds maximum runtime
-        - Accumulates output in memory using a list for efficiency
-        - Uses line buffering (bufsize=1) for real-time output
+        - Uses /bin/bash -c for proper shell command interpretation, or the
+          persistent bash of the shell (with a marker detecting the end of the
+          command and its exit code)
+        - The output is read by a single thread shared by all the shells, which
+          waits on the pipes with selectors (no polling)
+        - Keeps the head and the tail of the output in memory, and writes the
+          full output to a log file if it overflows them
         - Captures both stdout and stderr
+        - Each command runs in its own process group: a command still running is
+          killed, with its children, when a new command is run in the same shell
+          or the shell is closed (run servers in their own shell)
+
+        Args:
+            command: The shell command to execute
+            timeout: Maximum seconds to wait for the command to exit (e.g. 120
+                for a long build), defaults to the shell's timeout
+            idle_timeout: Return once the command produced no output for this
+                many seconds (e.g. 0.5), defaults to the shell's setting
+            ready_pattern: Return as soon as the output matches this regex
+                (e.g. "Listening on port"), defaults to the shell's setting ("" for none)
+
+        Returns:
+            str: The command's output (stdout and stderr combined).
+        """
+        ready_regex = self._ready_regex(ready_pattern)  # Fails before starting
+        output = self._start_command(command)
+        reason = self._completion_check(
+            output, timeout, idle_timeout, ready_regex
+        ).wait()
+        return self._command_result(output, reason)
+
+    async def run_command_async(
+        self,
+        command: str,
+        timeout: Optional[float] = None,
+        idle_timeout: Optional[float] = None,
+        ready_pattern: Optional[str] = None,
+    ):
+        """Run a command like run_command, awaiting its completion without
+        blocking the event loop. The commands still running are not killed, so
+        several commands can run concurrently (except in a persistent shell).
 
         Args:
-            command: str, The shell command to execute
+            command: The shell command to execute
+            timeout: Maximum seconds to wait for the command to exit
+            idle_timeout: Return once the command produced no output for this long
+            ready_pattern: Return as soon as the output matches this regex
 
         Returns:
             str: The command's output (stdout and stderr combined).
         """
+        ready_regex = self._ready_regex(ready_pattern)  # Fails before starting
+        output = self._start_command(command, replace=False)
+        reason = await self._completion_check(
+            output, timeout, idle_timeout, ready_regex
+        ).wait_async()
+        return self._command_result(output, reason)
+
+    def _start_command(self, command: str, replace: bool = True) -> OutputBuffer:
+        """Start a command, its output goes to a new buffer in the history.
+        With replace, the commands still running are killed first."""
+        self._reap()
+        if replace:
+            self._stop_running("replaced by a new command")
+
         timestamp = datetime.datetime.now()
+        output = OutputBuffer(log_directory=self.log_directory)
+        self._add_history(timestamp, command, output)
         try:
             logger.info(f"Running command: {command}")
-            process = subprocess.Popen(
-                ["/bin/bash", "-c", command],
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,
-                stdin=subprocess.DEVNULL,
-                text=True,
-                bufsize=1,  # Line buffered
-                universal_newlines=True,  # Ensures proper newline handling
+            if self.session is not None:
+                self.session.run(command, output)
+                process = self.session.process
+            else:
+                # In its own process group, to kill the command with its children
+                process = subprocess.Popen(
+                    ["/bin/bash", "-c", self._limits + command],
+                    stdout=subprocess.PIPE,
+                    stderr=subprocess.PIPE,
+                    stdin=subprocess.DEVNULL,
+                    bufsize=0,
+                    start_new_session=True,
+                )
+                get_output_reader().watch(
+                    process, on_output=output.write, on_exit=output.finish
+                )
+        except Exception as e:
+            output.write(str(e))
+            output.finish()
+            return output
+
+        self.output = output
+        self.active_process = process
+        entry = (command, process, output)
+        self._running.append(entry)
+        if self.max_wall_seconds is not None:
+            get_reaper().schedule(
+                self.max_wall_seconds,
+                lambda: self._kill(
+                    entry, f"wall time limit of {self.max_wall_seconds}s exceeded"
+                ),
             )
-
-            output = ""
-            self.output_queue = Queue()
-            self.active_process = process
-
-            # Start a thread to handle the process output
-            self.output_thread = threading.Thread(
-                target=self._process_output,
-                args=(process, self.output_queue),
-                daemon=True,
+        return output
+
+    def _kill(self, entry: tuple, reason: str) -> bool:
+        """Stop a command and its children: SIGTERM (or Ctrl-C in a persistent
+        shell), then SIGKILL if it is still running after a grace period."""
+        command, process, output = entry
+        if output.finished:
+            return False
+        logger.info(f"Killing command ({reason}): {command}")
+        self.killed.append((datetime.datetime.now(), command, reason))
+        output.write(f"\nKilled: {reason}\n")
+        if self.session is not None:
+            session = self.session
+            session.interrupt()
+            get_reaper().schedule(
+                KILL_GRACE_SECONDS, lambda: output.finished or session.close()
             )
-            self.output_thread.start()
-
-            start_time = time.time()
-            accumulated_output = []
-
-            while True:
-                if time.time() - start_time > self.RETURN_TIMEOUT_SECONDS:
-                    print("Threading:", threading.enumerate())
-
-                    # Before timing out, try to get any buffered error output
-                    try:
-                        _, stderr = process.communicate(timeout=0.1)
-                        if stderr:
-                            accumulated_output.append(stderr)
-                    except subprocess.TimeoutExpired:
-                        pass
-
-                    output = "".join(accumulated_output)
-                    output += "\nCommand is still running..."
-                    self.history.append((timestamp, command, output))
-                    return output.strip()
-                try:
-                    chunk = self.output_queue.get(timeout=0.1)
-                    if chunk is None:  # Process has finished
-                        # Get the final return code
-                        return_code = process.poll()
-                        self.active_process = None
-                        final_output = "".join(accumulated_output)
-
-                        # If process failed, make sure we get any final error output
-                        if return_code != 0:
-                            _, stderr = process.communicate()
-                            if stderr:
-                                final_output += stderr
-
-                        self.history.append((timestamp, command, final_output))
-                        return final_output.strip()
-
-                    accumulated_output.append(chunk)
-                except Empty:
-                    pass
-
-        except Exception as e:
-            error_msg = str(e)
-            self.history.append((timestamp, command, error_msg))
-            return error_msg
-
-    def _get_current_output(self):
-        """Get the current output of the running command"""
-        if not self.active_process or not self.output_queue:
-            return ""
-
-        output = ""
-        while not self.output_queue.empty():
-            chunk = self.output_queue.get()
-            if chunk is None:  # Process has finished
-                self.active_process = None
-                return output + "\nCommand has finished."
-            output += chunk
+        else:
+            kill_process_group(process.pid, signal.SIGTERM)
+            # Also the children ignoring SIGTERM, after the leader exited
+            get_reaper().schedule(
+                KILL_GRACE_SECONDS, lambda: kill_process_group(process.pid)
+            )
+        return True
+
+    def _stop_running(self, reason: str) -> list:
+        """Kill the commands still running, return the ones killed."""
+        killed = [entry for entry in self._running if self._kill(entry, reason)]
+        if self.session is not None:
+            # The persistent bash runs one command at a time: wait for it to stop
+            for _, _, output in killed:
+                _CompletionCheck(output, 2 * KILL_GRACE_SECONDS + 1).wait()
+        self._reap()
+        return killed
+
+    def _reap(self):
+        """Forget the commands that finished, reporting the CPU limit kills."""
+        running = []
+        for entry in self._running:
+            command, _, output = entry
+            if not output.finished:
+                running.append(entry)
+            elif self.max_cpu_seconds is not None and output.return_code in (
+                -signal.SIGXCPU,
+                128 + signal.SIGXCPU,
+            ):
+                self.killed.append(
+                    (
+                        datetime.datetime.now(),
+                        command,
+                        f"CPU time limit of {self.max_cpu_seconds}s exceeded",
+                    )
+                )
+        self._running = running
+
+    def _ready_regex(self, ready_pattern: Optional[str]) -> Optional[re.Pattern]:
+        """Compile the ready pattern of a call (None for the shell's default,
+        "" for none)."""
+        if ready_pattern is None:
+            ready_pattern = self.ready_pattern
+        return re.compile(ready_pattern) if ready_pattern else None
+
+    def _completion_check(
+        self,
+        output: OutputBuffer,
+        timeout: Optional[float],
+        idle_timeout: Optional[float],
+        ready_regex: Optional[re.Pattern],
+    ) -> _CompletionCheck:
+        """The completion check of a command, with the shell's defaults."""
+        return _CompletionCheck(
+            output,
+            self.RETURN_TIMEOUT_SECONDS if timeout is None else timeout,
+            self.idle_timeout if idle_timeout is None else idle_timeout,
+            ready_regex,
+        )
 
-        return output if output else "No new output."
+    def _command_result(self, output: OutputBuffer, reason: Optional[str]) -> str:
+        result, end = output.read()
+        output.mark_seen(LLM_CONSUMER, end)  # Returned to the caller
+        if output.finished and self.output is output:
+            self.active_process = None
+        if not output.finished:
+            result += "\nCommand is still running..."
+            if reason:
+                result += f" ({reason})"
+        return result.strip()
+
+    def _add_history(self, timestamp, command: str, output: OutputBuffer):
+        self.history.append((timestamp, command, output))
+        while len(self.history) > self.history_size:
+            _, _, evicted_output = self.history.pop(0)
+            evicted_output.close()
+
+    def close(self) -> str:
+        """Kill the commands still running, close the persistent bash, if any, and
+        delete the output logs of the history. Return a report of the commands killed."""
+        killed = self._stop_running("shell closed")
+        if self.session is not None:
+            self.session.close()
+        for _, _, command_output in self.history:
+            command_output.close()  # The output in memory stays readable
+        if not killed:
+            return "No running commands were killed."
+        return "Killed:\n" + "\n".join(f"- {command}" for command, _, _ in killed)
 
 
 class Terminal:
@@ -218,20 +474,58 @@ class Terminal:
     def __init__(self):
         """Initialize with empty history"""
         self.shells = {}
+        self.readiness = {}  # Shell name -> bootstrap status
 
     def __repr__(self):
         """Display the list of shells"""
         if not self.shells:
             return "No shells created yet"
-        return "Available shells:\n" + "\n".join(["- " + name for name in self.shells])
+        return "Available shells:\n" + "\n".join(
+            f"- {name} ({self.readiness[name]})"
+            if name in self.readiness
+            else "- " + name
+            for name in self.shells
+        )
 
     def repr(self):  # Hack to allow for shell.repr()
         """Display the list of shells"""
         return self.__repr__()
 
-    def create_shell(self, name: Optional[str] = None):
-        """Create a new shell"""
-        shell = Shell()
+    def create_shell(
+        self,
+        name: Optional[str] = None,
+        persistent: bool = False,
+        timeout: Optional[float] = None,
+        idle_timeout: Optional[float] = None,
+        ready_pattern: Optional[str] = None,
+        max_cpu_seconds: Optional[int] = None,
+        max_memory_mb: Optional[int] = None,
+        max_wall_seconds: Optional[float] = None,
+    ):
+        """Create a new shell
+        Args:
+            name: The name of the shell.
+            persistent: Keep a single bash session alive between commands, so the
+                working directory, environment variables and activated virtualenvs
+                persist (instead of starting a fresh bash per command).
+            timeout: Maximum seconds run_command waits for a command (default 5).
+            idle_timeout: Make run_command return after this many seconds
+                without output.
+            ready_pattern: Make run_command return as soon as the output matches
+                this regex (e.g. "Listening on port").
+            max_cpu_seconds: CPU time limit of each process of a command.
+            max_memory_mb: Memory limit of each process of a command.
+            max_wall_seconds: Kill the commands running longer than this.
+        """
+        shell = Shell(
+            persistent=persistent,
+            timeout=timeout,
+            idle_timeout=idle_timeout,
+            ready_pattern=ready_pattern,
+            max_cpu_seconds=max_cpu_seconds,
+            max_memory_mb=max_memory_mb,
+            max_wall_seconds=max_wall_seconds,
+        )
         if name is None:
             # Use the shell's id as the name by default
             name = str(id(shell))
@@ -241,32 +535,129 @@ class Terminal:
         return self.shells[name]
 
     def close_shell(self, name: str):
-        """Close a shell by its name"""
+        """Close a shell by its name, killing its running commands"""
         if name not in self.shells:
             raise ValueError(f"Shell {name} does not exist")
-        del self.shells[name]
+        self.readiness.pop(name, None)
+        return self.shells.pop(name).close()
 
-    def save_bootstrap_config(self, config: dict[str, list[str]]):
+    async def run_many(self, commands: list, timeout: Optional[float] = None):
+        """Run commands concurrently, each in a new shell, and return their outputs.
+        Args:
+            commands: The commands, as strings or as dicts with "command" and
+                "timeout" (seconds, for this command)
+            timeout: Seconds after which a command is stopped (default 120)
+        Returns:
+            list[str]: The output of each command, in the order of the commands.
+        """
+        if timeout is None:
+            timeout = RUN_MANY_TIMEOUT_SECONDS
+
+        async def run(item) -> str:
+            if isinstance(item, str):
+                item = {"command": item}
+            command, command_timeout = item["command"], item.get("timeout", timeout)
+            shell = Shell()
+            try:
+                result = await shell.run_command_async(command, timeout=command_timeout)
+                if shell.active_process is not None:
+                    shell.close()
+                    await _CompletionCheck(
+                        shell.output, 2 * KILL_GRACE_SECONDS + 1
+                    ).wait_async()
+                    result = shell.output.text().strip() + (
+                        f"\nCommand timed out after {command_timeout}s and was stopped."
+                    )
+                elif shell.output is not None:
+                    result += f"\nExit code: {shell.output.return_code}"
+            finally:
+                shell.close()  # Deletes the output logs
+            return f"$ {command}\n{result}"
+
+        return list(await asyncio.gather(*(run(item) for item in commands)))
+
+    def save_bootstrap_config(self, config: dict[str, Union[list[str], dict]]):
         """Save the bootstrap config in .terminal.json.
         Args:
-            config: dict[str, list[str]], keys are shell names, values are lists of commands
+            config: keys are shell names, values are lists of commands, or dicts
+                with "commands" (list of commands) and optionally "ready" (a regex
+                matching the output once the shell is ready, e.g. "Listening on
+                port"), "timeout" (maximum seconds to wait for each command or for
+                the ready regex; by default the commands before the last one run
+                until they exit) and "persistent" (keep one bash session)
         """
         with open(".terminal.json", "w") as f:
             json.dump(config, f, indent=2)
 
     def bootstrap_shells(self):
-        """Setup the shells based on the config file in .terminal.json."""
+        """Setup the shells based on the config file in .terminal.json.
+        The shells are started in parallel, the commands of each shell in order."""
         if not os.path.exists(".terminal.json"):
             raise ValueError("No config file found")
 
         with open(".terminal.json", "r") as f:
             config = json.load(f)
 
-        for name, commands in config.items():
-            self.create_shell(name)
-            for command in commands:
-                self.shells[name].run_command(command)
+        shell_configs = {}
+        for name, shell_config in config.items():
+            if isinstance(shell_config, list):
+                shell_config = {"commands": shell_config}
+            self.create_shell(name, persistent=shell_config.get("persistent", False))
+            self.readiness[name] = "starting"
+            shell_configs[name] = shell_config
+
+        if shell_configs:
+            with ThreadPoolExecutor(max_workers=len(shell_configs)) as executor:
+                for name, status in zip(
+                    shell_configs,
+                    executor.map(
+                        self._bootstrap_shell, shell_configs, shell_configs.values()
+                    ),
+                ):
+                    self.readiness[name] = status
         logger.info(f"Boostrapped shells based on config:\n{config}")
-        created_shells = [s for s in self.shells if name in config]
+        created_shells = [name for name in self.shells if name in config]
         logger.info(f"Created shells:\n{created_shells}")
         return created_shells
+
+    def _bootstrap_shell(self, name: str, shell_config: dict) -> str:
+        """Run the commands of a shell in order, and return its readiness."""
+        shell = self.shells[name]
+        ready = shell_config.get("ready")
+        timeout = shell_config.get("timeout")
+        commands = shell_config.get("commands", [])
+        killed_before = len(shell.killed)
+        matched, outputs = False, []  # (command, OutputBuffer) of each command run
+        try:
+            for i, command in enumerate(commands):
+                final = i == len(commands) - 1
+                result = shell.run_command(
+                    command, timeout=timeout, ready_pattern=ready if final else ""
+                )
+                output = shell.history[-1][2]
+                outputs.append((command, output))
+                if not final:
+                    # The next command would kill it: wait for its exit, or its
+                    # configured timeout
+                    while timeout is None and not output.finished:
+                        output.wait(output.size)
+                    if not output.finished:
+                        return f"not ready: `{command}` still running after {timeout}s"
+                    result = output.text()
+                matched = matched or bool(ready and re.search(ready, result))
+        except Exception as e:
+            logger.exception(f"Failed to bootstrap shell {name}")
+            return f"failed: {e}"
+
+        # Checked once all the commands ran: a command may be killed later
+        if len(shell.killed) > killed_before:
+            _, command, reason = shell.killed[killed_before]
+            return f"failed: `{command}` was killed ({reason})"
+        for command, output in outputs:
+            if output.finished and output.return_code:
+                return f"failed: `{command}` exited with code {output.return_code}"
+        if matched:
+            return "ready"
+        if ready:
+            return f"not ready: no output matched {ready!r}"
+        return "running" if shell.active_process is not None else "ready"
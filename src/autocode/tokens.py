@@ -0,0 +1,13 @@
+CHARS_PER_TOKEN = 4  # Approximation of characters per token
+
+
+def estimate_token_count(text: str) -> int:
+    """
+    Estimate the token count of a text using a simple character-based approximation.
+    Uses 4 characters per token as a rough approximation.
+    """
+    return len(text) // CHARS_PER_TOKEN
+
+
+def tokens_to_chars(tokens: int) -> int:
+    return tokens * CHARS_PER_TOKEN
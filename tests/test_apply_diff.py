@@ -0,0 +1,151 @@
+import pytest
+
+from autocode.code_editor_utils import apply_diff
+from autocode.patch import PatchError, apply_hunks, parse_unified_diff
+
+
+@pytest.fixture
+def repo(tmp_path):
+    (tmp_path / "a.txt").write_text("".join(f"line {i}\n" for i in range(1, 21)))
+    (tmp_path / "b.txt").write_text("one\ntwo\nthree")
+    return tmp_path
+
+
+def test_apply_multi_file_diff(repo):
+    diff = """diff --git a/a.txt b/a.txt
+--- a/a.txt
++++ b/a.txt
+@@ -2,3 +2,3 @@
+ line 2
+-line 3
++line three
+ line 4
+@@ -15,3 +15,4 @@
+ line 15
+ line 16
++line 16.5
+ line 17
+--- a/b.txt
++++ b/b.txt
+@@ -2,2 +2,2 @@
+ two
+-three
+\\ No newline at end of file
++three
+--- /dev/null
++++ b/new/c.txt
+@@ -0,0 +1,2 @@
++hello
++world
+"""
+    report = apply_diff(diff, root=str(repo))
+
+    assert report.startswith("Patch applied:")
+    assert "Hunk #2 applied" in report
+    a_lines = (repo / "a.txt").read_text().splitlines()
+    assert a_lines[2] == "line three"
+    assert a_lines[16] == "line 16.5"
+    assert (repo / "b.txt").read_text() == "one\ntwo\nthree\n"
+    assert (repo / "new" / "c.txt").read_text() == "hello\nworld\n"
+
+
+def test_apply_with_offset_and_whitespace_fuzz():
+    content = "header\nextra\n" + "a\nb  \nc\n"
+    (file_patch,) = parse_unified_diff(
+        "--- a/f\n+++ b/f\n@@ -1,3 +1,3 @@\n a\n-b\n+B\n c\n"
+    )
+    new_content, results = apply_hunks(content, file_patch.hunks)
+    assert new_content == "header\nextra\na\nB\nc\n"
+    assert results == ["Hunk #1 applied at offset +2 (ignoring trailing whitespace)"]
+
+
+def test_failed_hunk_applies_nothing(repo):
+    before = (repo / "a.txt").read_text()
+    diff = """--- a/a.txt
++++ b/a.txt
+@@ -1,2 +1,2 @@
+-line 1
++line one
+ line 2
+--- a/b.txt
++++ b/b.txt
+@@ -1 +1 @@
+-missing
++present
+"""
+    report = apply_diff(diff, root=str(repo))
+
+    assert report.startswith("Patch not applied:")
+    assert "Hunk #1 FAILED" in report
+    assert (repo / "a.txt").read_text() == before
+
+
+def test_delete_and_crlf(repo):
+    (repo / "win.txt").write_bytes(b"x\r\ny\r\n")
+    diff = """--- a/win.txt
++++ b/win.txt
+@@ -1,2 +1,2 @@
+ x
+-y
++z
+--- a/b.txt
++++ /dev/null
+@@ -1,3 +0,0 @@
+-one
+-two
+-three
+\\ No newline at end of file
+"""
+    assert apply_diff(diff, root=str(repo)).startswith("Patch applied:")
+    assert (repo / "win.txt").read_bytes() == b"x\r\nz\r\n"
+    assert not (repo / "b.txt").exists()
+
+
+def test_invalid_diff():
+    with pytest.raises(PatchError):
+        parse_unified_diff("@@ -1 +1 @@\n-a\n+b\n")
+    assert apply_diff("not a diff").startswith("Patch not applied")
+
+
+def test_hunks_are_read_by_their_line_counts(repo):
+    # Blank lines after the last hunk are not context
+    (repo / "two.txt").write_text("one\n")
+    report = apply_diff(
+        "--- a/two.txt\n+++ b/two.txt\n@@ -1 +1,2 @@\n one\n+TWO\n\n\n",
+        root=str(repo),
+    )
+    assert report.startswith("Patch applied:")
+    assert (repo / "two.txt").read_text() == "one\nTWO\n"
+
+    # Removed and added lines looking like file headers
+    (repo / "sql.txt").write_text("-- comment\nSELECT 1;\n")
+    report = apply_diff(
+        "--- a/sql.txt\n+++ b/sql.txt\n@@ -1,2 +1,2 @@\n--- comment\n+++ new\n SELECT 1;\n",
+        root=str(repo),
+    )
+    assert report.startswith("Patch applied:")
+    assert (repo / "sql.txt").read_text() == "++ new\nSELECT 1;\n"
+
+
+def test_only_newlines_split_lines():
+    content = "x = '\x0c'\ny = ' \x85\x1c'\nz = 1\n"
+    (file_patch,) = parse_unified_diff(
+        "--- a/f\n+++ b/f\n@@ -2,2 +2,2 @@\n y = ' \x85\x1c'\n-z = 1\n+z = 2\n"
+    )
+    new_content, _ = apply_hunks(content, file_patch.hunks)
+    assert new_content == "x = '\x0c'\ny = ' \x85\x1c'\nz = 2\n"
+
+
+@pytest.mark.parametrize("path", ["../escape.txt", "sub/../../escape.txt"])
+def test_paths_outside_the_root_are_refused(repo, path):
+    report = apply_diff(
+        f"--- /dev/null\n+++ b/{path}\n@@ -0,0 +1 @@\n+escaped\n", root=str(repo)
+    )
+    assert report.startswith("Patch not applied: Path outside of the root")
+    assert not (repo.parent / "escape.txt").exists()
+
+    report = apply_diff(
+        "--- /dev/null\n+++ /tmp/escape.txt\n@@ -0,0 +1 @@\n+escaped\n",
+        root=str(repo),
+    )
+    assert report.startswith("Patch not applied: Absolute path not allowed")
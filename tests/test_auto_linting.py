@@ -3,7 +3,9 @@ import os
 
 import pytest
 
+from autocode import code_editor, code_editor_utils
 from autocode.code_editor import CodeEditor
+from autocode.code_editor_utils import load_vscode_settings, resolve_language_settings
 
 
 @pytest.fixture
@@ -83,3 +85,141 @@ def test_auto_linting_not_applied_without_settings(
         content.strip()
         == "def test_function():\n    print('Hello, Unlinted World!')".strip()
     )
+
+
+def test_auto_linting_uses_editor_directory_settings(
+    temp_python_file, mock_vscode_settings, monkeypatch, tmp_path_factory
+):
+    # The settings are found from the editor directory, not the current directory
+    monkeypatch.chdir(tmp_path_factory.mktemp("elsewhere"))
+    editor = CodeEditor(str(temp_python_file.parent))
+
+    editor.str_replace(str(temp_python_file), "Hello, World!", "Hello, Root!")
+
+    with open(temp_python_file, "r") as f:
+        assert f.read() == 'def test_function():\n    print("Hello, Root!")\n'
+
+
+def test_load_vscode_settings_jsonc_and_cache(tmp_path):
+    settings_path = tmp_path / ".vscode" / "settings.json"
+    os.makedirs(settings_path.parent)
+    settings_path.write_text(
+        """{
+    // Comment
+    "editor.formatOnSave": true, /* block comment */
+    "url": "http://example.com",
+    "[javascript][typescript]": {"editor.defaultFormatter": "prettier",},
+}"""
+    )
+
+    settings = load_vscode_settings(str(tmp_path))
+    assert settings["url"] == "http://example.com"
+    assert load_vscode_settings(str(tmp_path)) is settings
+
+    typescript = resolve_language_settings(str(tmp_path), "typescript")
+    assert typescript == {
+        "editor.formatOnSave": True,
+        "url": "http://example.com",
+        "editor.defaultFormatter": "prettier",
+    }
+    assert "editor.defaultFormatter" not in resolve_language_settings(
+        str(tmp_path), "python"
+    )
+
+    settings_path.write_text('{"editor.formatOnSave": false}')
+    os.utime(settings_path, ns=(0, 0))
+    assert load_vscode_settings(str(tmp_path)) == {"editor.formatOnSave": False}
+
+
+@pytest.mark.parametrize("backend", ["server", "subprocess"])
+def test_transaction_lints_once_at_commit(
+    tmp_path, mock_vscode_settings, monkeypatch, backend
+):
+    monkeypatch.setattr(code_editor_utils, "RUFF_BACKEND", backend)
+    (tmp_path / "a.py").write_text("x = 'a'\n")
+    (tmp_path / "b.py").write_text("y = 'b'\n")
+    editor = CodeEditor(str(tmp_path))
+
+    editor.start_transaction()
+    editor.str_replace(str(tmp_path / "a.py"), "'a'", "'A'")
+    editor.edit_file(str(tmp_path / "a.py"), 2, 0, "z = 'c'")
+    editor.create_file(str(tmp_path / "c.py"), "w = 'c'\n")
+    editor.delete_file(str(tmp_path / "b.py"))
+
+    # Nothing is written before the commit
+    assert (tmp_path / "a.py").read_text() == "x = 'a'\n"
+    assert (tmp_path / "b.py").exists()
+    assert not (tmp_path / "c.py").exists()
+    assert "'A'" in editor.read_file(str(tmp_path / "a.py"))
+
+    summary = editor.commit_transaction()
+    assert summary.startswith("Transaction committed: 2 files written, 1 files deleted")
+    assert (tmp_path / "a.py").read_text() == 'x = "A"\nz = "c"\n'
+    assert (tmp_path / "c.py").read_text() == 'w = "c"\n'
+    assert not (tmp_path / "b.py").exists()
+
+
+def test_transaction_rollback(tmp_path):
+    (tmp_path / "a.py").write_text("x = 1\n")
+    editor = CodeEditor(str(tmp_path))
+
+    editor.start_transaction()
+    with pytest.raises(ValueError):
+        editor.start_transaction()
+    editor.str_replace(str(tmp_path / "a.py"), "1", "2")
+    assert "transaction is in progress" in editor.__llm__()
+    assert (
+        editor.rollback_transaction() == "Transaction rolled back (1 files discarded)"
+    )
+
+    assert (tmp_path / "a.py").read_text() == "x = 1\n"
+    assert str(tmp_path / "a.py") not in editor._edited_lines
+    assert "x = 1" in editor.read_file(str(tmp_path / "a.py"))
+    with pytest.raises(ValueError):
+        editor.commit_transaction()
+
+
+def test_transaction_rollback_discards_line_edits(tmp_path):
+    path = str(tmp_path / "file.txt")
+    (tmp_path / "file.txt").write_text("a\nb\nc\n")
+    editor = CodeEditor(str(tmp_path))
+    editor.read_file(path)
+    editor.edit_file(path, 1, 0, "first")
+
+    editor.start_transaction()
+    editor.edit_file(path, 1, 0, "STAGED")
+    editor.rollback_transaction()
+    editor.edit_file(path, 5, 0, "last")
+
+    assert (tmp_path / "file.txt").read_text() == "first\na\nb\nc\nlast\n"
+
+
+def test_transaction_write_failure_keeps_remaining_edits(tmp_path, monkeypatch):
+    for name in ("a.py", "b.py"):
+        (tmp_path / name).write_text("x = 1\n")
+    editor = CodeEditor(str(tmp_path))
+    editor.start_transaction()
+    editor.str_replace(str(tmp_path / "a.py"), "1", "2")
+    editor.str_replace(str(tmp_path / "b.py"), "1", "2")
+
+    real_atomic_write = code_editor.atomic_write
+
+    def failing_atomic_write(path, chunks, fsync=False):
+        if path.endswith("b.py"):
+            raise PermissionError(13, "Permission denied")
+        real_atomic_write(path, chunks, fsync)
+
+    monkeypatch.setattr(code_editor, "atomic_write", failing_atomic_write)
+    summary = editor.commit_transaction()
+    assert summary.splitlines()[:3] == [
+        "Transaction partially committed: 1 files written",
+        "Failed to write b.py: Permission denied",
+        "The 1 remaining edits are still staged: "
+        "fix the problem and commit again, or roll back.",
+    ]
+    assert (tmp_path / "a.py").read_text() == "x = 2\n"
+    assert "x = 2" in editor.read_file(str(tmp_path / "a.py"))
+
+    monkeypatch.setattr(code_editor, "atomic_write", real_atomic_write)
+    assert editor.commit_transaction().startswith("Transaction committed: 1 files")
+    assert (tmp_path / "b.py").read_text() == "x = 2\n"
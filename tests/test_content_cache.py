@@ -0,0 +1,41 @@
+from unittest.mock import patch
+
+from autocode.code_editor import CodeEditor
+from autocode.content_cache import ContentCache
+
+
+def test_lru_eviction_by_total_chars():
+    cache = ContentCache(max_chars=10)
+    cache.put(("a", 1, 4, 1, None), "aaaa")
+    cache.put(("b", 1, 4, 1, None), "bbbb")
+    cache.get(("a", 1, 4, 1, None))
+    cache.put(("c", 1, 4, 1, None), "cccc")
+
+    assert cache.get(("b", 1, 4, 1, None)) is None
+    assert cache.get(("a", 1, 4, 1, None)) == "aaaa"
+    assert cache.get(("c", 1, 4, 1, None)) == "cccc"
+
+
+def test_invalidate_path():
+    cache = ContentCache()
+    cache.put(("a", 1, 4, 1, None), "aaaa")
+    cache.put(("a", 1, 4, 2, 3), "aa")
+    cache.put(("b", 1, 4, 1, None), "bbbb")
+    cache.invalidate("a")
+
+    assert len(cache) == 1
+
+
+def test_llm_context_reuses_unchanged_files(tmp_path):
+    (tmp_path / "a.txt").write_text("hello")
+    editor = CodeEditor(str(tmp_path))
+    editor.read_file("a.txt")
+
+    with patch.object(editor, "_format_file", wraps=editor._format_file) as format_file:
+        first = editor.__llm__()
+        second = editor.__llm__()
+        assert format_file.call_count == 1
+    assert first == second
+
+    editor.str_replace("a.txt", "hello", "bonjour")
+    assert "bonjour" in editor.__llm__()
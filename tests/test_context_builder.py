@@ -0,0 +1,94 @@
+import os
+
+from autocode.code_editor import CodeEditor
+from autocode.context_builder import (
+    edit_windows,
+    shift_edit_windows,
+    summarize_directory,
+)
+
+
+def test_summarize_directory_keeps_small_listings():
+    files = ["/repo/a.py", "/repo/src/b.py"]
+    assert summarize_directory(files, "/repo", 1000) == "/repo/a.py\n/repo/src/b.py"
+
+
+def test_summarize_directory_collapses_deep_trees():
+    files = ["/repo/README.md"] + [
+        f"/repo/src/pkg_{i}/module_{j}.py" for i in range(10) for j in range(20)
+    ]
+    summary = summarize_directory(files, "/repo", 300)
+
+    assert len(summary) < 400
+    assert summary.startswith("201 files")
+    assert "src/" in summary
+    assert "pkg_0/ (20 files)" in summary
+    assert "module_0.py" not in summary
+    assert "README.md" in summary
+
+
+def test_edit_windows_are_merged_and_clamped():
+    assert edit_windows([(10, 10), (12, 13), (40, 40)], 42) == [(6, 17), (36, 42)]
+    assert edit_windows([(1, 1)], 3) == [(1, 3)]
+
+
+def test_edit_windows_follow_the_later_edits():
+    edits = [(10, 12), (40, 40)]
+    # 2 lines inserted before, inside, then after the first edit
+    assert shift_edit_windows(edits, 1, 0, 2) == [(12, 14), (42, 42), (1, 2)]
+    assert shift_edit_windows(edits, 11, 1, 3) == [(10, 14), (42, 42), (11, 13)]
+    assert shift_edit_windows(edits, 20, 0, 2) == [(10, 12), (42, 42), (20, 21)]
+    # Deleted lines
+    assert shift_edit_windows(edits, 5, 10, 0) == [(5, 5), (30, 30), (5, 5)]
+
+
+def test_llm_context_is_unlimited_by_default(tmp_path):
+    (tmp_path / "big.txt").write_text("".join(f"line {i}\n" for i in range(1, 5001)))
+    editor = CodeEditor(str(tmp_path))
+    editor.read_file("big.txt")
+    context = editor.__llm__()
+    assert "line 1\n" in context
+    assert "line 5000" in context
+
+
+def test_llm_context_shows_every_replacement(tmp_path):
+    lines = [f"line {i}" for i in range(1, 2001)]
+    lines[99] = lines[1899] = "target"
+    (tmp_path / "big.txt").write_text("\n".join(lines) + "\n")
+    editor = CodeEditor(str(tmp_path), context_budget_tokens=500)
+    editor.str_replace("big.txt", "target", "first\nsecond")
+    # Lines inserted above the replacements move them down
+    editor.edit_file("big.txt", 1, 0, "\n".join(["new"] * 10))
+    context = editor.__llm__()
+
+    assert "110|first" in context
+    assert "1911|first" in context
+    assert "1912|second" in context
+
+
+def test_llm_context_respects_budget(tmp_path):
+    big = tmp_path / "big.txt"
+    big.write_text("".join(f"line {i}\n" for i in range(1, 2001)))
+    (tmp_path / "small.txt").write_text("small file")
+    editor = CodeEditor(str(tmp_path), context_budget_tokens=500)
+
+    editor.read_file("small.txt")
+    editor.edit_file("big.txt", 1000, 1, "edited line")
+    context = editor.__llm__()
+
+    assert len(context) < 2500
+    # Most recently used first
+    open_files = context.split("Open files:")[1]
+    assert open_files.index("big.txt") < open_files.index("small.txt")
+    assert "edited line" in context
+    assert "line 996" in context
+    assert "line 10\n" not in context
+    assert "small file" in context
+
+
+def test_llm_context_names_files_over_budget(tmp_path):
+    (tmp_path / "big.txt").write_text("x" * 10_000)
+    editor = CodeEditor(str(tmp_path), context_budget_tokens=500)
+    editor.read_file(os.path.join(str(tmp_path), "big.txt"))
+
+    assert "not shown to fit the context budget" in editor.__llm__()
@@ -2,7 +2,11 @@ import os
 
 import pytest
 
-from autocode.directory_utils import list_non_gitignore_files
+from autocode.directory_utils import (
+    GitignoreMatcher,
+    get_gitignore_matcher,
+    list_non_gitignore_files,
+)
 
 
 @pytest.fixture
@@ -201,3 +205,69 @@ def test_follow_parent_gitignore(temp_directory):
     assert ".env.dev" not in rel_files, (
         "File should be ignored (follows parent .gitignore)"
     )
+
+
+def test_default_patterns_ignore_top_level_directories(tmp_path):
+    """Test that default ignored directories are excluded at the top level too"""
+    (tmp_path / "index.js").write_text("content")
+    (tmp_path / "node_modules" / "lib").mkdir(parents=True)
+    (tmp_path / "node_modules" / "lib" / "index.js").write_text("content")
+
+    files = list_non_gitignore_files(str(tmp_path))
+    rel_files = [os.path.relpath(f, str(tmp_path)).replace(os.sep, "/") for f in files]
+
+    assert set(rel_files) == {"index.js"}
+
+
+def test_gitignore_matcher_patterns(tmp_path):
+    """Test anchored, directory-only and wildcard patterns"""
+    (tmp_path / ".gitignore").write_text(
+        "/build\nlogs/\n*.log\ndocs/**/*.tmp\n!keep.log\n"
+    )
+    matcher = GitignoreMatcher(str(tmp_path))
+
+    assert matcher.is_ignored(str(tmp_path / "build" / "out.js"))
+    assert not matcher.is_ignored(str(tmp_path / "src" / "build" / "out.js"))
+    assert matcher.is_ignored(str(tmp_path / "src" / "logs"), is_dir=True)
+    assert not matcher.is_ignored(str(tmp_path / "src" / "logs"))
+    assert matcher.is_ignored(str(tmp_path / "src" / "debug.log"))
+    assert matcher.is_ignored(str(tmp_path / "docs" / "a" / "b" / "x.tmp"))
+    assert not matcher.is_ignored(str(tmp_path / "x.tmp"))
+
+
+def test_gitignore_matcher_reloads_modified_gitignore(tmp_path):
+    """Test that a cached matcher picks up changes to a .gitignore file"""
+    gitignore = tmp_path / ".gitignore"
+    gitignore.write_text("*.txt\n")
+    (tmp_path / "file.txt").write_text("content")
+    (tmp_path / "file.py").write_text("content")
+
+    matcher = get_gitignore_matcher(str(tmp_path))
+    files = list_non_gitignore_files(str(tmp_path))
+    rel_files = {os.path.relpath(f, str(tmp_path)) for f in files}
+    assert rel_files == {".gitignore", "file.py"}
+
+    gitignore.write_text("*.py\n")
+    os.utime(gitignore, ns=(0, 0))
+    files = list_non_gitignore_files(str(tmp_path))
+    rel_files = {os.path.relpath(f, str(tmp_path)) for f in files}
+    assert rel_files == {".gitignore", "file.txt"}
+    assert get_gitignore_matcher(str(tmp_path)) is matcher
+
+
+def test_ignored_directories_are_not_walked(temp_directory, monkeypatch):
+    """Test that the walk never scans ignored directories"""
+    (temp_directory / "node_modules" / "lib").mkdir(parents=True)
+    (temp_directory / "node_modules" / "lib" / "index.js").write_text("content")
+
+    scanned = []
+    scandir = os.scandir
+
+    def recording_scandir(path):
+        scanned.append(os.path.relpath(path, str(temp_directory)))
+        return scandir(path)
+
+    monkeypatch.setattr(os, "scandir", recording_scandir)
+    list_non_gitignore_files(str(temp_directory))
+
+    assert set(scanned) == {".", "subdir"}
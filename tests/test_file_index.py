@@ -0,0 +1,93 @@
+import os
+
+import pytest
+
+from autocode.code_editor import CodeEditor
+from autocode.directory_utils import list_non_gitignore_files
+from autocode.file_index import FileIndex
+
+
+@pytest.fixture
+def repo(tmp_path):
+    (tmp_path / ".git").mkdir()
+    (tmp_path / ".gitignore").write_text("*.log\n")
+    (tmp_path / "main.py").write_text("content")
+    (tmp_path / "debug.log").write_text("content")
+    (tmp_path / "src").mkdir()
+    (tmp_path / "src" / "module.py").write_text("content")
+    return tmp_path
+
+
+def rel_files(index, root):
+    return {os.path.relpath(f, str(root)) for f in index.files()}
+
+
+def test_file_index_matches_directory_listing(repo):
+    index = FileIndex(str(repo), watch=False, poll_interval=0)
+    assert set(index.files()) == set(list_non_gitignore_files(str(repo)))
+
+
+def test_file_index_polls_changed_directories(repo):
+    index = FileIndex(str(repo), watch=False, poll_interval=0)
+    index.files()
+
+    (repo / "src" / "new.py").write_text("content")
+    (repo / "main.py").unlink()
+    (repo / "pkg" / "sub").mkdir(parents=True)
+    (repo / "pkg" / "sub" / "deep.py").write_text("content")
+
+    assert rel_files(index, repo) == {
+        ".gitignore",
+        "src/module.py",
+        "src/new.py",
+        "pkg/sub/deep.py",
+    }
+
+
+def test_file_index_rescans_after_gitignore_change(repo):
+    index = FileIndex(str(repo), watch=False, poll_interval=0)
+    index.files()
+
+    (repo / ".gitignore").write_text("src/\n")
+    os.utime(repo / ".gitignore", ns=(0, 0))
+
+    assert rel_files(index, repo) == {".gitignore", "main.py", "debug.log"}
+
+
+def test_file_index_polls_at_most_once_per_interval(repo):
+    index = FileIndex(str(repo), watch=False, poll_interval=60)
+    index.files()
+
+    (repo / "src" / "new.py").write_text("content")
+    assert "src/new.py" not in rel_files(index, repo)
+    index.notify(str(repo / "src" / "new.py"))
+    assert "src/new.py" in rel_files(index, repo)
+
+    index.poll_interval = 0
+    (repo / "main.py").unlink()
+    assert "main.py" not in rel_files(index, repo)
+
+
+def test_file_index_close_stops_the_observer(repo):
+    pytest.importorskip("watchdog")
+    index = FileIndex(str(repo), poll_interval=0)
+    index.files()
+    observer = index._observer
+    assert observer.is_alive()
+
+    index.close()
+    assert not observer.is_alive()
+    (repo / "new.py").write_text("content")
+    assert "new.py" in rel_files(index, repo)  # Polled after close
+
+
+def test_code_editor_notifies_file_index(repo):
+    with CodeEditor(str(repo), file_index=True) as editor:
+        editor.display_directory()
+
+        editor.create_file("src/created.txt", "content")
+        assert "src/created.txt" in rel_files(editor.file_index, repo)
+
+        editor.delete_file("src/created.txt")
+        assert "src/created.txt" not in rel_files(editor.file_index, repo)
+    assert not editor.file_index.watch
@@ -0,0 +1,135 @@
+import subprocess
+
+import pytest
+
+from autocode.git_backend import GitError, GitRepository, Status
+
+
+def git(root, *args):
+    return subprocess.run(
+        ["git", *args], cwd=root, capture_output=True, text=True, check=True
+    ).stdout.strip()
+
+
+@pytest.fixture
+def repo(tmp_path):
+    git(tmp_path, "init", "-q", "-b", "main")
+    git(tmp_path, "config", "user.email", "dev@example.com")
+    git(tmp_path, "config", "user.name", "Dev")
+    (tmp_path / "file.txt").write_text("first\n")
+    git(tmp_path, "add", "file.txt")
+    git(tmp_path, "commit", "-q", "-m", "First commit")
+    return tmp_path
+
+
+def test_head_and_refs_from_disk(repo):
+    repository = GitRepository(repo)
+    assert repository.branch() == "main"
+    assert repository.head_commit() == git(repo, "rev-parse", "HEAD")
+
+    git(repo, "checkout", "-q", "-b", "feature")
+    (repo / "file.txt").write_text("second\n")
+    git(repo, "commit", "-q", "-am", "Second commit")
+    assert repository.branch() == "feature"
+    assert repository.head_commit() == git(repo, "rev-parse", "HEAD")
+
+    # Refs moved to packed-refs, then HEAD detached
+    git(repo, "pack-refs", "--all")
+    assert repository.resolve_ref("refs/heads/main") == git(repo, "rev-parse", "main")
+    assert repository.head_commit() == git(repo, "rev-parse", "HEAD")
+    git(repo, "checkout", "-q", "--detach", "main")
+    assert repository.branch() == "HEAD"
+    assert repository.head_commit() == git(repo, "rev-parse", "main")
+    repository.close()
+
+
+def test_objects_from_one_cat_file_process(repo):
+    (repo / "with space.txt").write_text("spaced\n")
+    git(repo, "add", "with space.txt")
+    git(repo, "commit", "-q", "-m", "Add a file with a space")
+    repository = GitRepository(repo)
+    assert repository.read_file("with space.txt") == "spaced\n"
+    assert repository.read_file("file.txt") == "first\n"
+    process = repository.process
+
+    (repo / "file.txt").write_text("second\n")
+    git(repo, "commit", "-q", "-am", "Second commit")
+    assert repository.read_file("file.txt") == "second\n"
+    assert repository.read_file("file.txt", "HEAD~1") == "first\n"
+    assert repository.read_file("missing.txt") is None
+    assert repository.read_file("no such.txt") is None
+    assert repository.read_file("not a missing file.txt") is None
+    assert repository.read_object("HEAD")[0] == "commit"
+    assert repository.process is process
+
+    repository.close()
+    assert repository.read_file("file.txt") == "second\n"  # Restarted
+    repository.close()
+
+
+def test_config_is_cached_until_it_changes(repo):
+    repository = GitRepository(repo)
+    assert repository.config("remote.origin.url") is None
+    git(repo, "remote", "add", "origin", "git@github.com:owner/repo.git")
+    assert repository.config("remote.origin.url") == "git@github.com:owner/repo.git"
+    assert repository.config("User.Name") == "Dev"
+
+
+def test_worktree_and_not_a_repository(repo, tmp_path_factory):
+    worktree = tmp_path_factory.mktemp("worktree") / "tree"
+    git(repo, "worktree", "add", "-q", "-b", "other", str(worktree))
+    repository = GitRepository(worktree / "")
+    assert repository.branch() == "other"
+    assert repository.head_commit() == git(repo, "rev-parse", "main")
+
+    with pytest.raises(GitError):
+        GitRepository(tmp_path_factory.mktemp("empty"))
+
+
+def test_status_structured(repo):
+    repository = GitRepository(repo)
+    status = repository.status()
+    assert (status.branch, status.head) == ("main", git(repo, "rev-parse", "HEAD"))
+    assert status.entries == []
+    assert "working tree clean" in status.summary()
+
+    (repo / "file.txt").write_text("changed\n")
+    (repo / "with space.txt").write_text("new\n")
+    git(repo, "add", "with space.txt")
+    git(repo, "mv", "file.txt", "renamed.txt")
+    (repo / "renamed.txt").write_text("changed again\n")
+    (repo / "untracked").mkdir()
+    (repo / "untracked" / "a.txt").write_text("")
+
+    status = repository.status()
+    assert [(e.path, e.index, e.worktree) for e in status.staged] == [
+        ("renamed.txt", "R", "M"),
+        ("with space.txt", "A", "."),
+    ]
+    assert status.staged[0].original_path == "file.txt"
+    assert [e.path for e in status.unstaged] == ["renamed.txt"]
+    assert [e.path for e in status.untracked] == ["untracked/"]
+    assert status.summary() == (
+        "On branch main\n"
+        "Staged (2):\n"
+        "  R file.txt -> renamed.txt\n"
+        "  A with space.txt\n"
+        "Not staged (1):\n"
+        "  M renamed.txt\n"
+        "Untracked (1):\n"
+        "  ? untracked/"
+    )
+
+
+def test_status_summary_of_large_change_sets():
+    records = ["# branch.oid (initial)", "# branch.head main"]
+    records += [f"? src/module_{i}.py" for i in range(1000)]
+    records += [f"? docs/page_{i}.md" for i in range(10)]
+    status = Status.parse("\0".join(records) + "\0")
+    assert len(status.untracked) == 1010
+    assert status.summary() == (
+        "On branch main (no commits yet)\n"
+        "Untracked (1010):\n"
+        "  src/: 1000 paths\n"
+        "  docs/: 10 paths"
+    )
@@ -0,0 +1,107 @@
+import os
+
+import pytest
+
+from autocode import line_buffer
+from autocode.code_editor import CodeEditor
+from autocode.file_utils import FileConflictError
+from autocode.line_buffer import LineBuffer
+
+
+def test_replace_across_chunks(monkeypatch):
+    monkeypatch.setattr(line_buffer, "CHUNK_LINES", 4)
+    lines = [f"line {i}" for i in range(10)]
+    buffer = LineBuffer(lines)
+
+    buffer.replace(3, 9, ["new"])
+    expected = lines[:3] + ["new"] + lines[9:]
+    assert buffer.line_count() == len(expected)
+    assert buffer.lines() == expected
+    assert buffer.lines(2, 4) == ["line 2", "new"]
+
+    buffer.replace(buffer.line_count(), buffer.line_count(), ["end"] * 6)
+    buffer.replace(0, 0, ["start"])
+    expected = ["start"] + expected + ["end"] * 6
+    assert buffer.lines() == expected
+    assert buffer.text() == "\n".join(expected) + "\n"
+
+
+def test_newline_style_is_kept(tmp_path):
+    path = tmp_path / "file.txt"
+    path.write_bytes(b"a\r\nb\r\nc")
+    buffer = LineBuffer.from_file(str(path))
+    assert buffer.lines() == ["a", "b", "c"]
+
+    buffer.replace(1, 2, ["B", "B2"])
+    buffer.save()
+    assert path.read_bytes() == b"a\r\nB\r\nB2\r\nc"
+    assert buffer.is_current()
+
+    empty = LineBuffer.from_text("")
+    empty.replace(0, 0, ["x"])
+    assert empty.text() == "x\n"
+
+
+def test_edit_file_reuses_buffer(tmp_path):
+    path = tmp_path / "big.txt"
+    path.write_text("".join(f"line {i}\n" for i in range(1, 5001)))
+    editor = CodeEditor(str(tmp_path))
+
+    display = editor.edit_file(str(path), 2500, 1, "edited")
+    buffer = editor._buffers[str(path)]
+    assert display.splitlines()[2:] == [f"{i}|line {i}" for i in range(2496, 2500)] + [
+        "2500|edited"
+    ] + [f"{i}|line {i}" for i in range(2501, 2505)]
+
+    editor.edit_file(str(path), 1, 0, "first")
+    assert editor._buffers[str(path)] is buffer
+    content = path.read_text().splitlines()
+    assert content[0] == "first" and content[2500] == "edited"
+    assert path.read_text().endswith("line 5000\n")
+
+    # External changes are picked up once the file is read again
+    path.write_text("replaced\n")
+    os.utime(path, ns=(0, 0))
+    with pytest.raises(FileConflictError):
+        editor.edit_file(str(path), 2, 0, "appended")
+    editor.read_file(str(path))
+    editor.edit_file(str(path), 2, 0, "appended")
+    assert path.read_text() == "replaced\nappended\n"
+
+    editor.close_all_files()
+    assert not editor._buffers
+
+
+def test_write_conflicts_and_atomic_rename(tmp_path):
+    path = tmp_path / "file.txt"
+    path.write_text("a\nb\n")
+    os.chmod(path, 0o640)
+    editor = CodeEditor(str(tmp_path), fsync=True)
+    editor.read_file(str(path))
+
+    inode = os.stat(path).st_ino
+    editor.str_replace(str(path), "a", "A")
+    assert path.read_text() == "A\nb\n"
+    # The file was replaced, not truncated, and kept its permissions
+    assert os.stat(path).st_ino != inode
+    assert os.stat(path).st_mode & 0o777 == 0o640
+    assert [p.name for p in tmp_path.iterdir()] == ["file.txt"]
+
+    # Written by the editor: no conflict
+    editor.edit_file(str(path), 3, 0, "c")
+
+    path.write_text("changed by someone else\n")
+    for edit in (
+        lambda: editor.str_replace(str(path), "changed", "edited"),
+        lambda: editor.edit_file(str(path), 1, 1, "x"),
+        lambda: editor.delete_file(str(path)),
+    ):
+        with pytest.raises(FileConflictError):
+            edit()
+    assert path.read_text() == "changed by someone else\n"
+
+    # Files never read are not checked
+    other = tmp_path / "other.txt"
+    other.write_text("x\n")
+    editor.str_replace(str(other), "x", "y")
+    assert other.read_text() == "y\n"
@@ -0,0 +1,84 @@
+import os
+
+import pytest
+
+from autocode import line_reader
+from autocode.code_editor import CodeEditor
+from autocode.line_reader import LineIndexedFile, get_line_indexed_file, split_lines
+
+
+@pytest.mark.parametrize(
+    "content, lines",
+    [
+        ("", []),
+        ("one", ["one"]),
+        ("one\n", ["one"]),
+        ("one\ntwo", ["one", "two"]),
+        ("one\r\ntwo\r\n", ["one", "two"]),
+        ("\n\nthree\n", ["", "", "three"]),
+        ("page\x0cbreak same line\n", ["page\x0cbreak same line"]),
+    ],
+)
+def test_lines_split_on_newlines_only(tmp_path, content, lines):
+    path = tmp_path / "file.txt"
+    path.write_bytes(content.encode())
+    indexed_file = LineIndexedFile(str(path))
+
+    assert split_lines(content) == lines
+    assert indexed_file.lines() == lines
+    assert indexed_file.line_count() == len(lines)
+    assert [line.decode() for line in indexed_file.iter_lines()] == lines
+
+
+def test_staged_and_written_files_have_the_same_lines(tmp_path):
+    (tmp_path / "file.txt").write_text("one\x0ctwo\nthree\n")
+    editor = CodeEditor(str(tmp_path))
+    written = editor.read_file("file.txt")
+    editor.start_transaction()
+    editor.str_replace("file.txt", "three", "four")
+    staged = editor.read_file("file.txt")
+    assert staged == written.replace("three", "four")
+
+
+def test_ranged_read_indexes_lazily(tmp_path, monkeypatch):
+    monkeypatch.setattr(line_reader, "READ_BLOCK_SIZE", 64)
+    path = tmp_path / "big.log"
+    path.write_text("".join(f"line {i}\n" for i in range(1, 10_001)))
+    indexed_file = LineIndexedFile(str(path))
+
+    assert indexed_file.lines(9, 12) == ["line 10", "line 11", "line 12"]
+    assert indexed_file._scanned <= 256  # Only the start of the file was read
+    assert len(indexed_file._offsets) < 30
+    assert indexed_file.line_count() == 10_000
+    assert indexed_file.lines(9_998) == ["line 9999", "line 10000"]
+    assert len(list(indexed_file.iter_lines(batch_size=7))) == 10_000
+
+
+def test_cache_is_invalidated_on_change(tmp_path):
+    path = tmp_path / "file.txt"
+    path.write_text("before\n")
+    first = get_line_indexed_file(str(path))
+    assert get_line_indexed_file(str(path)) is first
+
+    path.write_text("after, longer\n")
+    os.utime(path, ns=(0, 0))
+    second = get_line_indexed_file(str(path))
+    assert second is not first
+    assert second.lines() == ["after, longer"]
+
+
+def test_cache_is_bounded_in_bytes(tmp_path, monkeypatch):
+    monkeypatch.setattr(line_reader, "_cache", type(line_reader._cache)())
+    monkeypatch.setattr(line_reader, "CACHE_MAX_BYTES", 100)
+    for name in ("a.txt", "b.txt"):
+        (tmp_path / name).write_text("line\n" * 10)
+        get_line_indexed_file(str(tmp_path / name)).line_count()
+    # The indexes of a and b (10 offsets, 80 bytes each) do not fit together
+    get_line_indexed_file(str(tmp_path / "b.txt"))
+    assert list(line_reader._cache) == [str(tmp_path / "b.txt")]
+
+    # An index over the limit is not kept at all
+    (tmp_path / "big.txt").write_text("line\n" * 20)
+    get_line_indexed_file(str(tmp_path / "big.txt")).line_count()
+    get_line_indexed_file(str(tmp_path / "a.txt"))
+    assert list(line_reader._cache) == [str(tmp_path / "a.txt")]
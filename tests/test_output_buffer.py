@@ -0,0 +1,66 @@
+import os
+
+from autocode.output_buffer import OutputBuffer
+
+
+def test_small_output_stays_in_memory():
+    output = OutputBuffer(head_chars=10, tail_chars=10)
+    output.write("hello ")
+    output.write("world")
+    assert output.text() == "hello world"
+    assert output.log_path is None
+    assert output.read(6) == ("world", 11)
+
+
+def test_overflow_keeps_head_and_tail_and_spills(tmp_path):
+    output = OutputBuffer(head_chars=5, tail_chars=5, log_directory=str(tmp_path))
+    for i in range(10):
+        output.write(f"{i}" * 3)
+
+    assert output.size == 30
+    text = output.text()
+    assert text.startswith("00011")
+    assert text.endswith("88999")
+    assert f"20 characters omitted, full output in {output.log_path}" in text
+
+    # Reading from an offset dropped from memory
+    new_output, end = output.read(12)
+    assert new_output.startswith("\n... (13 characters omitted")
+    assert end == 30
+
+    output.finish(0)
+    with open(output.log_path) as f:
+        assert f.read() == "".join(f"{i}" * 3 for i in range(10))
+    log_path = output.log_path
+    output.close()
+    assert not os.path.exists(log_path)
+
+
+def test_wait():
+    output = OutputBuffer()
+    assert not output.wait(0, timeout=0.01)
+    output.write("x")
+    assert output.wait(0, timeout=0.01)
+    assert not output.wait(1, timeout=0.01)
+    output.finish(0)
+    assert output.wait(1, timeout=0.01)
+
+
+def test_consumer_cursors():
+    buffer = OutputBuffer(head_chars=5, tail_chars=5)
+    buffer.write("abc")
+    assert buffer.read_unseen("llm") == "abc"
+    assert buffer.read_unseen("llm") == ""
+    buffer.write("def")
+    assert buffer.unseen("llm") == 3
+    assert buffer.peek_unseen("llm") == ("def", 6)
+    assert buffer.read_unseen("other") == "abcdef"
+    assert buffer.read_unseen("llm") == "def"
+
+    buffer.write("0123456789")
+    unseen = buffer.read_unseen("llm")
+    assert unseen.startswith("\n... (5 characters omitted")
+    assert unseen.endswith(") ...\n56789")
+    buffer.mark_seen("other")
+    assert buffer.unseen("other") == 0
+    buffer.close()
@@ -0,0 +1,79 @@
+import pytest
+
+from autocode.code_editor import CodeEditor
+
+
+@pytest.fixture
+def tree(tmp_path):
+    (tmp_path / "src").mkdir()
+    (tmp_path / "src" / "a.py").write_text("old_name = 1\nprint(old_name)\n")
+    (tmp_path / "src" / "b.py").write_text("from a import old_name\r\n")
+    (tmp_path / "notes.txt").write_text("old_name is deprecated\n")
+    (tmp_path / "data.bin").write_bytes(b"\0old_name")
+    return tmp_path
+
+
+@pytest.mark.parametrize("search_index", [False, True])
+def test_replace_in_files_literal(tree, search_index):
+    editor = CodeEditor(str(tree), search_index=search_index)
+
+    summary = editor.replace_in_files("old_name", "new_name", include=["*.py"])
+
+    assert summary.splitlines() == [
+        "Replaced 3 occurrences in 2 files:",
+        "  src/a.py: 2",
+        "  src/b.py: 1",
+    ]
+    assert (tree / "src" / "a.py").read_text() == "new_name = 1\nprint(new_name)\n"
+    assert (tree / "src" / "b.py").read_bytes() == b"from a import new_name\r\n"
+    assert (tree / "notes.txt").read_text() == "old_name is deprecated\n"
+    assert (tree / "data.bin").read_bytes() == b"\0old_name"
+    assert editor.replace_in_files("old_name", "x", exclude=["*.txt"]) == (
+        "No occurrences found."
+    )
+
+
+def test_replace_in_files_regex_and_case(tree):
+    editor = CodeEditor(str(tree))
+
+    summary = editor.replace_in_files(
+        r"^(\w+) = 1$", r"\1 = 2", regex=True, include=["src/"]
+    )
+    assert summary.startswith("Replaced 1 occurrences in 1 files")
+    assert (tree / "src" / "a.py").read_text().startswith("old_name = 2\n")
+
+    editor.replace_in_files("OLD_NAME", "name", include=["*.txt"], case_sensitive=False)
+    assert (tree / "notes.txt").read_text() == "name is deprecated\n"
+
+
+def test_replace_in_files_conflicts_and_transaction(tree):
+    editor = CodeEditor(str(tree))
+    editor.read_file(str(tree / "notes.txt"))
+    (tree / "notes.txt").write_text("old_name was changed\n")
+
+    summary = editor.replace_in_files("old_name", "new_name")
+    assert "Skipped (modified since last read, read them again): notes.txt" in summary
+    assert (tree / "notes.txt").read_text() == "old_name was changed\n"
+
+    editor.start_transaction()
+    editor.str_replace(str(tree / "src" / "a.py"), "new_name = 1", "renamed = 1")
+    editor.replace_in_files("renamed", "final", include=["*.py"])
+    assert (tree / "src" / "a.py").read_text() == "new_name = 1\nprint(new_name)\n"
+    editor.commit_transaction()
+    assert (tree / "src" / "a.py").read_text() == "final = 1\nprint(new_name)\n"
+
+
+def test_replace_in_files_empty_matches(tree):
+    editor = CodeEditor(str(tree))
+    before = (tree / "src" / "a.py").read_text()
+
+    assert editor.replace_in_files("", "X") == "The pattern is empty."
+    assert editor.replace_in_files("x*", "X", regex=True) == "No occurrences found."
+    assert (tree / "src" / "a.py").read_text() == before
+
+    summary = editor.replace_in_files("_?name", "", regex=True, include=["*.txt"])
+    assert summary.splitlines() == [
+        "Replaced 1 occurrences in 1 files:",
+        "  notes.txt: 1",
+    ]
+    assert (tree / "notes.txt").read_text() == "old is deprecated\n"
@@ -0,0 +1,53 @@
+import pytest
+
+from autocode.ruff_server import RuffServer, _apply_text_edits
+
+
+def edit(start, end, new_text):
+    return {
+        "range": {
+            "start": {"line": start[0], "character": start[1]},
+            "end": {"line": end[0], "character": end[1]},
+        },
+        "newText": new_text,
+    }
+
+
+def test_apply_text_edits():
+    text = "héllo\nworld\n"
+    edits = [edit((0, 0), (0, 6), "bye"), edit((1, 0), (2, 0), "")]
+    assert _apply_text_edits(text, edits) == "bye\n"
+
+
+@pytest.fixture
+def ruff_server(tmp_path):
+    server = RuffServer(str(tmp_path))
+    yield server
+    server.close()
+
+
+def test_lint_file_formats_and_organizes_imports(tmp_path, ruff_server):
+    path = tmp_path / "module.py"
+    path.write_text("import sys\nimport os\ndef f():\n    print('x', os, sys)\n")
+    code_actions = {"source.fixAll": "explicit", "source.organizeImports": "explicit"}
+
+    report = ruff_server.lint_file(str(path), code_actions=code_actions)
+
+    assert report == ""
+    assert path.read_text() == (
+        'import os\nimport sys\n\n\ndef f():\n    print("x", os, sys)\n'
+    )
+
+
+def test_lint_file_restarts_crashed_server(tmp_path, ruff_server):
+    path = tmp_path / "module.py"
+    path.write_text("x = 'a'\n")
+    ruff_server.lint_file(str(path))
+    ruff_server.process.kill()
+    ruff_server.process.wait()
+
+    path.write_text("y = 'b'\n")
+    ruff_server.lint_file(str(path))
+
+    assert path.read_text() == 'y = "b"\n'
+    assert ruff_server.restarts == 1
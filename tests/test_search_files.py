@@ -4,6 +4,7 @@ from unittest.mock import patch
 import pytest
 
 from autocode.code_editor import CodeEditor
+from autocode.search import iter_search_matches
 
 
 @pytest.fixture
@@ -80,3 +81,68 @@ def test_search_files_case_insensitive(code_editor, temp_dir):
         assert result == expected_result
         result = code_editor.search_files("content")
         assert result == expected_result
+
+
+def write_files(temp_dir, files):
+    for name, content in files.items():
+        path = os.path.join(temp_dir, name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w") as f:
+            f.write(content)
+
+
+def test_search_files_regex(code_editor, temp_dir):
+    write_files(temp_dir, {"test_file.txt": "value = 42\nvalue = abc\n"})
+
+    result = code_editor.search_files(r"value = \d+", regex=True)
+    assert result == "> test_file.txt\n  Line 1: value = 42"
+
+
+def test_search_files_include_exclude(code_editor, temp_dir):
+    write_files(
+        temp_dir,
+        {
+            "src/main.py": "needle",
+            "src/notes.txt": "needle",
+            "tests/test_main.py": "needle",
+        },
+    )
+
+    result = code_editor.search_files("needle", include=["*.py"], exclude=["tests/"])
+    assert result == "> src/main.py\n  Line 1: needle"
+
+
+def test_search_files_max_results(code_editor, temp_dir):
+    write_files(temp_dir, {"test_file.txt": "needle\n" * 10})
+
+    result = code_editor.search_files("needle", max_per_file=2)
+    assert result == "> test_file.txt\n  Line 1: needle\n  Line 2: needle"
+
+    result = code_editor.search_files("needle", max_results=3)
+    assert result.splitlines()[-1] == "(Results limited to 3 matches)"
+    assert result.count("Line") == 3
+
+
+def test_search_files_skips_binary_files(code_editor, temp_dir):
+    with open(os.path.join(temp_dir, "data.bin"), "wb") as f:
+        f.write(b"needle\0\x01\x02")
+    write_files(temp_dir, {"test_file.txt": "needle"})
+
+    assert code_editor.search_files("needle") == "> test_file.txt\n  Line 1: needle"
+
+
+def test_iter_search_matches_streams_in_order(temp_dir):
+    files = []
+    for i in range(50):
+        path = os.path.join(temp_dir, f"file_{i:02}.txt")
+        with open(path, "w") as f:
+            f.write(f"needle {i}\n")
+        files.append(path)
+
+    matches = iter_search_matches(files, "needle", workers=2)
+    assert next(matches) == (files[0], [(1, "needle 0")])
+    assert next(matches)[0] == files[1]
+    matches.close()
+
+    results = list(iter_search_matches(files, "needle", max_results=5))
+    assert [path for path, _ in results] == files[:5]
@@ -0,0 +1,68 @@
+import os
+
+from autocode.code_editor import CodeEditor
+from autocode.search_index import TrigramIndex
+
+
+def write(path, content):
+    path.write_text(content)
+    return str(path)
+
+
+def test_candidates_only_contain_matching_files(tmp_path):
+    a = write(tmp_path / "a.txt", "def Hello_World():")
+    b = write(tmp_path / "b.txt", "goodbye")
+    index = TrigramIndex()
+    index.sync([a, b])
+
+    assert index.candidates("hello") == {a}
+    assert index.candidates("GOODBYE") == {b}
+    assert index.candidates("missing") == set()
+    # Too short to use trigrams: every file is a candidate
+    assert index.candidates("he") is None
+
+
+def test_update_and_remove(tmp_path):
+    a = write(tmp_path / "a.txt", "first version")
+    index = TrigramIndex()
+    index.sync([a])
+
+    os.utime(a, ns=(0, 0))
+    write(tmp_path / "a.txt", "second version")
+    assert index.update(a)
+    assert index.candidates("first") == set()
+    assert index.candidates("second") == {a}
+    assert not index.update(a)
+
+    os.remove(a)
+    index.update(a)
+    assert len(index) == 0
+
+
+def test_snapshot_roundtrip(tmp_path):
+    a = write(tmp_path / "a.txt", "snapshot content")
+    snapshot = str(tmp_path / "index.pickle")
+    index = TrigramIndex(snapshot)
+    index.sync([a])
+    index.save()
+
+    loaded = TrigramIndex(snapshot)
+    assert loaded.candidates("snapshot") == {a}
+    assert loaded.sync([a]) == 0
+
+
+def test_code_editor_search_with_index(tmp_path):
+    write(tmp_path / "a.txt", "some content to search for")
+    write(tmp_path / "b.txt", "nothing here")
+    editor = CodeEditor(str(tmp_path), search_index=True)
+
+    assert (
+        editor.search_files("content")
+        == "> a.txt\n  Line 1: some content to search for"
+    )
+
+    editor.str_replace("b.txt", "nothing", "more content")
+    assert editor.search_files("more content") == "> b.txt\n  Line 1: more content here"
+
+    editor.delete_file("a.txt")
+    assert editor.search_files("some content") == "No files found."
@@ -1,5 +1,13 @@
+import asyncio
+import os
+import re
+import signal
+import tempfile
+import threading
+import time
 import unittest
 
+from autocode.process_control import KILL_GRACE_SECONDS
 from autocode.terminal import Shell, Terminal
 
 
@@ -52,6 +60,255 @@ class TestShell(unittest.TestCase):
         self.assertIn("stdout message", result)
         self.assertIn("error message", result)
 
+    def test_background_child_does_not_block(self):
+        """Test that the command returns when bash exits, even if a child keeps the pipes"""
+        shell = Shell()
+        start = time.monotonic()
+        result = shell.run_command("sleep 3 & echo started")
+        self.assertEqual(result, "started")
+        self.assertLess(time.monotonic() - start, 2)
+
+    def test_running_commands_share_one_reader_thread(self):
+        """Test that running commands do not each need a thread"""
+        shells = [Shell() for _ in range(4)]
+        threads_count = None
+        for shell in shells:
+            shell.RETURN_TIMEOUT_SECONDS = 0.1
+            shell.run_command("echo started; sleep 0.5; echo done")
+            if threads_count is None:
+                threads_count = threading.active_count()
+        self.assertEqual(threading.active_count(), threads_count)
+        time.sleep(0.8)
+        for shell in shells:
+            self.assertIn("done", shell.read_new_output())
+            self.assertIsNone(shell.active_process)
+
+    def test_bounded_history(self):
+        """Test that the history keeps the last commands only"""
+        shell = Shell(history_size=3)
+        for i in range(5):
+            shell.run_command(f"echo {i}")
+        self.assertEqual(
+            [command for _, command, _ in shell.history], ["echo 2", "echo 3", "echo 4"]
+        )
+        self.assertIn("echo 4", shell.__llm__())
+        self.assertNotIn("echo 1", shell.__llm__())
+
+    def test_close_deletes_the_output_logs(self):
+        """Test that closing a shell deletes the log files of its history"""
+        with tempfile.TemporaryDirectory() as log_directory:
+            shell = Shell(log_directory=log_directory)
+            shell.run_command("seq 1 20000")
+            shell.run_command("seq 1 20000")
+            self.assertEqual(len(os.listdir(log_directory)), 2)
+            shell.close()
+            self.assertEqual(os.listdir(log_directory), [])
+            self.assertIn("20000", shell.read_output())
+
+    def test_wait_for_exit_with_timeout(self):
+        """A longer timeout waits for commands slower than the default"""
+        self.shell.RETURN_TIMEOUT_SECONDS = 0.1
+        result = self.shell.run_command("sleep 0.3; echo done", timeout=5)
+        self.assertEqual(result.strip(), "done")
+        self.assertIsNone(self.shell.active_process)
+
+    def test_idle_timeout(self):
+        """Return once the command stops producing output"""
+        start = time.monotonic()
+        result = self.shell.run_command("echo started; sleep 3", idle_timeout=0.3)
+        self.assertLess(time.monotonic() - start, 2)
+        self.assertIn("started", result)
+        self.assertIn("Command is still running... (no output for 0.3s)", result)
+        self.shell.close()
+
+    def test_ready_pattern(self):
+        """Return as soon as the output matches the ready pattern"""
+        shell = Shell(ready_pattern=r"Listening on port \d+")
+        start = time.monotonic()
+        result = shell.run_command(
+            "sleep 0.2; echo 'Listening on port 8000'; sleep 3", timeout=10
+        )
+        self.assertLess(time.monotonic() - start, 2)
+        self.assertIn("Listening on port 8000", result)
+        self.assertIn("ready:", result)
+
+        # "" disables the shell's default pattern for a call
+        result = shell.run_command("echo 'Listening on port 8001'", ready_pattern="")
+        self.assertEqual(result, "Listening on port 8001")
+
+        # An invalid pattern fails before killing the running command or starting one
+        shell.run_command("sleep 3", timeout=0.1)
+        running = shell.active_process
+        with self.assertRaises(re.error):
+            shell.run_command("echo never", ready_pattern="(")
+        self.assertIs(shell.active_process, running)
+        self.assertIsNone(running.poll())
+        self.assertNotIn("echo never", [command for _, command, _ in shell.history])
+        shell.close()
+
+    def test_run_command_async(self):
+        """Test commands awaited concurrently in the same event loop"""
+
+        async def run():
+            return await asyncio.gather(
+                self.shell.run_command_async("sleep 0.5; echo first"),
+                self.shell.run_command_async("sleep 0.5; echo second"),
+            )
+
+        start = time.monotonic()
+        self.assertEqual(asyncio.run(run()), ["first", "second"])
+        self.assertLess(time.monotonic() - start, 0.9)
+
+    def _start_with_child(self, shell):
+        """Start a command with a child process, return the child's pid"""
+        shell.RETURN_TIMEOUT_SECONDS = 0.3
+        result = shell.run_command("sleep 30 & echo $!; wait")
+        self.assertIn("Command is still running...", result)
+        return int(result.split()[0])
+
+    def _assert_killed(self, pid):
+        deadline = time.monotonic() + 5
+        while time.monotonic() < deadline:
+            try:
+                os.kill(pid, 0)
+            except ProcessLookupError:
+                return
+            time.sleep(0.05)
+        self.fail(f"Process {pid} is still running")
+
+    def test_kill_on_replace(self):
+        """Test that a new command kills the running one with its children"""
+        child = self._start_with_child(self.shell)
+        self.assertEqual(self.shell.run_command("echo next"), "next")
+        self._assert_killed(child)
+        self.assertEqual(self.shell.killed[-1][2], "replaced by a new command")
+        self.assertIn("Killed commands:", self.shell.__llm__())
+
+    def test_kill_on_close(self):
+        terminal = Terminal()
+        shell = terminal.create_shell("test_shell")
+        child = self._start_with_child(shell)
+        report = terminal.close_shell("test_shell")
+        self.assertIn("- sleep 30 & echo $!; wait", report)
+        self._assert_killed(child)
+
+    def test_resource_limits(self):
+        """Test the wall time and CPU time limits"""
+        shell = Shell(max_wall_seconds=0.5, max_cpu_seconds=1)
+        start = time.monotonic()
+        result = shell.run_command("sleep 30", timeout=10)
+        self.assertLess(time.monotonic() - start, 5)
+        self.assertIn("Killed: wall time limit of 0.5s exceeded", result)
+
+        shell.max_wall_seconds = None
+        shell.run_command("while :; do :; done", timeout=10)
+        self.assertIn(
+            shell.history[-1][2].return_code, (-signal.SIGXCPU, 128 + signal.SIGXCPU)
+        )
+        shell.run_command("true")
+        self.assertEqual(
+            [reason for _, _, reason in shell.killed],
+            ["wall time limit of 0.5s exceeded", "CPU time limit of 1s exceeded"],
+        )
+
+    def test_resource_limits_set_by_bash(self):
+        """Test that the limits apply to the commands, persistent shells included,
+        and that the children ignoring SIGTERM are killed after the grace period"""
+        shell = Shell(max_memory_mb=100)
+        result = shell.run_command(
+            "python3 -c 'bytearray(500_000_000)'; ulimit -v", timeout=10
+        )
+        self.assertIn("MemoryError", result)
+        self.assertTrue(result.endswith(str(100 * 1024)))
+
+        persistent = Shell(persistent=True, max_cpu_seconds=5)
+        self.assertEqual(persistent.run_command("ulimit -S -t; ulimit -H -t"), "5\n6")
+        persistent.close()
+
+        shell.RETURN_TIMEOUT_SECONDS = 0.5
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            marker = os.path.join(tmp_dir, "survived")
+            shell.run_command(
+                f"(trap '' TERM; sleep {KILL_GRACE_SECONDS + 1}; touch {marker}) & "
+                "sleep 30"
+            )
+            shell.run_command("echo next")  # SIGTERM, then SIGKILL
+            time.sleep(KILL_GRACE_SECONDS + 2)
+            self.assertFalse(os.path.exists(marker))
+
+    def test_llm_view_shows_unseen_output_until_read(self):
+        """Test that the output not returned yet is shown by every render, until
+        it is read"""
+        self.shell.RETURN_TIMEOUT_SECONDS = 0.2
+        self.shell.run_command("echo returned")
+        result = self.shell.run_command("echo first; sleep 0.4; echo second")
+        self.assertIn("first", result)
+        time.sleep(0.5)
+
+        view = self.shell.__llm__()
+        self.assertIn("$ echo returned (exit code 0, 9 characters of output)", view)
+        self.assertNotIn("returned\n", view)
+        self.assertIn("to mark it as read):\nsecond", view)
+        self.assertNotIn("first\n", view)
+        self.assertEqual(self.shell.__llm__(), view)
+
+        self.assertEqual(
+            self.shell.read_new_output(),
+            "$ echo first; sleep 0.4; echo second (finished)\nsecond\n",
+        )
+        self.assertNotIn("New output", self.shell.__llm__())
+        self.assertIsNone(self.shell.active_process)
+        self.assertEqual(
+            self.shell.read_output(),
+            "$ echo first; sleep 0.4; echo second\nfirst\nsecond\n",
+        )
+
+
+class TestPersistentShell(unittest.TestCase):
+    def setUp(self):
+        self.shell = Shell(persistent=True)
+
+    def tearDown(self):
+        self.shell.close()
+
+    def test_state_persists_between_commands(self):
+        """Test that cd, variables and functions persist"""
+        self.shell.run_command("cd /tmp && export GREETING=hello")
+        self.shell.run_command("greet() { echo $GREETING $1; }")
+        self.assertEqual(self.shell.run_command("pwd"), "/tmp")
+        self.assertEqual(self.shell.run_command("greet world"), "hello world")
+
+    def test_exit_codes_and_output_boundaries(self):
+        """Test that the end of each command and its exit code are detected"""
+        self.assertEqual(self.shell.run_command("printf 'a\\nb'; false"), "a\nb")
+        self.assertEqual(self.shell.history[-1][2].return_code, 1)
+        self.assertEqual(self.shell.run_command("echo $?"), "1")
+        self.assertIn("unexpected EOF", self.shell.run_command("echo 'unclosed"))
+        self.assertEqual(self.shell.run_command("echo next"), "next")
+
+    def test_long_running_and_exit(self):
+        """Test a still running command, replaced by the next one, then a shell
+        restarted after exit"""
+        self.shell.RETURN_TIMEOUT_SECONDS = 0.2
+        self.shell.run_command("export KEPT=1")
+        result = self.shell.run_command("sleep 0.5; echo late")
+        self.assertIn("Command is still running...", result)
+        time.sleep(0.6)
+        self.assertIn("late", self.shell.read_new_output())
+
+        result = self.shell.run_command("sleep 30; echo never")
+        self.assertIn("Command is still running...", result)
+        # Interrupted by the next command, without losing the state of the shell
+        self.assertEqual(self.shell.run_command("echo $KEPT"), "1")
+        replaced = self.shell.history[-2][2]
+        self.assertIn("Killed: replaced by a new command", str(replaced))
+        self.assertNotIn("never", str(replaced))
+
+        self.shell.RETURN_TIMEOUT_SECONDS = 5
+        self.assertIn("Shell exited.", self.shell.run_command("exit 3"))
+        self.assertEqual(self.shell.history[-1][2].return_code, 3)
+        self.assertEqual(self.shell.run_command("echo restarted"), "restarted")
+
 
 class TestTerminal(unittest.TestCase):
     def setUp(self):
@@ -67,6 +324,112 @@ class TestTerminal(unittest.TestCase):
         self.terminal.close_shell("test_shell")
         self.assertNotIn("test_shell", self.terminal.shells)
 
+    def test_create_persistent_shell(self):
+        shell = self.terminal.create_shell("test_shell", persistent=True)
+        self.assertEqual(shell.run_command("export A=1"), "")
+        self.assertEqual(shell.run_command("echo $A"), "1")
+        process = shell.session.process
+        self.terminal.close_shell("test_shell")
+        self.assertIsNotNone(process.wait(timeout=5))
+
     def test_close_nonexistent_shell(self):
         with self.assertRaises(ValueError):
             self.terminal.close_shell("nonexistent_shell")
+
+    def test_bootstrap_shells_in_parallel(self):
+        config = {
+            "backend": {
+                "commands": [
+                    "export PORT=8000",
+                    "sleep 0.5",
+                    "echo Listening on $PORT",
+                ],
+                "ready": "Listening on \\d+",
+                "persistent": True,
+            },
+            "frontend": ["sleep 1", "echo built"],
+            "worker": ["sleep 1", "false"],
+        }
+        cwd = os.getcwd()
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            os.chdir(tmp_dir)
+            try:
+                self.terminal.save_bootstrap_config(config)
+                start = time.monotonic()
+                created = self.terminal.bootstrap_shells()
+                elapsed = time.monotonic() - start
+            finally:
+                os.chdir(cwd)
+
+        self.assertEqual(created, ["backend", "frontend", "worker"])
+        self.assertLess(elapsed, 2)  # Not the sum of the commands of all the shells
+        self.assertEqual(self.terminal.readiness["backend"], "ready")
+        self.assertEqual(self.terminal.readiness["frontend"], "ready")
+        self.assertIn("failed: `false`", self.terminal.readiness["worker"])
+        self.assertIn("- backend (ready)", repr(self.terminal))
+        for name in created:
+            self.terminal.close_shell(name)
+
+    def test_bootstrap_reports_failed_setup_commands(self):
+        """Test that a shell is not reported ready after a failed setup command"""
+        config = {
+            "app": {"commands": ["false", "echo serving"], "ready": "serving"},
+            "killed": ["kill -TERM $$", "echo serving"],
+        }
+        cwd = os.getcwd()
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            os.chdir(tmp_dir)
+            try:
+                self.terminal.save_bootstrap_config(config)
+                self.terminal.bootstrap_shells()
+            finally:
+                os.chdir(cwd)
+
+        self.assertEqual(
+            self.terminal.readiness["app"], "failed: `false` exited with code 1"
+        )
+        self.assertIn("failed: `kill -TERM $$`", self.terminal.readiness["killed"])
+        for name in config:
+            self.terminal.close_shell(name)
+
+    def test_bootstrap_waits_for_the_setup_commands(self):
+        """Test that a setup command is not killed by the next command of its shell"""
+        config = {
+            "app": ["sleep 5.5 && echo installed > marker", "cat marker"],
+            "slow": {"commands": ["sleep 30", "echo never"], "timeout": 0.3},
+        }
+        cwd = os.getcwd()
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            os.chdir(tmp_dir)
+            try:
+                self.terminal.save_bootstrap_config(config)
+                self.terminal.bootstrap_shells()
+            finally:
+                os.chdir(cwd)
+
+        app = self.terminal.shells["app"]
+        self.assertEqual(app.history[0][2].return_code, 0)
+        self.assertEqual(app.read_output(), "$ cat marker\ninstalled\n")
+        self.assertEqual(
+            self.terminal.readiness["slow"],
+            "not ready: `sleep 30` still running after 0.3s",
+        )
+        self.assertEqual(len(self.terminal.shells["slow"].history), 1)
+        for name in config:
+            self.terminal.close_shell(name)
+
+    def test_run_many(self):
+        start = time.monotonic()
+        results = asyncio.run(
+            self.terminal.run_many(
+                [
+                    "sleep 0.5; echo lint",
+                    {"command": "echo slow; sleep 5", "timeout": 0.5},
+                ]
+            )
+        )
+        self.assertLess(time.monotonic() - start, 2)
+        self.assertEqual(results[0], "$ sleep 0.5; echo lint\nlint\nExit code: 0")
+        self.assertIn("slow", results[1])
+        self.assertIn("Command timed out after 0.5s and was stopped.", results[1])
+        self.assertEqual(self.terminal.shells, {})